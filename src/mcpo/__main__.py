@@ -0,0 +1,4 @@
+from mcpo.cli import app
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,8 @@
+"""
+Benchmark suite for mcpo.
+
+Run ``python -m mcpo.bench --help`` for usage. The suite starts mcpo against
+the bundled stub MCP server (``mcpo.bench.stub_server``) over stdio, SSE and
+streamable HTTP and reports throughput, latency percentiles, startup time and
+RSS as JSON.
+"""
@@ -0,0 +1,4 @@
+from mcpo.bench.runner import app
+
+if __name__ == "__main__":
+    app()
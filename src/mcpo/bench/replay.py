@@ -0,0 +1,151 @@
+"""
+Replays a traffic capture (`mcpo --capture`) against a running mcpo.
+
+Calls are sent at the times they were captured, divided by ``--speed``,
+without waiting for earlier calls to finish, so a slow server builds up a
+backlog the way it did in production. The report has throughput and latency
+percentiles overall and per tool, and how far the sender fell behind the
+schedule. Pair it with the stub server's ``--replay`` mode to put mcpo in
+front of an upstream that answers with the captured results and latency.
+"""
+
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import typer
+from typing_extensions import Annotated
+
+from mcpo.bench.runner import percentile, summarize_latencies
+from mcpo.utils.capture import read_capture
+
+app = typer.Typer()
+
+
+async def replay(
+    records: List[Dict],
+    target: str,
+    speed: float,
+    headers: Dict[str, str],
+    timeout: float,
+    max_in_flight: int,
+) -> Dict:
+    import httpx
+
+    latencies: Dict[str, List[float]] = {}
+    statuses: Counter = Counter()
+    lag: List[float] = []
+    slots = asyncio.Semaphore(max_in_flight)
+    first = records[0]["ts"]
+
+    async def send(client, record, due: float):
+        async with slots:
+            lag.append(max(time.perf_counter() - due, 0.0))
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    target + record["path"], json=record["arguments"]
+                )
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.setdefault(record["tool"], []).append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    limits = httpx.Limits(max_connections=max_in_flight)
+    async with httpx.AsyncClient(
+        headers=headers, timeout=timeout, limits=limits
+    ) as client:
+        started = time.perf_counter()
+        tasks = []
+        for record in records:
+            due = started + (record["ts"] - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(client, record, due)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    everything = [latency for values in latencies.values() for latency in values]
+    return {
+        "requests": len(records),
+        "duration_seconds": round(elapsed, 3),
+        "captured_seconds": round(records[-1]["ts"] - first, 3),
+        "speed": speed,
+        "requests_per_second": round(len(records) / elapsed, 2) if elapsed else 0.0,
+        "statuses": dict(statuses),
+        "latency_ms": summarize_latencies(everything),
+        "schedule_lag_ms": {
+            "p50": round(percentile(lag, 50) * 1000, 3),
+            "p99": round(percentile(lag, 99) * 1000, 3),
+        },
+        "per_tool": {
+            tool: {"requests": len(values), "latency_ms": summarize_latencies(values)}
+            for tool, values in sorted(latencies.items())
+        },
+    }
+
+
+@app.command()
+def main(
+    capture: Annotated[
+        str, typer.Argument(help="Capture file written by mcpo --capture")
+    ],
+    target: Annotated[
+        str, typer.Option(help="Base URL of the mcpo to replay against")
+    ] = "http://127.0.0.1:8000",
+    speed: Annotated[
+        float, typer.Option(help="Replay rate relative to the captured one")
+    ] = 1.0,
+    header: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            "--header", "-H", help="Extra request header 'Name: value' (repeatable)"
+        ),
+    ] = None,
+    server: Annotated[
+        Optional[List[str]],
+        typer.Option(help="Only replay calls to this server (repeatable)"),
+    ] = None,
+    limit: Annotated[
+        Optional[int], typer.Option(help="Replay at most this many calls")
+    ] = None,
+    max_in_flight: Annotated[
+        int, typer.Option(help="Calls in flight at most; later ones wait")
+    ] = 1000,
+    timeout: Annotated[float, typer.Option(help="Per request timeout")] = 60.0,
+    output: Annotated[
+        Optional[str], typer.Option("--output", "-o", help="Write JSON report here")
+    ] = None,
+):
+    if speed <= 0:
+        typer.echo("Error: --speed must be positive", err=True)
+        raise typer.Exit(2)
+    records = read_capture(capture)
+    if server:
+        records = [r for r in records if r["server"] in server]
+    records = records[:limit]
+    if not records:
+        typer.echo("Error: no calls to replay", err=True)
+        raise typer.Exit(1)
+
+    headers = {}
+    for value in header or []:
+        name, _, content = value.partition(":")
+        headers[name.strip()] = content.strip()
+
+    report = asyncio.run(
+        replay(records, target.rstrip("/"), speed, headers, timeout, max_in_flight)
+    )
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    typer.echo(text)
+
+
+if __name__ == "__main__":
+    app()
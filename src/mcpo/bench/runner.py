@@ -0,0 +1,407 @@
+import asyncio
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import typer
+from typing_extensions import Annotated
+
+from mcpo.bench.stub_server import build_input_schema, sample_arguments
+
+app = typer.Typer()
+
+TRANSPORTS = ["stdio", "sse", "streamablehttp"]
+STUB_PATHS = {"sse": "/sse", "streamablehttp": "/mcp"}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `values` (0 < pct <= 100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """Summarize latencies given in seconds as milliseconds."""
+    millis = [latency * 1000 for latency in latencies]
+    return {
+        "mean": round(statistics.fmean(millis), 3) if millis else 0.0,
+        "p50": round(percentile(millis, 50), 3),
+        "p90": round(percentile(millis, 90), 3),
+        "p99": round(percentile(millis, 99), 3),
+        "max": round(max(millis), 3) if millis else 0.0,
+    }
+
+
+def read_rss_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Read current and peak RSS of a process from /proc (Linux only)."""
+    rss = {"current": None, "peak": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss["current"] = round(int(line.split()[1]) / 1024, 2)
+                elif line.startswith("VmHWM:"):
+                    rss["peak"] = round(int(line.split()[1]) / 1024, 2)
+    except OSError:
+        pass
+    return rss
+
+
+def read_cpu_seconds(pid: int) -> Optional[float]:
+    """User plus system CPU time used by a process so far, from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces: fields are counted after it
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def stub_command(transport: str, port: int, options: Dict) -> List[str]:
+    structured = ["--structured"] if options["structured"] else []
+    return [
+        sys.executable,
+        "-m",
+        "mcpo.bench.stub_server",
+        "--transport",
+        transport,
+        "--port",
+        str(port),
+        "--tools",
+        str(options["tools"]),
+        "--latency-ms",
+        str(options["latency_ms"]),
+        "--jitter-ms",
+        str(options["jitter_ms"]),
+        "--payload-bytes",
+        str(options["payload_bytes"]),
+        "--schema-depth",
+        str(options["schema_depth"]),
+        "--schema-width",
+        str(options["schema_width"]),
+        *structured,
+    ]
+
+
+async def wait_until(check, timeout: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if await check():
+                return True
+        except Exception:
+            pass
+        await asyncio.sleep(0.02)
+    return False
+
+
+async def run_load(
+    client,
+    base_url: str,
+    tool_names: List[str],
+    arguments: Dict,
+    requests: int,
+    concurrency: int,
+):
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            tool = tool_names[i % len(tool_names)]
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{base_url}/{tool}", json=arguments)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run_scenario(transport: str, options: Dict) -> Dict:
+    import httpx
+
+    mcpo_port = free_port()
+    processes = []
+    mcpo_command = [
+        sys.executable,
+        "-m",
+        "mcpo",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(mcpo_port),
+        *options["mcpo_args"],
+    ]
+    base_url = f"http://127.0.0.1:{mcpo_port}"
+    client_transport = None
+    if options["uds"]:
+        uds = os.path.join(tempfile.mkdtemp(), "mcpo.sock")
+        mcpo_command += ["--uds", uds, "--no-tcp"]
+        client_transport = httpx.AsyncHTTPTransport(uds=uds)
+        base_url = "http://mcpo"
+
+    try:
+        async with httpx.AsyncClient(
+            timeout=options["timeout"], transport=client_transport
+        ) as client:
+            if transport == "stdio":
+                mcpo_command += ["--", *stub_command("stdio", 0, options)]
+            else:
+                stub_port = free_port()
+                processes.append(
+                    subprocess.Popen(
+                        stub_command(transport, stub_port, options),
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                    )
+                )
+                stub_url = f"http://127.0.0.1:{stub_port}{STUB_PATHS[transport]}"
+
+                async def stub_ready():
+                    with socket.create_connection(("127.0.0.1", stub_port), 0.1):
+                        return True
+
+                if not await wait_until(stub_ready, options["startup_timeout"]):
+                    raise RuntimeError(f"Stub {transport} server did not start")
+                mcpo_command += ["--server-type", transport, "--", stub_url]
+
+            started_at = time.perf_counter()
+            mcpo_process = subprocess.Popen(
+                mcpo_command,
+                stdout=subprocess.DEVNULL,
+                stderr=None if options["verbose"] else subprocess.DEVNULL,
+            )
+            processes.append(mcpo_process)
+
+            async def mcpo_ready():
+                response = await client.get(f"{base_url}/openapi.json")
+                return response.status_code == 200 and "/tool_0" in response.text
+
+            if not await wait_until(mcpo_ready, options["startup_timeout"]):
+                raise RuntimeError(f"mcpo did not start for transport {transport}")
+            startup = time.perf_counter() - started_at
+            rss_idle = read_rss_mb(mcpo_process.pid)
+
+            tool_names = [f"tool_{i}" for i in range(options["tools"])]
+            arguments = sample_arguments(
+                build_input_schema(options["schema_depth"], options["schema_width"])
+            )
+            await run_load(
+                client,
+                base_url,
+                tool_names,
+                arguments,
+                options["warmup"],
+                options["concurrency"],
+            )
+            cpu_before = read_cpu_seconds(mcpo_process.pid)
+            latencies, errors, duration = await run_load(
+                client,
+                base_url,
+                tool_names,
+                arguments,
+                options["requests"],
+                options["concurrency"],
+            )
+            cpu_after = read_cpu_seconds(mcpo_process.pid)
+            rss_loaded = read_rss_mb(mcpo_process.pid)
+            event_loop = None
+            response = await client.get(f"{base_url}/_metrics")
+            if response.status_code == 200:
+                event_loop = response.json().get("event_loop")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if options["uds"]:
+            shutil.rmtree(os.path.dirname(uds), ignore_errors=True)
+
+    return {
+        "transport": transport,
+        "listener": "uds" if options["uds"] else "tcp",
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(duration, 4),
+        "requests_per_second": round(len(latencies) / duration, 2) if duration else 0,
+        "latency_ms": summarize_latencies(latencies),
+        "startup_s": round(startup, 4),
+        "cpu_ms_per_request": (
+            round((cpu_after - cpu_before) * 1000 / len(latencies), 3)
+            if cpu_before is not None and cpu_after is not None and latencies
+            else None
+        ),
+        "rss_mb": {
+            "idle": rss_idle["current"],
+            "loaded": rss_loaded["current"],
+            "peak": rss_loaded["peak"],
+        },
+        "event_loop": event_loop,
+    }
+
+
+def compare_results(results: List[Dict], baseline: Dict, max_regression: float) -> List[str]:
+    """Return human readable regressions of `results` against a baseline report."""
+    regressions = []
+    def key(result):
+        return result["transport"], result.get("listener", "tcp")
+
+    previous = {key(r): r for r in baseline.get("results", [])}
+    for result in results:
+        before = previous.get(key(result))
+        if not before:
+            continue
+        checks = [
+            (
+                "requests_per_second",
+                before["requests_per_second"],
+                result["requests_per_second"],
+                False,
+            ),
+            ("p99_ms", before["latency_ms"]["p99"], result["latency_ms"]["p99"], True),
+            ("startup_s", before["startup_s"], result["startup_s"], True),
+            (
+                "cpu_ms_per_request",
+                before.get("cpu_ms_per_request"),
+                result.get("cpu_ms_per_request"),
+                True,
+            ),
+        ]
+        for metric, old, new, lower_is_better in checks:
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (lower_is_better and change > max_regression) or (
+                not lower_is_better and -change > max_regression
+            ):
+                regressions.append(
+                    f"{result['transport']} {metric}: {old} -> {new} ({change:+.1%})"
+                )
+    return regressions
+
+
+@app.command()
+def main(
+    transport: Annotated[
+        Optional[List[str]],
+        typer.Option("--transport", "-t", help="Transport(s) to benchmark"),
+    ] = None,
+    requests: Annotated[int, typer.Option(help="Measured requests")] = 2000,
+    warmup: Annotated[int, typer.Option(help="Warmup requests")] = 100,
+    concurrency: Annotated[int, typer.Option("--concurrency", "-c")] = 32,
+    tools: Annotated[int, typer.Option(help="Number of stub tools")] = 10,
+    latency_ms: Annotated[float, typer.Option(help="Stub tool latency")] = 0.0,
+    jitter_ms: Annotated[float, typer.Option(help="Extra random latency")] = 0.0,
+    payload_bytes: Annotated[int, typer.Option(help="Stub result size")] = 1024,
+    schema_depth: Annotated[int, typer.Option(help="Nested object depth")] = 1,
+    schema_width: Annotated[int, typer.Option(help="Properties per level")] = 5,
+    structured: Annotated[
+        bool, typer.Option(help="Stub tools return structuredContent too")
+    ] = False,
+    timeout: Annotated[float, typer.Option(help="Per request timeout")] = 30.0,
+    startup_timeout: Annotated[float, typer.Option(help="Startup timeout")] = 60.0,
+    output: Annotated[
+        Optional[str], typer.Option("--output", "-o", help="Write JSON report here")
+    ] = None,
+    baseline: Annotated[
+        Optional[str], typer.Option(help="Baseline JSON report to compare against")
+    ] = None,
+    max_regression: Annotated[
+        float, typer.Option(help="Allowed relative regression vs baseline")
+    ] = 0.1,
+    mcpo_arg: Annotated[
+        Optional[List[str]],
+        typer.Option(help="Extra mcpo CLI argument (repeatable), e.g. --mcpo-arg=--offload-threshold=1048576"),
+    ] = None,
+    uds: Annotated[
+        bool, typer.Option(help="Connect to mcpo over a Unix domain socket")
+    ] = False,
+    verbose: Annotated[bool, typer.Option(help="Show mcpo logs")] = False,
+):
+    options = {
+        "requests": requests,
+        "warmup": warmup,
+        "concurrency": concurrency,
+        "tools": tools,
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "payload_bytes": payload_bytes,
+        "schema_depth": schema_depth,
+        "schema_width": schema_width,
+        "structured": structured,
+        "timeout": timeout,
+        "startup_timeout": startup_timeout,
+        "mcpo_args": mcpo_arg or [],
+        "uds": uds,
+        "verbose": verbose,
+    }
+
+    results = []
+    for name in transport or TRANSPORTS:
+        if name not in TRANSPORTS:
+            typer.echo(f"Error: unknown transport '{name}'", err=True)
+            raise typer.Exit(2)
+        typer.echo(f"Benchmarking {name}...", err=True)
+        results.append(asyncio.run(run_scenario(name, options)))
+
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        mcpo_version = version("mcpo")
+    except PackageNotFoundError:
+        mcpo_version = None
+
+    report = {
+        "mcpo_version": mcpo_version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "options": {k: v for k, v in options.items() if k != "verbose"},
+        "results": results,
+    }
+    rendered = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(rendered + "\n")
+    else:
+        typer.echo(rendered)
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare_results(results, json.load(f), max_regression)
+        for regression in regressions:
+            typer.echo(f"Regression: {regression}", err=True)
+        if regressions:
+            raise typer.Exit(1)
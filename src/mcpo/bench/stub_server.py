@@ -0,0 +1,335 @@
+"""
+Configurable stub MCP server used by the benchmark suite.
+
+The server exposes ``--tools`` tools named ``tool_0`` .. ``tool_N`` whose input
+schemas are generated with ``--schema-depth`` levels of nested objects, each
+level carrying ``--schema-width`` properties. Every call sleeps for
+``--latency-ms`` (plus up to ``--jitter-ms``; a ``--slow-ratio`` share of calls
+takes ``--slow-ms`` instead, for a heavy latency tail) and returns a JSON text payload
+of roughly ``--payload-bytes`` bytes. With ``--structured``, the tools declare an
+output schema and also return the payload as ``structuredContent``. With
+``--replay``, it serves the tools of a traffic capture instead and answers with
+the captured results and latency.
+
+This module is spawned as a child process, so it sticks to argparse and lazy
+imports to keep its own startup time out of the numbers being measured.
+"""
+
+import argparse
+import json
+import random
+from typing import Any, Dict, List, Optional
+
+
+def build_input_schema(depth: int, width: int) -> Dict[str, Any]:
+    """Build an object schema with `depth` levels of nesting and `width` properties per level."""
+    properties: Dict[str, Any] = {
+        "query": {"type": "string", "description": "Free text query"},
+        "limit": {"type": "integer", "description": "Maximum number of items"},
+        "tags": {"type": "array", "items": {"type": "string"}},
+    }
+    for i in range(max(width - len(properties), 0)):
+        properties[f"field_{i}"] = {
+            "type": ["string", "number"] if i % 2 else "boolean",
+            "description": f"Generated field {i}",
+        }
+    if depth > 0:
+        properties["nested"] = build_input_schema(depth - 1, width)
+        properties["items"] = {
+            "type": "array",
+            "items": build_input_schema(depth - 1, width),
+        }
+    return {"type": "object", "properties": properties, "required": ["query"]}
+
+
+def sample_arguments(schema: Dict[str, Any]) -> Any:
+    """Produce a value that satisfies a schema generated by `build_input_schema`."""
+    prop_type = schema.get("type")
+    if isinstance(prop_type, list):
+        prop_type = prop_type[0]
+    if prop_type == "object":
+        return {
+            name: sample_arguments(prop_schema)
+            for name, prop_schema in schema.get("properties", {}).items()
+        }
+    if prop_type == "array":
+        return [sample_arguments(schema.get("items", {})) for _ in range(2)]
+    if prop_type == "string":
+        return "benchmark"
+    if prop_type == "integer":
+        return 10
+    if prop_type == "number":
+        return 1.5
+    if prop_type == "boolean":
+        return True
+    return None
+
+
+# Output schema of the payloads built by `build_payload`
+PAYLOAD_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "tool": {"type": "string"},
+        "items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "title": {"type": "string"},
+                    "text": {"type": "string"},
+                },
+                "required": ["id", "title", "text"],
+            },
+        },
+    },
+    "required": ["tool", "items"],
+}
+
+
+def build_payload(tool_name: str, payload_bytes: int) -> str:
+    """Return a JSON document of roughly `payload_bytes` bytes."""
+    body = {"tool": tool_name, "items": []}
+    item = {"id": 0, "title": "stub result", "text": "x" * 64}
+    item_size = len(json.dumps(item)) + 2
+    for i in range(max(payload_bytes // item_size, 1)):
+        body["items"].append({**item, "id": i})
+    return json.dumps(body)
+
+
+class ReplayedCalls:
+    """
+    Captured calls (see ``mcpo --capture``) to answer with. A call gets the
+    captured result for the same tool and arguments, or failing that the
+    tool's captured results in turn, after the captured latency.
+    """
+
+    def __init__(self, path: str, server: Optional[str] = None):
+        self.by_arguments: Dict[tuple, List[Dict[str, Any]]] = {}
+        self.by_tool: Dict[str, List[Dict[str, Any]]] = {}
+        self.properties: Dict[str, Dict[str, Any]] = {}
+        self._turns: Dict[Any, int] = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if server and record["server"] != server:
+                    continue
+                tool = record["tool"]
+                self.by_tool.setdefault(tool, []).append(record)
+                self.by_arguments.setdefault(
+                    (tool, self._key(record["arguments"])), []
+                ).append(record)
+                properties = self.properties.setdefault(tool, {})
+                for name in record["arguments"]:
+                    properties.setdefault(name, {})
+
+    @staticmethod
+    def _key(arguments: Dict[str, Any]) -> str:
+        return json.dumps(arguments, sort_keys=True)
+
+    def _next(self, key, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        turn = self._turns.get(key, 0)
+        self._turns[key] = turn + 1
+        return records[turn % len(records)]
+
+    def find(self, tool: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        key = (tool, self._key(arguments))
+        records = self.by_arguments.get(key)
+        if records:
+            return self._next(key, records)
+        return self._next(tool, self.by_tool[tool])
+
+
+def create_server(args: argparse.Namespace):
+    from mcp import types
+    from mcp.server.lowlevel import Server
+    import anyio
+
+    server = Server("mcpo-bench-stub")
+    if args.replay:
+        return create_replay_server(server, args)
+    input_schema = build_input_schema(args.schema_depth, args.schema_width)
+    tools = [
+        types.Tool(
+            name=f"tool_{i}",
+            description=f"Stub tool {i}",
+            inputSchema=input_schema,
+            outputSchema=PAYLOAD_SCHEMA if args.structured else None,
+            annotations=types.ToolAnnotations(readOnlyHint=True),
+        )
+        for i in range(args.tools)
+    ]
+    payloads = {tool.name: build_payload(tool.name, args.payload_bytes) for tool in tools}
+    structured = (
+        {name: json.loads(payload) for name, payload in payloads.items()}
+        if args.structured
+        else {}
+    )
+
+    @server.list_tools()
+    async def list_tools():
+        return tools
+
+    async def call_tool(name: str, arguments: dict):
+        delay = args.latency_ms + random.uniform(0, args.jitter_ms)
+        if args.slow_ratio and random.random() < args.slow_ratio:
+            delay = args.slow_ms
+        if delay > 0:
+            await anyio.sleep(delay / 1000)
+        content = [types.TextContent(type="text", text=payloads[name])]
+        if name in structured:
+            return content, structured[name]
+        return content
+
+    try:
+        # Input validation is the stub's cost, not mcpo's; skip it when the SDK allows.
+        server.call_tool(validate_input=False)(call_tool)
+    except TypeError:
+        server.call_tool()(call_tool)
+
+    return server
+
+
+def create_replay_server(server, args: argparse.Namespace):
+    from mcp import types
+    import anyio
+
+    calls = ReplayedCalls(args.replay, args.replay_server)
+    tools = [
+        types.Tool(
+            name=name,
+            description=f"Replayed tool {name}",
+            # Any argument seen in the capture, of any type
+            inputSchema={"type": "object", "properties": calls.properties[name]},
+        )
+        for name in calls.by_tool
+    ]
+
+    @server.list_tools()
+    async def list_tools():
+        return tools
+
+    async def call_tool(name: str, arguments: dict):
+        record = calls.find(name, arguments)
+        await anyio.sleep(record["latency_ms"] * args.latency_scale / 1000)
+        if "error" in record:
+            raise RuntimeError(record["error"].get("message", "replayed error"))
+        result = types.CallToolResult.model_validate(record["result"])
+        if result.isError:
+            text = [c.text for c in result.content if isinstance(c, types.TextContent)]
+            raise RuntimeError(text[0] if text else "replayed error")
+        if result.structuredContent is not None:
+            return result.content, result.structuredContent
+        return result.content
+
+    server.call_tool(validate_input=False)(call_tool)
+    return server
+
+
+async def serve_stdio(server) -> None:
+    from mcp.server.stdio import stdio_server
+
+    async with stdio_server() as (reader, writer):
+        await server.run(reader, writer, server.create_initialization_options())
+
+
+def create_http_app(server, transport: str):
+    from starlette.applications import Starlette
+    from starlette.responses import Response
+    from starlette.routing import Mount, Route
+
+    if transport == "sse":
+        from mcp.server.sse import SseServerTransport
+
+        sse = SseServerTransport("/messages/")
+
+        async def handle_sse(request):
+            async with sse.connect_sse(
+                request.scope, request.receive, request._send
+            ) as (reader, writer):
+                await server.run(
+                    reader, writer, server.create_initialization_options()
+                )
+            return Response()
+
+        return Starlette(
+            routes=[
+                Route("/sse", endpoint=handle_sse),
+                Mount("/messages/", app=sse.handle_post_message),
+            ]
+        )
+
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+    manager = StreamableHTTPSessionManager(app=server)
+
+    async def handle_mcp(scope, receive, send):
+        await manager.handle_request(scope, receive, send)
+
+    return Starlette(
+        routes=[Mount("/mcp", app=handle_mcp)],
+        lifespan=lambda app: manager.run(),
+    )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Stub MCP server for benchmarks")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "sse", "streamablehttp"],
+        default="stdio",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--tools", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--slow-ratio", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=1000.0)
+    parser.add_argument("--payload-bytes", type=int, default=1024)
+    parser.add_argument("--schema-depth", type=int, default=1)
+    parser.add_argument("--schema-width", type=int, default=5)
+    parser.add_argument(
+        "--structured",
+        action="store_true",
+        help="Declare an output schema and return structuredContent too",
+    )
+    parser.add_argument(
+        "--replay",
+        help="Serve the tools of this capture file with their captured results",
+    )
+    parser.add_argument("--replay-server", help="Only replay calls to this server")
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="Multiply captured latencies by this",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    server = create_server(args)
+
+    if args.transport == "stdio":
+        import anyio
+
+        anyio.run(serve_stdio, server)
+        return
+
+    import uvicorn
+
+    uvicorn.run(
+        create_http_app(server, args.transport),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
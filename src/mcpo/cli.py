@@ -0,0 +1,384 @@
+import sys
+import typer
+import os
+
+from typing_extensions import Annotated
+from typing import Optional, List
+
+app = typer.Typer()
+
+
+@app.command(context_settings={"allow_extra_args": True})
+def main(
+    host: Annotated[
+        Optional[str], typer.Option("--host", "-h", help="Host address")
+    ] = "0.0.0.0",
+    port: Annotated[
+        Optional[int], typer.Option("--port", "-p", help="Port number")
+    ] = 8000,
+    cors_allow_origins: Annotated[
+        Optional[List[str]],
+        typer.Option("--cors-allow-origins", help="CORS allowed origins"),
+    ] = ["*"],
+    api_key: Annotated[
+        Optional[str],
+        typer.Option("--api-key", "-k", help="API key for authentication"),
+    ] = None,
+    api_keys_path: Annotated[
+        Optional[str],
+        typer.Option(
+            "--api-keys",
+            help="JSON file of named API keys with optional rate limits and weights",
+        ),
+    ] = None,
+    strict_auth: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--strict-auth", help="API key protects all endpoints and documentation"
+        ),
+    ] = False,
+    env: Annotated[
+        Optional[List[str]], typer.Option("--env", "-e", help="Environment variables")
+    ] = None,
+    env_path: Annotated[
+        Optional[str],
+        typer.Option("--env-path", help="Path to environment variables file"),
+    ] = None,
+    server_type: Annotated[
+        Optional[str], typer.Option("--type", "--server-type", help="Server type")
+    ] = "stdio",
+    config_path: Annotated[
+        Optional[str], typer.Option("--config", "-c", help="Config file path")
+    ] = None,
+    name: Annotated[
+        Optional[str], typer.Option("--name", "-n", help="Server name")
+    ] = None,
+    description: Annotated[
+        Optional[str], typer.Option("--description", "-d", help="Server description")
+    ] = None,
+    version: Annotated[
+        Optional[str], typer.Option("--version", "-v", help="Server version")
+    ] = None,
+    ssl_certfile: Annotated[
+        Optional[str], typer.Option("--ssl-certfile", "-t", help="SSL certfile")
+    ] = None,
+    ssl_keyfile: Annotated[
+        Optional[str], typer.Option("--ssl-keyfile", "-K", help="SSL keyfile")
+    ] = None,
+    path_prefix: Annotated[
+        Optional[str], typer.Option("--path-prefix", help="URL prefix")
+    ] = None,
+    headers: Annotated[
+        Optional[str], typer.Option("--header", "-H", help="Headers in JSON format")
+    ] = None,
+    circuit_breaker: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--circuit-breaker",
+            help="Fail fast with 503 while the MCP server keeps erroring",
+        ),
+    ] = False,
+    offload_threshold: Annotated[
+        Optional[int],
+        typer.Option(
+            "--offload-threshold",
+            help="Parse, validate and encode payloads of at least this many bytes in a worker pool",
+        ),
+    ] = None,
+    offload_workers: Annotated[
+        Optional[int],
+        typer.Option("--offload-workers", help="Worker threads for offloaded payloads"),
+    ] = 4,
+    spool_threshold: Annotated[
+        Optional[int],
+        typer.Option(
+            "--spool-threshold",
+            help="Spool request bodies and tool results of at least this many bytes to temporary files",
+        ),
+    ] = None,
+    memory_budget: Annotated[
+        Optional[int],
+        typer.Option(
+            "--memory-budget",
+            help="Bytes of payloads all requests may hold in memory at once; the rest are spooled",
+        ),
+    ] = None,
+    compression: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--compression",
+            help="Compress responses with gzip, brotli or zstd when the client accepts it",
+        ),
+    ] = False,
+    compression_min_size: Annotated[
+        Optional[int],
+        typer.Option(
+            "--compression-min-size", help="Smallest response body to compress, in bytes"
+        ),
+    ] = 1024,
+    profiling: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--profiling",
+            help="Enable /_profile and Server-Timing headers for admin API keys",
+        ),
+    ] = False,
+    profiling_unauthenticated: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--profiling-unauthenticated",
+            help="Allow --profiling without an API key: anyone can profile the server",
+        ),
+    ] = False,
+    max_concurrency: Annotated[
+        Optional[int],
+        typer.Option(
+            "--max-concurrency",
+            help="Concurrent calls to the MCP server; the rest wait in a fair queue",
+        ),
+    ] = None,
+    capture: Annotated[
+        Optional[str],
+        typer.Option(
+            "--capture",
+            help="Append sampled tool calls (arguments, latency, results) to this file for replay",
+        ),
+    ] = None,
+    capture_sample_rate: Annotated[
+        Optional[float],
+        typer.Option(
+            "--capture-sample-rate",
+            help="Fraction of tool calls to capture",
+        ),
+    ] = 1.0,
+    compile_path: Annotated[
+        Optional[str],
+        typer.Option(
+            "--compile",
+            help="Write the servers' tool models and OpenAPI documents to this Python module and exit",
+        ),
+    ] = None,
+    compiled_path: Annotated[
+        Optional[str],
+        typer.Option(
+            "--compiled",
+            help="Load tool models written by --compile instead of building them at startup",
+        ),
+    ] = None,
+    session_affinity: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--session-affinity",
+            help="Give each X-Mcpo-Session header value its own MCP server session",
+        ),
+    ] = False,
+    validate_output: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--validate-output/--no-validate-output",
+            help="Check tool results against their output schema; with --no-validate-output they are sent as is",
+        ),
+    ] = True,
+    adaptive_concurrency: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--adaptive-concurrency",
+            help="Limit concurrent calls to the MCP server by its latency; excess calls get 503",
+        ),
+    ] = False,
+    async_jobs: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--async-jobs",
+            help="Run tool calls in the background on ?async=1 or 'Prefer: respond-async'",
+        ),
+    ] = False,
+    idempotency: Annotated[
+        Optional[str],
+        typer.Option(
+            "--idempotency",
+            help="Honor Idempotency-Key headers: 'memory', or a SQLite file shared by several processes",
+        ),
+    ] = None,
+    uds: Annotated[
+        Optional[str],
+        typer.Option("--uds", help="Also listen on this Unix domain socket"),
+    ] = None,
+    tcp: Annotated[
+        bool,
+        typer.Option(
+            "--tcp/--no-tcp", help="Listen on --host/--port (--no-tcp needs --uds)"
+        ),
+    ] = True,
+    reuse_port: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--reuse-port",
+            help="Bind with SO_REUSEPORT so several mcpo processes can share the port",
+        ),
+    ] = False,
+    drain_timeout: Annotated[
+        Optional[float],
+        typer.Option(
+            "--drain-timeout",
+            help="Seconds to let in-flight calls finish on shutdown (default 30)",
+        ),
+    ] = None,
+    restart_on_hup: Annotated[
+        Optional[bool],
+        typer.Option(
+            "--restart-on-hup",
+            help="On SIGHUP start a new mcpo on the same sockets, then drain this one",
+        ),
+    ] = False,
+    trace_exporter: Annotated[
+        Optional[str],
+        typer.Option(
+            "--trace-exporter", help="Export traces: 'otlp' (OTLP/HTTP JSON) or 'file'"
+        ),
+    ] = None,
+    trace_endpoint: Annotated[
+        Optional[str],
+        typer.Option(
+            "--trace-endpoint",
+            help="OTLP traces URL, or the file path for the file exporter",
+        ),
+    ] = None,
+    trace_sample_ratio: Annotated[
+        Optional[float],
+        typer.Option(
+            "--trace-sample-ratio",
+            help="Fraction of requests without a sampled traceparent to trace",
+        ),
+    ] = 1.0,
+):
+    server_command = None
+    if not config_path:
+        # Find the position of "--"
+        if "--" not in sys.argv:
+            typer.echo("Usage: mcpo --host 0.0.0.0 --port 8000 -- your_mcp_command")
+            raise typer.Exit(1)
+
+        idx = sys.argv.index("--")
+        server_command: List[str] = sys.argv[idx + 1 :]
+
+        if not server_command:
+            typer.echo("Error: You must specify the MCP server command after '--'")
+            return
+
+    from mcpo.main import run
+
+    if config_path:
+        print("Starting MCP OpenAPI Proxy with config file:", config_path)
+    else:
+        print(
+            f"Starting MCP OpenAPI Proxy on {host}:{port} with command: {' '.join(server_command)}"
+        )
+
+    try:
+        env_dict = {}
+        if env:
+            for var in env:
+                key, value = var.split("=", 1)
+                env_dict[key] = value
+
+        if env_path:
+            from dotenv import load_dotenv
+
+            # Load environment variables from the specified file
+            load_dotenv(env_path)
+            env_dict.update(dict(os.environ))
+
+        # Set environment variables
+        for key, value in env_dict.items():
+            os.environ[key] = value
+    except Exception as e:
+        pass
+
+    # Whatever the prefix is, make sure it starts and ends with a /
+    if path_prefix is None:
+        # Set default value
+        path_prefix = "/"
+    # if prefix doesn't end with a /, add it
+    if not path_prefix.endswith("/"):
+        path_prefix = f"{path_prefix}/"
+    # if prefix doesn't start with a /, add it
+    if not path_prefix.startswith("/"):
+        path_prefix = f"/{path_prefix}"
+
+    # Run your async run function from mcpo.main
+    import asyncio
+
+    asyncio.run(
+        run(
+            host,
+            port,
+            api_key=api_key,
+            strict_auth=strict_auth,
+            cors_allow_origins=cors_allow_origins,
+            server_type=server_type,
+            config_path=config_path,
+            name=name,
+            description=description,
+            version=version,
+            server_command=server_command,
+            ssl_certfile=ssl_certfile,
+            ssl_keyfile=ssl_keyfile,
+            path_prefix=path_prefix,
+            headers=headers,
+            circuit_breaker=circuit_breaker,
+            offload_threshold=offload_threshold,
+            offload_workers=offload_workers,
+            spool=(
+                {
+                    "requestThreshold": spool_threshold,
+                    "responseThreshold": spool_threshold,
+                    "memoryBudget": memory_budget,
+                }
+                if spool_threshold is not None or memory_budget is not None
+                else None
+            ),
+            api_keys_path=api_keys_path,
+            max_concurrency=max_concurrency,
+            adaptive_concurrency=adaptive_concurrency,
+            session_affinity=session_affinity,
+            validate_output=validate_output,
+            capture=(
+                {"path": capture, "sampleRate": capture_sample_rate}
+                if capture
+                else None
+            ),
+            compile_path=compile_path,
+            compiled_path=compiled_path,
+            profiling=profiling,
+            profiling_unauthenticated=profiling_unauthenticated,
+            compression=(
+                {"minimumSize": compression_min_size} if compression else None
+            ),
+            tracing=(
+                {
+                    "exporter": trace_exporter,
+                    "endpoint": trace_endpoint,
+                    "sampleRatio": trace_sample_ratio,
+                }
+                if trace_exporter
+                else None
+            ),
+            listen=(
+                {"uds": uds, "tcp": tcp, "reusePort": reuse_port}
+                if uds or reuse_port or not tcp
+                else None
+            ),
+            shutdown=(
+                {"drainTimeout": drain_timeout, "restartOnHup": restart_on_hup}
+                if drain_timeout is not None or restart_on_hup
+                else None
+            ),
+            jobs=async_jobs,
+            idempotency=idempotency,
+        )
+    )
+
+
+if __name__ == "__main__":
+    app()
@@ -3,23 +3,67 @@ import os
 import logging
 import socket
 import asyncio
+import tempfile
 from contextlib import AsyncExitStack, asynccontextmanager
-from typing import Optional
+from typing import List, Optional
 
-import uvicorn
-from fastapi import Depends, FastAPI
+import anyio
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.sse import sse_client
-from mcp.client.stdio import stdio_client
-from mcp.client.streamable_http import streamablehttp_client
+from fastapi.responses import JSONResponse, PlainTextResponse
+from mcp import ClientSession, types
 from starlette.routing import Mount
 
 logger = logging.getLogger(__name__)
 
 
-from mcpo.utils.main import get_model_fields, get_tool_handler
-from mcpo.utils.auth import get_verify_api_key, APIKeyMiddleware
+from mcpo.utils.main import ToolRoute, build_tool_models, get_tool_handler
+from mcpo.utils.auth import get_verify_admin_key, get_verify_api_key, APIKeyMiddleware
+from mcpo.utils.http_client import create_http_pool, get_http_pool
+from mcpo.utils.openapi import add_aggregated_openapi_endpoint, install_openapi_cache
+from mcpo.utils.affinity import create_session_affinity
+from mcpo.utils.cache import (
+    create_cache_policy,
+    create_result_cache,
+    get_result_cache,
+    schema_cache_key,
+)
+from mcpo.utils.circuit_breaker import (
+    create_circuit_breakers,
+    get_circuit_breaker_dependency,
+)
+from mcpo.utils.loop_monitor import EventLoopLagMonitor
+from mcpo.utils.metrics import (
+    collect_global_metrics,
+    collect_metrics,
+    get_server_health,
+    register_global_metrics,
+    register_metrics,
+    render_prometheus,
+)
+from mcpo.utils.offload import Offloader
+from mcpo.utils.idempotency import create_idempotency
+from mcpo.utils.jobs import add_job_endpoints, create_job_store
+from mcpo.utils.listen import create_listeners
+from mcpo.utils.hedging import create_hedging_policy, get_hedging_policy
+from mcpo.utils.capture import create_traffic_capture
+from mcpo.utils.compiled import get_compiled, load_module, schema_hash, write_module
+from mcpo.utils.concurrency import create_adaptive_limit
+from mcpo.utils.fair_queue import create_fair_queue
+from mcpo.utils.compression import CompressionMiddleware, create_compression
+from mcpo.utils.profiling import ServerTimingMiddleware, add_profiling_endpoints
+from mcpo.utils.rate_limit import create_api_key_registry
+from mcpo.utils.spool import create_spool
+from mcpo.utils.shutdown import (
+    DrainMiddleware,
+    DrainingServer,
+    create_graceful_shutdown,
+    drain_jobs,
+    inherited_sockets,
+)
+from mcpo.utils.tracing import TracingMiddleware, create_tracer
+from mcpo.utils.child import CONFIG_KEYS as CHILD_CONFIG_KEYS, wrap_command
+from mcpo.utils.upstream import create_upstream_pool, get_upstream
 
 
 async def create_dynamic_endpoints(app: FastAPI, api_dependency=None):
@@ -27,7 +71,12 @@ async def create_dynamic_endpoints(app: FastAPI, api_dependency=None):
     if not session:
         raise ValueError("Session is not initialized in the app state.")
 
-    result = await session.initialize()
+    upstream = get_upstream(app)
+    if upstream is not None:
+        # The pool initialized the session when it connected
+        result = upstream.initialize_result
+    else:
+        result = await session.initialize()
     server_info = getattr(result, "serverInfo", None)
     if server_info:
         app.title = server_info.name or app.title
@@ -40,48 +89,294 @@ async def create_dynamic_endpoints(app: FastAPI, api_dependency=None):
     if instructions:
         app.description = instructions
 
-    tools_result = await session.list_tools()
-    tools = tools_result.tools
+    tools = await list_tools(app, session)
+
+    # Models compiled ahead of time by `--compile`, or collected for it
+    compiling = getattr(app.state, "compiling", False)
+    compiled = None
+    if compiling or getattr(app.state, "compiled", None) is not None:
+        digest = schema_hash(app, result, tools, api_dependency is not None)
+        compiled = get_compiled(app, digest)
+        if compiling:
+            app.state.compiled_server = {"hash": digest, "models": {}}
+
+    app.router.route_class = ToolRoute
+    hedging = get_hedging_policy(app)
+    cache_policy = getattr(app.state, "cache_policy", None)
 
     for tool in tools:
         endpoint_name = tool.name
         endpoint_description = tool.description
 
-        inputSchema = tool.inputSchema
-        outputSchema = getattr(tool, "outputSchema", None)
-
-        form_model_fields = get_model_fields(
-            f"{endpoint_name}_form_model",
-            inputSchema.get("properties", {}),
-            inputSchema.get("required", []),
-            inputSchema.get("$defs", {}),
-        )
-
-        response_model_fields = None
-        if outputSchema:
-            response_model_fields = get_model_fields(
-                f"{endpoint_name}_response_model",
-                outputSchema.get("properties", {}),
-                outputSchema.get("required", []),
-                outputSchema.get("$defs", {}),
+        if compiled:
+            form_model, response_model = compiled["models"][endpoint_name]
+        else:
+            form_model, response_model = build_tool_models(tool)
+        if compiling:
+            app.state.compiled_server["models"][endpoint_name] = (
+                form_model,
+                response_model,
             )
 
+        if hedging:
+            hedging.mark_idempotent(tool)
+        if cache_policy:
+            cache_policy.mark_read_only(tool)
+
         tool_handler = get_tool_handler(
             app,
             session,
             endpoint_name,
-            form_model_fields,
-            response_model_fields,
+            form_model=form_model,
+            response_model=response_model,
         )
 
+        dependencies = [Depends(api_dependency)] if api_dependency else []
+        if getattr(app.state, "circuit_breakers", None):
+            dependencies.append(
+                Depends(get_circuit_breaker_dependency(app, endpoint_name))
+            )
+
         app.post(
             f"/{endpoint_name}",
             summary=endpoint_name.replace("_", " ").title(),
             description=endpoint_description,
             response_model_exclude_none=True,
-            dependencies=[Depends(api_dependency)] if api_dependency else [],
+            dependencies=dependencies,
         )(tool_handler)
 
+    openapi_cache = getattr(app.state, "openapi_cache", None)
+    if openapi_cache and compiled:
+        openapi_cache.load(compiled["openapi"])
+    elif openapi_cache:
+        # Tools changed: regenerate the spec now, off the event loop
+        await openapi_cache.rebuild()
+
+
+async def list_tools(app: FastAPI, session: ClientSession) -> List[types.Tool]:
+    """The server's tools, shared through the result cache when `schemaTtlSeconds` is set."""
+    cache = get_result_cache(app)
+    if cache is None or not cache.schema_ttl:
+        return (await session.list_tools()).tools
+
+    key = schema_cache_key(getattr(app.state, "server_name", app.title))
+    snapshot = await cache.get_json(key)
+    if snapshot is not None:
+        return [types.Tool.model_validate(tool) for tool in snapshot]
+    tools = (await session.list_tools()).tools
+    await cache.set_json(
+        key,
+        [tool.model_dump(mode="json", by_alias=True, exclude_none=True) for tool in tools],
+        cache.schema_ttl,
+    )
+    return tools
+
+
+def configure_http_pool(app: FastAPI, config=None) -> None:
+    app.state.http_pool = create_http_pool(config)
+    register_metrics(app, "http_pool", app.state.http_pool.snapshot)
+
+
+def configure_circuit_breaker(app: FastAPI, server_name: str, config) -> None:
+    breakers = create_circuit_breakers(server_name, config)
+    if breakers:
+        app.state.circuit_breakers = breakers
+        register_metrics(app, "circuit_breaker", breakers.snapshot)
+
+
+def configure_hedging(app: FastAPI, server_name: str, config) -> None:
+    hedging = create_hedging_policy(server_name, config)
+    if hedging:
+        app.state.hedging = hedging
+        register_metrics(app, "hedging", hedging.snapshot)
+
+
+def configure_fair_queue(app: FastAPI, server_name: str, config) -> None:
+    queue = create_fair_queue(server_name, config)
+    if queue:
+        app.state.fair_queue = queue
+        register_metrics(app, "queue", queue.snapshot)
+
+
+def configure_adaptive_concurrency(app: FastAPI, server_name: str, config) -> None:
+    """Call after configure_fair_queue: a queue then holds calls over the limit."""
+    limiter = create_adaptive_limit(server_name, config)
+    if limiter:
+        queue = getattr(app.state, "fair_queue", None)
+        if queue is not None:
+            limiter.attach(queue)
+        app.state.concurrency_limit = limiter
+        register_metrics(app, "concurrency", limiter.snapshot)
+
+
+def configure_compression(app: FastAPI, config):
+    compression = create_compression(config)
+    if compression:
+        app.add_middleware(CompressionMiddleware, compression=compression)
+    return compression
+
+
+def add_status_endpoints(main_app: FastAPI, api_dependency=None) -> None:
+    """Add `/_health` (unauthenticated) and `/_metrics` to the main app."""
+
+    @main_app.get("/_health", include_in_schema=False)
+    async def health():
+        servers = {
+            name: get_server_health(server_app)
+            for name, server_app in main_app.state.servers.items()
+        }
+        healthy = [s for s in servers.values() if s["status"] == "ok"]
+        if len(healthy) == len(servers):
+            status = "ok"
+        elif healthy:
+            status = "degraded"
+        else:
+            status = "unavailable"
+        return JSONResponse(
+            status_code=503 if status == "unavailable" else 200,
+            content={"status": status, "servers": servers},
+        )
+
+    @main_app.get(
+        "/_metrics",
+        include_in_schema=False,
+        dependencies=[Depends(api_dependency)] if api_dependency else [],
+    )
+    async def metrics(request: Request):
+        data = {
+            **collect_global_metrics(main_app),
+            "servers": {
+                name: collect_metrics(server_app)
+                for name, server_app in main_app.state.servers.items()
+            },
+        }
+        if request.query_params.get("format") == "prometheus" or (
+            "text/plain" in request.headers.get("accept", "")
+        ):
+            return PlainTextResponse(render_prometheus(data))
+        return data
+
+
+def get_upstream_connector(app: FastAPI, server_type, command, args, env):
+    """
+    Return the function that opens one session (one replica, or one affinity
+    session) to the app's server.
+    """
+    # Transport clients are imported only for the server types in use
+    if server_type == "stdio":
+        from mcp.client.stdio import StdioServerParameters, stdio_client
+
+        limits = getattr(app.state, "limits", None) or {}
+        # The exec wrapper applies the limits and reports the server's pid,
+        # which recycling needs to sample its memory and spares need so
+        # their exit is noticed before they are promoted
+        track_process = bool(
+            limits
+            or getattr(app.state, "recycle", None)
+            or getattr(app.state, "standby", None)
+        )
+
+        @asynccontextmanager
+        async def connect(replica):
+            server_command, server_args = command, args
+            if track_process:
+                fd, replica.pidfile = tempfile.mkstemp(prefix="mcpo-", suffix=".pid")
+                os.close(fd)
+                server_command, *server_args = wrap_command(
+                    command, args, limits, replica.pidfile
+                )
+            server_params = StdioServerParameters(
+                command=server_command,
+                args=server_args,
+                env={**os.environ, **env},
+            )
+            try:
+                async with stdio_client(server_params) as (reader, writer):
+                    async with ClientSession(reader, writer) as session:
+                        yield session
+            finally:
+                if replica.pidfile:
+                    try:
+                        os.unlink(replica.pidfile)
+                    except OSError:
+                        pass
+
+        return connect
+
+    headers = getattr(app.state, "headers", None)
+    http_pool = get_http_pool(app)
+
+    if server_type == "sse":
+        from mcp.client.sse import sse_client
+
+        @asynccontextmanager
+        async def connect(replica):
+            async with sse_client(
+                url=replica.endpoint.url or args[0],
+                headers=getattr(replica, "headers", None) or headers,
+                **http_pool.transport_kwargs(sse_read_timeout=None),
+            ) as (reader, writer):
+                async with ClientSession(reader, writer) as session:
+                    yield session
+
+        return connect
+
+    from mcp.client.streamable_http import streamablehttp_client
+
+    # Ensure URL has trailing slash to avoid redirects
+    url = args[0]
+    if not url.endswith("/"):
+        url = f"{url}/"
+
+    @asynccontextmanager
+    async def connect(replica):
+        async with streamablehttp_client(
+            url=replica.endpoint.url or url,
+            headers=getattr(replica, "headers", None) or headers,
+            **http_pool.transport_kwargs(sse_read_timeout=60 * 5),
+        ) as (reader, writer, _):
+            async with ClientSession(reader, writer) as session:
+                yield session
+
+    return connect
+
+
+def configure_process_limits(app: FastAPI, server_name: str, config) -> None:
+    if not config:
+        return
+    if getattr(app.state, "server_type", None) != "stdio":
+        logger.warning(f"'{server_name}': limits only apply to stdio servers")
+        return
+    if os.name != "posix":
+        logger.warning(f"'{server_name}': limits are not supported on this platform")
+        return
+    app.state.limits = {
+        CHILD_CONFIG_KEYS[k]: v for k, v in config.items() if k in CHILD_CONFIG_KEYS
+    }
+
+
+@asynccontextmanager
+async def run_lifespans(apps: List[FastAPI]):
+    """
+    Start the lifespans of `apps` one after the other and, on exit, stop them
+    all at once, so shutting down takes as long as the slowest server rather
+    than the sum of them.
+    """
+    stop = anyio.Event()
+
+    async def run_lifespan(app: FastAPI, *, task_status=anyio.TASK_STATUS_IGNORED):
+        async with app.router.lifespan_context(app):
+            task_status.started()
+            await stop.wait()
+
+    async with anyio.create_task_group() as tg:
+        try:
+            for app in apps:
+                await tg.start(run_lifespan, app)
+            yield
+        finally:
+            stop.set()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -97,56 +392,63 @@ async def lifespan(app: FastAPI):
         server_type == "sse" and not args[0]
     ):
         # Main app lifespan (when config_path is provided)
-        async with AsyncExitStack() as stack:
-            for route in app.routes:
-                if isinstance(route, Mount) and isinstance(route.app, FastAPI):
-                    await stack.enter_async_context(
-                        route.app.router.lifespan_context(route.app),  # noqa
-                    )
+        sub_apps = [
+            route.app
+            for route in app.routes
+            if isinstance(route, Mount) and isinstance(route.app, FastAPI)
+        ]
+        async with run_lifespans(sub_apps):
             yield
+            await drain_jobs(app)
     else:
-        if server_type == "stdio":
-            server_params = StdioServerParameters(
-                command=command,
-                args=args,
-                env={**os.environ, **env},
+        connect = get_upstream_connector(app, server_type, command, args, env)
+        async with AsyncExitStack() as stack:
+            if server_type != "stdio":
+                stack.push_async_callback(get_http_pool(app).aclose)
+            pool = await stack.enter_async_context(
+                create_upstream_pool(
+                    getattr(app.state, "server_name", app.title),
+                    connect,
+                    getattr(app.state, "recycle", None),
+                    getattr(app.state, "standby", None),
+                    getattr(app.state, "urls", None),
+                    getattr(app.state, "load_balancing", None),
+                )
             )
-
-            async with stdio_client(server_params) as (reader, writer):
-                async with ClientSession(reader, writer) as session:
-                    app.state.session = session
-                    await create_dynamic_endpoints(app, api_dependency=api_dependency)
-                    yield
-        if server_type == "sse":
-            headers = getattr(app.state, "headers", None)
-            async with sse_client(
-                url=args[0], sse_read_timeout=None, headers=headers
-            ) as (
-                reader,
-                writer,
-            ):
-                async with ClientSession(reader, writer) as session:
-                    app.state.session = session
-                    await create_dynamic_endpoints(app, api_dependency=api_dependency)
-                    yield
-        if server_type == "streamablehttp" or server_type == "streamable_http":
-            headers = getattr(app.state, "headers", None)
-
-            # Ensure URL has trailing slash to avoid redirects
-            url = args[0]
-            if not url.endswith("/"):
-                url = f"{url}/"
-
-            # Connect using streamablehttp_client from the SDK, similar to sse_client
-            async with streamablehttp_client(url=url, headers=headers) as (
-                reader,
-                writer,
-                _,  # get_session_id callback not needed for ClientSession
-            ):
-                async with ClientSession(reader, writer) as session:
-                    app.state.session = session
-                    await create_dynamic_endpoints(app, api_dependency=api_dependency)
-                    yield
+            app.state.upstream = pool
+            app.state.session = pool.session
+            register_metrics(app, "upstream", pool.snapshot)
+            affinity = create_session_affinity(
+                pool.name,
+                connect,
+                getattr(app.state, "affinity", None),
+                pool.endpoints,
+            )
+            if affinity:
+                app.state.session_affinity = await stack.enter_async_context(
+                    affinity
+                )
+                register_metrics(app, "affinity", affinity.snapshot)
+            await create_dynamic_endpoints(app, api_dependency=api_dependency)
+            yield
+            await drain_jobs(app)
+
+
+async def compile_servers(main_app: FastAPI, path: str) -> None:
+    """Start every server once and write their tool models and OpenAPI documents to `path`."""
+    async with main_app.router.lifespan_context(main_app):
+        servers = {}
+        for server_name, server_app in main_app.state.servers.items():
+            compiled_server = getattr(server_app.state, "compiled_server", None)
+            if compiled_server is None:
+                logger.warning(f"'{server_name}' did not start; not compiled")
+                continue
+            servers[server_name] = {
+                **compiled_server,
+                "openapi": server_app.state.openapi_cache.schema,
+            }
+        await asyncio.to_thread(write_module, path, servers)
+    logger.info(f"Compiled {len(servers)} server(s) to {path}")
 
 
 async def run(
@@ -156,10 +458,6 @@ async def run(
     cors_allow_origins=["*"],
     **kwargs,
 ):
-    # Server API Key
-    api_dependency = get_verify_api_key(api_key) if api_key else None
-    strict_auth = kwargs.get("strict_auth", False)
-
     # MCP Server
     server_type = kwargs.get(
         "server_type"
@@ -168,6 +466,20 @@ async def run(
 
     # MCP Config
     config_path = kwargs.get("config_path")
+    config_data = {}
+    if config_path:
+        with open(config_path, "r") as f:
+            config_data = json.load(f)
+
+    # Server API Keys: --api-key plus named keys from the config or --api-keys file
+    api_keys_config = config_data.get("apiKeys")
+    api_keys_path = kwargs.get("api_keys_path")
+    if api_keys_path:
+        with open(api_keys_path, "r") as f:
+            api_keys_config = json.load(f)
+    api_keys = create_api_key_registry(api_key, api_keys_config)
+    api_dependency = get_verify_api_key(api_keys) if api_keys else None
+    strict_auth = kwargs.get("strict_auth", False)
 
     # mcpo server
     name = kwargs.get("name") or "MCP OpenAPI Proxy"
@@ -180,6 +492,57 @@ async def run(
     ssl_keyfile = kwargs.get("ssl_keyfile")
     path_prefix = kwargs.get("path_prefix") or "/"
 
+    # Compress responses for clients that accept it (also per server in the config)
+    compression_config = kwargs.get("compression")
+
+    # Admin-only Server-Timing headers and sampling profiler
+    profiling = kwargs.get("profiling", False)
+    profiling_unauthenticated = kwargs.get("profiling_unauthenticated", False)
+    if profiling and not api_keys and not profiling_unauthenticated:
+        raise ValueError(
+            "--profiling needs an admin API key (--api-key, or an admin key in "
+            "--api-keys); use --profiling-unauthenticated to open it to anyone"
+        )
+
+    # Distributed tracing: --trace-* options, or a "tracing" config section
+    tracer = create_tracer(kwargs.get("tracing") or config_data.get("tracing"))
+
+    # Sampled tool calls written to a file for replay: --capture, or a "capture" config section
+    capture = create_traffic_capture(
+        kwargs.get("capture") or config_data.get("capture")
+    )
+
+    # `?async=1` tool calls: --async-jobs, or a "jobs" config section
+    jobs = create_job_store(kwargs.get("jobs") or config_data.get("jobs"))
+
+    # Idempotency-Key support: --idempotency, or an "idempotency" config section
+    idempotency = create_idempotency(
+        kwargs.get("idempotency") or config_data.get("idempotency")
+    )
+
+    # Drain deadline and SIGHUP restarts: --drain-timeout/--restart-on-hup, or a "shutdown" config section
+    graceful_shutdown = create_graceful_shutdown(
+        kwargs.get("shutdown") or config_data.get("shutdown")
+    )
+
+    # Unix domain socket and SO_REUSEPORT: --uds/--no-tcp/--reuse-port, or a "listen" config section
+    listeners = create_listeners(kwargs.get("listen") or config_data.get("listen"))
+
+    # Tool result cache shared by replicas: a "cache" config section
+    result_cache = create_result_cache(config_data.get("cache"))
+
+    # Ahead-of-time compiled tool models: written with --compile, loaded with --compiled
+    compile_path = kwargs.get("compile_path")
+    compiled_path = kwargs.get("compiled_path")
+    compiled = load_module(compiled_path) if compiled_path else None
+
+    # Large payloads through temporary files: --spool-threshold/--memory-budget, or a "spool" config section
+    spool = create_spool(kwargs.get("spool") or config_data.get("spool"))
+
+    # Offload parsing/validation/encoding of payloads above this many bytes
+    offload_threshold = kwargs.get("offload_threshold")
+    offload_workers = kwargs.get("offload_workers") or 4
+
     # Configure basic logging
     logging.basicConfig(
         level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -190,13 +553,47 @@ async def run(
     logger.info(f"  Description: {description}")
     logger.info(f"  Hostname: {socket.gethostname()}")
     logger.info(f"  Port: {port}")
-    logger.info(f"  API Key: {'Provided' if api_key else 'Not Provided'}")
+    if listeners and listeners.uds:
+        logger.info(f"  Unix Socket: {listeners.uds}")
+    logger.info(f"  API Keys: {len(api_keys) if api_keys else 'Not Provided'}")
     logger.info(f"  CORS Allowed Origins: {cors_allow_origins}")
     if ssl_certfile:
         logger.info(f"  SSL Certificate File: {ssl_certfile}")
     if ssl_keyfile:
         logger.info(f"  SSL Key File: {ssl_keyfile}")
     logger.info(f"  Path Prefix: {path_prefix}")
+    if profiling:
+        logger.info("  Profiling: enabled (/_profile, Server-Timing)")
+        if not api_keys:
+            logger.warning(
+                "Profiling endpoints are enabled without an API key and are unauthenticated (--profiling-unauthenticated)"
+            )
+    if tracer:
+        logger.info(
+            f"  Tracing: {type(tracer.exporter).__name__}, sample ratio {tracer.sample_ratio}"
+        )
+    if jobs:
+        logger.info(
+            f"  Async jobs: {jobs.max_running} running, {jobs.max_jobs} kept for {jobs.ttl:g}s"
+        )
+    if idempotency:
+        logger.info(
+            f"  Idempotency keys: {type(idempotency.store).__name__}, kept for {idempotency.ttl:g}s"
+        )
+    if result_cache:
+        logger.info(f"  Result cache: {result_cache.snapshot()['backend']}")
+    logger.info(f"  Drain timeout: {graceful_shutdown.drain_timeout:g}s")
+    if graceful_shutdown.restart_on_hup:
+        logger.info("  Restart on SIGHUP: enabled")
+    if offload_threshold:
+        logger.info(
+            f"  Offload: payloads >= {offload_threshold} bytes on {offload_workers} workers"
+        )
+    if spool:
+        logger.info(
+            f"  Spool: payloads >= {spool.request_threshold}/{spool.response_threshold} bytes, "
+            f"memory budget {spool.memory_budget or 'unlimited'}"
+        )
 
     main_app = FastAPI(
         title=name,
@@ -206,6 +603,7 @@ async def run(
         ssl_keyfile=ssl_keyfile,
         lifespan=lifespan,
     )
+    install_openapi_cache(main_app)
 
     main_app.add_middleware(
         CORSMiddleware,
@@ -215,9 +613,71 @@ async def run(
         allow_headers=["*"],
     )
 
+    compression = configure_compression(main_app, compression_config)
+    if compression:
+        logger.info(f"  Compression: {', '.join(compression.encodings)}")
+
     # Add middleware to protect also documentation and spec
-    if api_key and strict_auth:
-        main_app.add_middleware(APIKeyMiddleware, api_key=api_key)
+    if api_keys and strict_auth:
+        main_app.add_middleware(APIKeyMiddleware, api_key=api_keys)
+
+    if profiling:
+        # Outermost, so the total covers every other middleware
+        main_app.add_middleware(
+            ServerTimingMiddleware,
+            api_keys=api_keys,
+            unauthenticated=profiling_unauthenticated,
+        )
+        add_profiling_endpoints(
+            main_app, get_verify_admin_key(api_keys) if api_keys else None
+        )
+
+    if tracer:
+        # Outermost, so the request span covers every other middleware
+        main_app.add_middleware(TracingMiddleware, tracer=tracer)
+
+    # Outermost, so every response sent while draining closes its connection
+    main_app.add_middleware(DrainMiddleware, shutdown=graceful_shutdown)
+
+    main_app.state.servers = {}
+    add_status_endpoints(main_app, api_dependency)
+
+    loop_monitor = EventLoopLagMonitor()
+    register_global_metrics(main_app, "event_loop", loop_monitor.snapshot)
+    offloader = (
+        Offloader(offload_threshold, offload_workers) if offload_threshold else None
+    )
+    main_app.state.offloader = offloader
+    if offloader:
+        register_global_metrics(main_app, "offload", offloader.snapshot)
+    if api_keys:
+        register_global_metrics(main_app, "api_keys", api_keys.snapshot)
+    if compression:
+        register_global_metrics(main_app, "compression", compression.snapshot)
+    if tracer:
+        register_global_metrics(main_app, "tracing", tracer.snapshot)
+    main_app.state.jobs = jobs
+    main_app.state.graceful_shutdown = graceful_shutdown
+    main_app.state.idempotency = idempotency
+    main_app.state.result_cache = result_cache
+    if result_cache:
+        register_global_metrics(main_app, "cache", result_cache.snapshot)
+    if idempotency:
+        register_global_metrics(main_app, "idempotency", idempotency.snapshot)
+    main_app.state.capture = capture
+    if capture:
+        register_global_metrics(main_app, "capture", capture.snapshot)
+    main_app.state.spool = spool
+    if spool:
+        register_global_metrics(main_app, "spool", spool.snapshot)
+    if jobs:
+        add_job_endpoints(main_app, jobs, api_dependency)
+        register_global_metrics(main_app, "jobs", jobs.snapshot)
+    add_aggregated_openapi_endpoint(
+        main_app,
+        path_prefix,
+        [Depends(api_dependency)] if api_dependency else [],
+    )
 
     headers = kwargs.get("headers")
     if headers and isinstance(headers, str):
@@ -254,9 +714,6 @@ async def run(
         main_app.state.api_dependency = api_dependency
     elif config_path:
         logger.info(f"Loading MCP server configurations from: {config_path}")
-        with open(config_path, "r") as f:
-            config_data = json.load(f)
-
         mcp_servers = config_data.get("mcpServers", {})
         if not mcp_servers:
             logger.error(f"No 'mcpServers' found in config file: {config_path}")
@@ -264,6 +721,10 @@ async def run(
 
         logger.info("Configured MCP Servers:")
         for server_name_cfg, server_cfg_details in mcp_servers.items():
+            urls = server_cfg_details.get("urls")
+            if urls and not server_cfg_details.get("url"):
+                # Replicas of one remote server: the first URL stands for all
+                server_cfg_details["url"] = urls[0]
             if server_cfg_details.get("command"):
                 args_info = (
                     f" with args: {server_cfg_details['args']}"
@@ -295,7 +756,7 @@ async def run(
                     f"  Unknown configuration for MCP server: {server_name_cfg}"
                 )
 
-        main_app.description += "\n\n- **available tools**："
+        tool_list = ["\n\n- **available tools**："]
         for server_name, server_cfg in mcp_servers.items():
             sub_app = FastAPI(
                 title=f"{server_name}",
@@ -303,6 +764,7 @@ async def run(
                 version="1.0",
                 lifespan=lifespan,
             )
+            install_openapi_cache(sub_app)
 
             sub_app.add_middleware(
                 CORSMiddleware,
@@ -343,18 +805,81 @@ async def run(
                 sub_app.state.args = server_cfg["url"]
                 sub_app.state.headers = server_cfg.get("headers")
 
+            remote_type = getattr(sub_app.state, "server_type", None)
+            if server_cfg.get("urls") and remote_type in ("sse", "streamablehttp"):
+                sub_app.state.urls = [
+                    (
+                        f"{u}/"
+                        if remote_type == "streamablehttp" and not u.endswith("/")
+                        else u
+                    )
+                    for u in server_cfg["urls"]
+                ]
+                sub_app.state.load_balancing = server_cfg.get("loadBalancing")
+
+            server_compression = configure_compression(
+                sub_app, server_cfg.get("compression")
+            )
+            if server_compression:
+                register_metrics(sub_app, "compression", server_compression.snapshot)
+
             # Add middleware to protect also documentation and spec
-            if api_key and strict_auth:
-                sub_app.add_middleware(APIKeyMiddleware, api_key=api_key)
+            if api_keys and strict_auth:
+                sub_app.add_middleware(APIKeyMiddleware, api_key=api_keys)
 
             sub_app.state.api_dependency = api_dependency
+            sub_app.state.offloader = offloader
+            sub_app.state.jobs = jobs
+            sub_app.state.capture = capture
+            sub_app.state.spool = spool
+            sub_app.state.idempotency = idempotency
+            sub_app.state.result_cache = result_cache
+            sub_app.state.cache_policy = create_cache_policy(server_cfg.get("cache"))
+            if getattr(sub_app.state, "server_type", None) in ("sse", "streamablehttp"):
+                configure_http_pool(sub_app, server_cfg.get("http"))
+            configure_circuit_breaker(
+                sub_app, server_name, server_cfg.get("circuitBreaker")
+            )
+            configure_fair_queue(sub_app, server_name, server_cfg.get("queue"))
+            configure_adaptive_concurrency(
+                sub_app, server_name, server_cfg.get("concurrency")
+            )
+            configure_hedging(sub_app, server_name, server_cfg.get("hedging"))
+            configure_process_limits(sub_app, server_name, server_cfg.get("limits"))
+            sub_app.state.recycle = server_cfg.get("recycle")
+            sub_app.state.standby = server_cfg.get("standby")
+            sub_app.state.affinity = server_cfg.get("affinity")
+            sub_app.state.validate_output = server_cfg.get("validateOutput", True)
+            sub_app.state.compiled = compiled
+            sub_app.state.compiling = bool(compile_path)
+            sub_app.state.server_name = server_name
+            main_app.state.servers[server_name] = sub_app
 
             main_app.mount(f"{path_prefix}{server_name}", sub_app)
-            main_app.description += f"\n    - [{server_name}](/{server_name}/docs)"
+            tool_list.append(f"\n    - [{server_name}](/{server_name}/docs)")
+        main_app.description += "".join(tool_list)
     else:
         logger.error("MCPO server_command or config_path must be provided.")
         raise ValueError("You must provide either server_command or config.")
 
+    if not config_path:
+        # Single server mode: the main app is also the server app
+        if main_app.state.server_type in ("sse", "streamablehttp"):
+            configure_http_pool(main_app)
+        configure_circuit_breaker(main_app, name, kwargs.get("circuit_breaker"))
+        configure_fair_queue(main_app, name, kwargs.get("max_concurrency"))
+        configure_adaptive_concurrency(
+            main_app, name, kwargs.get("adaptive_concurrency")
+        )
+        main_app.state.affinity = kwargs.get("session_affinity")
+        main_app.state.validate_output = kwargs.get("validate_output", True)
+        main_app.state.compiled = compiled
+        main_app.state.compiling = bool(compile_path)
+        main_app.state.server_name = name
+        main_app.state.servers[name] = main_app
+
+    import uvicorn
+
     logger.info("Uvicorn server starting...")
     config = uvicorn.Config(
         app=main_app,
@@ -363,12 +888,38 @@ async def run(
         ssl_certfile=ssl_certfile,
         ssl_keyfile=ssl_keyfile,
         log_level="info",
+        timeout_graceful_shutdown=graceful_shutdown.drain_timeout,
     )
-    server = uvicorn.Server(config)
+    server = DrainingServer(config, graceful_shutdown)
 
+    loop_monitor.start()
+    if tracer:
+        tracer.start()
     try:
-        await server.serve()
+        if compile_path:
+            await compile_servers(main_app, compile_path)
+        else:
+            # Listening sockets handed over by the process this one replaces
+            sockets = inherited_sockets()
+            if listeners and sockets is None:
+                sockets = listeners.bind(host, port)
+            elif listeners:
+                listeners.adopt(sockets)
+            await server.serve(sockets=sockets)
     except asyncio.CancelledError:
-        server.should_exit = True
-        await server.shutdown()
-        raise 
+        if not compile_path:
+            server.should_exit = True
+            await server.shutdown()
+        raise
+    finally:
+        if listeners and not compile_path and not server.handed_over:
+            listeners.remove_uds()
+        await loop_monitor.stop()
+        if jobs:
+            await jobs.close()
+        if capture:
+            await capture.close()
+        if result_cache:
+            await result_cache.close()
+        if tracer:
+            await tracer.stop()
@@ -0,0 +1,168 @@
+"""
+Fakes shared by the tests: an MCP session, a connector handing out sessions
+to upstream pools and session affinity, and an app serving a tool the way
+mcpo does.
+"""
+
+import asyncio
+import inspect
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import httpx
+from fastapi import FastAPI, Request
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, CallToolResult, ErrorData, TextContent, Tool
+from pydantic import BaseModel
+
+from mcpo.utils.main import (
+    ToolRoute,
+    build_tool_models,
+    execute_tool_call,
+    get_tool_handler,
+)
+
+# For `{"a": 1, "extra": 2, "b": None}`, which it validates without `extra`
+OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {"a": {"type": "integer"}, "b": {"type": ["string", "null"]}},
+    "required": ["a"],
+}
+
+
+class SearchForm(BaseModel):
+    query: str
+    tags: list[str] = []
+
+
+def text_result(text: str) -> CallToolResult:
+    return CallToolResult(content=[TextContent(type="text", text=text)])
+
+
+class FakeSession:
+    """
+    Stands in for an MCP `ClientSession`. A call waits for the `asyncio.Event`
+    passed as its `wait` argument, if any, then `delay` seconds, then returns
+    `answer(session, name, arguments)` (awaited if need be), or the session's
+    id without one. A `broken` session fails every call like a closed
+    connection. Calls are recorded in `calls`.
+    """
+
+    def __init__(self, id=0, answer=None, delay=0.0, broken=False):
+        self.id = id
+        self.answer = answer
+        self.delay = delay
+        self.broken = broken
+        self.calls = []
+        self.cancelled = False
+        self.closed = False
+
+    async def initialize(self):
+        return SimpleNamespace(serverInfo=None, instructions=None)
+
+    async def call_tool(self, name, arguments=None, progress_callback=None):
+        arguments = arguments or {}
+        self.calls.append((name, arguments))
+        if self.broken:
+            raise McpError(
+                ErrorData(code=CONNECTION_CLOSED, message="Connection closed")
+            )
+        try:
+            if "wait" in arguments:
+                await arguments["wait"].wait()
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            if self.answer is None:
+                return self.id
+            result = self.answer(self, name, arguments)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def fake_connector(sessions=None, factory=None):
+    """
+    Connector for upstream pools and session affinity: a session from
+    `factory(replica)` (by default a `FakeSession` with the replica's id),
+    appended to `sessions` and marked closed when its replica stops.
+    """
+
+    @asynccontextmanager
+    async def connect(replica):
+        session = factory(replica) if factory else FakeSession(replica.id)
+        if sessions is not None:
+            sessions.append(session)
+        try:
+            yield session
+        finally:
+            session.closed = True
+
+    return connect
+
+
+def tool_app(
+    session,
+    tool="search",
+    form_model=None,
+    response_model=None,
+    path=None,
+    **state,
+) -> FastAPI:
+    """
+    An app serving `tool` from `session` at `path` (default `/{tool}`), with
+    `state` set on it. With a form model, the route is built like mcpo's own
+    (`get_tool_handler`); without one, the JSON body is passed on as the
+    arguments.
+    """
+    app = FastAPI()
+    app.router.route_class = ToolRoute
+    for name, value in state.items():
+        setattr(app.state, name, value)
+    path = path or f"/{tool}"
+
+    if form_model is not None:
+        handler = get_tool_handler(
+            app,
+            session,
+            tool,
+            form_model=form_model,
+            response_model=response_model,
+        )
+        app.post(path, response_model_exclude_none=True)(handler)
+    else:
+
+        @app.post(path)
+        async def handler(request: Request):
+            arguments = await request.json() if await request.body() else {}
+            return await execute_tool_call(request, app, session, tool, arguments)
+
+    return app
+
+
+def schema_tool_app(answer, output_schema=None, **state) -> FastAPI:
+    """
+    A `tool_app` for a `search` tool taking an integer `q` and answering
+    `answer` as JSON text, with its models built from `output_schema` the way
+    mcpo builds them.
+    """
+    tool = Tool(
+        name="search",
+        inputSchema={"type": "object", "properties": {"q": {"type": "integer"}}},
+        outputSchema=output_schema,
+    )
+    form_model, response_model = build_tool_models(tool)
+    session = FakeSession(answer=lambda *_: text_result(json.dumps(answer)))
+    return tool_app(
+        session, form_model=form_model, response_model=response_model, **state
+    )
+
+
+def asgi_client(app) -> httpx.AsyncClient:
+    """An async client talking to `app` in process."""
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://mcpo"
+    )
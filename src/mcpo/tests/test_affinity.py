@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from mcpo.tests.helpers import (
+    FakeSession,
+    asgi_client,
+    fake_connector,
+    text_result,
+    tool_app,
+)
+from mcpo.utils.affinity import AffinityFullError, create_session_affinity
+
+
+def count_answer(session, name, arguments):
+    """A stateful server: each session counts its own calls."""
+    return text_result(f"{session.id}:{len(session.calls)}")
+
+
+def counter_connector(sessions):
+    return fake_connector(
+        sessions, lambda pinned: FakeSession(pinned.id, answer=count_answer)
+    )
+
+
+def test_each_client_session_keeps_its_own_upstream_session():
+    sessions = []
+    app = tool_app(None, "count")
+
+    async def scenario():
+        affinity = create_session_affinity("s", counter_connector(sessions), True)
+        async with affinity:
+            app.state.session_affinity = affinity
+            async with asgi_client(app) as client:
+
+                async def call(session):
+                    response = await client.post(
+                        "/count", headers={"X-Mcpo-Session": session}
+                    )
+                    return response.json()
+
+                results = [await call(s) for s in ("a", "b", "a", "a", "b")]
+            return results, affinity.snapshot()
+
+    results, snapshot = asyncio.run(scenario())
+    assert results == ["0:1", "1:1", "0:2", "0:3", "1:2"]
+    assert snapshot["created"] == 2
+    assert all(s.closed for s in sessions)
+
+
+def test_sessions_are_reclaimed_idle_first_then_least_recently_used():
+    sessions = []
+
+    async def scenario():
+        affinity = create_session_affinity(
+            "s", counter_connector(sessions), {"maxSessions": 2, "idleSeconds": 0.2}
+        )
+        async with affinity:
+
+            async def call(key, **arguments):
+                async with affinity.lease(key) as pinned:
+                    return await pinned.session.call_tool("count", arguments)
+
+            release = asyncio.Event()
+            busy = [asyncio.create_task(call("a", wait=release))]
+            await asyncio.sleep(0.01)
+            await call("b")
+            # "b" is idle, so it makes room for "c"
+            busy.append(asyncio.create_task(call("c", wait=release)))
+            await asyncio.sleep(0.01)
+            with pytest.raises(AffinityFullError):
+                async with affinity.lease("d"):
+                    pass
+            release.set()
+            await asyncio.gather(*busy)
+            lru = affinity.snapshot()
+            await asyncio.sleep(0.5)
+            return lru, affinity.snapshot()
+
+    lru, idle = asyncio.run(scenario())
+    assert [s.id for s in sessions] == [0, 1, 2]
+    assert sessions[1].closed
+    assert lru["evicted_lru"] == 1 and lru["rejected"] == 1
+    assert lru["sessions"] == 2
+    assert idle["evicted_idle"] == 2 and idle["sessions"] == 0
@@ -0,0 +1,39 @@
+from pydantic import create_model
+
+from mcpo.bench.runner import compare_results, percentile
+from mcpo.bench.stub_server import build_input_schema, sample_arguments
+from mcpo.utils.main import get_model_fields
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 99) == 0.0
+
+
+def test_stub_arguments_validate_against_generated_model():
+    schema = build_input_schema(depth=2, width=6)
+    fields = get_model_fields(
+        "bench_form_model", schema["properties"], schema["required"]
+    )
+    FormModel = create_model("bench_form_model", **fields)
+    arguments = sample_arguments(schema)
+    model = FormModel.model_validate(arguments)
+    assert model.model_dump(exclude_none=True, by_alias=True)["query"] == "benchmark"
+
+
+def test_compare_results_flags_regressions():
+    def result(rps, p99):
+        return {
+            "transport": "stdio",
+            "requests_per_second": rps,
+            "latency_ms": {"p99": p99},
+            "startup_s": 1.0,
+        }
+
+    baseline = {"results": [result(1000, 10.0)]}
+    assert compare_results([result(990, 10.5)], baseline, 0.1) == []
+    regressions = compare_results([result(800, 20.0)], baseline, 0.1)
+    assert len(regressions) == 2
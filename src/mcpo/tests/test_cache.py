@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+from mcp.types import Tool, ToolAnnotations
+
+from mcpo.tests.helpers import OUTPUT_SCHEMA, asgi_client, schema_tool_app
+from mcpo.utils.cache import RedisBackend, create_cache_policy, create_result_cache
+
+
+async def start_redis_stand_in():
+    """A Redis-protocol server that knows GET and SET ... PX, for the L2 tests."""
+    data = {}
+
+    async def handle(reader, writer):
+        while True:
+            try:
+                command = await RedisBackend.read_reply(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                break
+            name = command[0].upper()
+            if name == b"GET":
+                value = data.get(command[1])
+                if value is not None and value[0] > time.monotonic():
+                    writer.write(b"$%d\r\n%s\r\n" % (len(value[1]), value[1]))
+                else:
+                    writer.write(b"$-1\r\n")
+            elif name == b"SET":
+                expires = time.monotonic() + int(command[4]) / 1000
+                data[command[1]] = (expires, command[2])
+                writer.write(b"+OK\r\n")
+            else:
+                writer.write(b"-ERR unknown command\r\n")
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def loader(calls):
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return JSONResponse({"answer": len(calls)})
+
+    return load
+
+
+def test_replicas_share_results_through_the_redis_backend():
+    async def scenario():
+        server, port = await start_redis_stand_in()
+        async with server:
+            url = f"redis://127.0.0.1:{port}/0"
+            one = create_result_cache({"backend": url})
+            two = create_result_cache({"backend": url})
+            calls = []
+            # Concurrent misses on one replica make a single upstream call
+            first = await asyncio.gather(
+                *(one.fetch("k", 60, loader(calls)) for _ in range(3))
+            )
+            from_l2 = await two.fetch("k", 60, loader(calls))
+            from_l1 = await two.fetch("k", 60, loader(calls))
+            await one.close()
+            await two.close()
+            return calls, first, from_l2, from_l1, one.snapshot(), two.snapshot()
+
+    calls, first, from_l2, from_l1, one, two = asyncio.run(scenario())
+    assert calls == [1]
+    assert {r.body for r in (*first, from_l2, from_l1)} == {b'{"answer":1}'}
+    assert [r.headers["x-cache"] for r in first] == ["MISS", "HIT", "HIT"]
+    assert one["coalesced"] == 2 and one["stores"] == 1
+    assert two["l2_hits"] == 1 and two["l1_hits"] == 1 and two["misses"] == 0
+
+
+def test_unreachable_backend_does_not_fail_calls():
+    async def scenario():
+        # Nothing listens on the port
+        cache = create_result_cache({"backend": "redis://127.0.0.1:1"})
+        calls = []
+        response = await cache.fetch("k", 60, loader(calls))
+        return response, cache.snapshot()
+
+    response, snapshot = asyncio.run(scenario())
+    assert response.body == b'{"answer":1}'
+    assert snapshot["backend_errors"] == 2
+
+
+def test_sqlite_backend_and_l1_bounds(tmp_path):
+    url = f"sqlite://{tmp_path / 'cache.db'}"
+
+    async def scenario():
+        one = create_result_cache({"backend": url, "l1Entries": 2})
+        for key in ("a", "b", "c"):
+            await one.set(key, key.encode(), 60)
+        two = create_result_cache({"backend": url})
+        return one.snapshot(), await two.get("a")
+
+    snapshot, shared = asyncio.run(scenario())
+    assert snapshot["l1_entries"] == 2
+    assert shared == b"a"
+
+
+def test_cache_policy_ttls():
+    policy = create_cache_policy({"ttlSeconds": 30, "tools": {"search": 300}})
+    schema = {"type": "object"}
+    policy.mark_read_only(
+        Tool(
+            name="get",
+            inputSchema=schema,
+            annotations=ToolAnnotations(readOnlyHint=True),
+        )
+    )
+    policy.mark_read_only(Tool(name="create", inputSchema=schema))
+
+    assert policy.ttl_for("search") == 300
+    assert policy.ttl_for("get") == 30
+    assert policy.ttl_for("create") == 0
+
+
+def test_cached_results_are_encoded_like_fresh_ones():
+    # Through the response model with an output schema, as is without one
+    answer = {"a": 1, "extra": 2, "b": None}
+    for output_schema, expected in ((OUTPUT_SCHEMA, {"a": 1}), (None, answer)):
+        uncached = schema_tool_app(answer, output_schema)
+        cached = schema_tool_app(
+            answer,
+            output_schema,
+            result_cache=create_result_cache(True),
+            cache_policy=create_cache_policy({"tools": {"search": 60}}),
+        )
+
+        async def scenario():
+            async with asgi_client(uncached) as client:
+                fresh = await client.post("/search", json={"q": 1})
+            async with asgi_client(cached) as client:
+                miss = await client.post("/search", json={"q": 1})
+                hit = await client.post("/search", json={"q": 1})
+            return fresh, miss, hit
+
+        fresh, miss, hit = asyncio.run(scenario())
+        assert [miss.headers["x-cache"], hit.headers["x-cache"]] == ["MISS", "HIT"]
+        assert fresh.content == miss.content == hit.content
+        assert fresh.json() == expected
@@ -0,0 +1,60 @@
+import asyncio
+
+from mcp.shared.exceptions import McpError
+from mcp.types import INTERNAL_ERROR, CallToolResult, ErrorData, TextContent
+
+from mcpo.bench.stub_server import ReplayedCalls
+from mcpo.tests.helpers import FakeSession, asgi_client, tool_app
+from mcpo.utils.capture import create_traffic_capture, read_capture
+
+
+def echo_answer(session, name, arguments):
+    if arguments.get("fail"):
+        raise McpError(ErrorData(code=INTERNAL_ERROR, message="broken"))
+    return CallToolResult(
+        content=[TextContent(type="text", text=arguments["q"])],
+        structuredContent={"q": arguments["q"]},
+    )
+
+
+def test_calls_are_captured_and_replayed_by_the_stub(tmp_path):
+    path = str(tmp_path / "capture.jsonl")
+    session = FakeSession(answer=echo_answer, delay=0.01)
+    app = tool_app(session, "find", path="/search/find", server_name="search")
+
+    async def scenario():
+        app.state.capture = create_traffic_capture({"path": path})
+        async with asgi_client(app) as client:
+            for arguments in ({"q": "a"}, {"q": "b"}, {"q": "c", "fail": True}):
+                await client.post("/search/find", json=arguments)
+        await app.state.capture.close()
+
+    asyncio.run(scenario())
+    records = read_capture(path)
+    assert [r["arguments"].get("q") for r in records] == ["a", "b", "c"]
+    assert records[0]["path"] == "/search/find"
+    assert records[0]["server"] == "search"
+    assert records[0]["latency_ms"] >= 10
+    assert records[1]["result"]["structuredContent"] == {"q": "b"}
+    assert records[2]["error"] == {"code": INTERNAL_ERROR, "message": "broken"}
+
+    calls = ReplayedCalls(path, server="search")
+    assert set(calls.properties["find"]) == {"q", "fail"}
+    assert calls.find("find", {"q": "b"})["result"] == records[1]["result"]
+    # Unseen arguments get the tool's captured results in turn
+    assert [calls.find("find", {"q": "z"})["arguments"]["q"] for _ in range(3)] == [
+        "a",
+        "b",
+        "c",
+    ]
+
+
+def test_sampling_and_size_limit(tmp_path):
+    path = str(tmp_path / "capture.jsonl")
+    capture = create_traffic_capture({"path": path, "sampleRate": 0, "maxBytes": 1})
+    assert not any(capture.sample() for _ in range(100))
+
+    capture.sample_rate = 1
+    capture.bytes = 1
+    assert not capture.sample()
+    assert capture.snapshot()["skipped_full"] == 1
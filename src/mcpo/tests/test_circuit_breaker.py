@@ -0,0 +1,101 @@
+from unittest.mock import patch
+
+from mcpo.utils.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    create_circuit_breakers,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, **kwargs):
+    options = dict(minimum_calls=4, failure_rate_threshold=0.5, open_seconds=10)
+    options.update(kwargs)
+    with patch("mcpo.utils.circuit_breaker.time.monotonic", clock):
+        return CircuitBreaker("test", **options)
+
+
+def test_opens_on_failure_rate_and_recovers_through_half_open():
+    clock = FakeClock()
+    with patch("mcpo.utils.circuit_breaker.time.monotonic", clock):
+        breaker = make_breaker(clock)
+        for success in (True, False, True, False):
+            assert breaker.acquire()
+            breaker.record(success, 0.01)
+        assert breaker.state == OPEN
+        assert not breaker.acquire()
+        assert breaker.retry_after() == 10
+
+        clock.now += 10
+        assert breaker.state == HALF_OPEN
+        assert breaker.acquire()
+        # Only one trial call at a time
+        assert not breaker.acquire()
+        breaker.record(True, 0.01)
+        assert breaker.state == CLOSED
+
+
+def test_half_open_failure_reopens():
+    clock = FakeClock()
+    with patch("mcpo.utils.circuit_breaker.time.monotonic", clock):
+        breaker = make_breaker(clock, minimum_calls=1, failure_rate_threshold=1.0)
+        breaker.acquire()
+        breaker.record(False, 0.01)
+        clock.now += 10
+        assert breaker.acquire()
+        breaker.record(False, 0.01)
+        assert breaker.state == OPEN
+        assert breaker.times_opened == 2
+
+
+def test_slow_calls_open_breaker_and_window_slides():
+    clock = FakeClock()
+    with patch("mcpo.utils.circuit_breaker.time.monotonic", clock):
+        breaker = make_breaker(
+            clock,
+            slow_call_duration_threshold=1.0,
+            slow_call_rate_threshold=0.8,
+            window_seconds=5,
+        )
+        for _ in range(2):
+            breaker.record(True, 2.0)
+        clock.now += 6
+        # The first slow calls slid out of the window
+        for _ in range(3):
+            breaker.record(True, 2.0)
+        breaker.record(True, 0.1)
+        assert breaker.state == CLOSED
+        breaker.record(True, 2.0)
+        assert breaker.state == OPEN
+
+
+def test_release_frees_half_open_slot():
+    clock = FakeClock()
+    with patch("mcpo.utils.circuit_breaker.time.monotonic", clock):
+        breaker = make_breaker(clock, minimum_calls=1, failure_rate_threshold=1.0)
+        breaker.record(False, 0.01)
+        clock.now += 10
+        assert breaker.acquire()
+        breaker.release()
+        assert breaker.acquire()
+
+
+def test_create_from_config():
+    assert create_circuit_breakers("server", None) is None
+    breakers = create_circuit_breakers(
+        "server", {"perTool": True, "minimumCalls": 3, "openSeconds": 5}
+    )
+    search = breakers.get("search")
+    assert search is breakers.get("search")
+    assert search is not breakers.get("fetch")
+    assert search.minimum_calls == 3 and search.open_seconds == 5
+    assert create_circuit_breakers("server", True).get("x").name == "server"
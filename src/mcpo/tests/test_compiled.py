@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from mcp import types
+
+from mcpo.utils.compiled import get_compiled, load_module, schema_hash, write_module
+from mcpo.utils.main import build_tool_models
+
+TOOL = types.Tool(
+    name="search",
+    description="Search things",
+    inputSchema={
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "What to look for"},
+            "limit": {"type": "integer", "default": 10},
+            "__top": {"type": "number"},
+            "mode": {"anyOf": [{"type": "string"}, {"type": "null"}]},
+            "value": {"type": ["string", "number"]},
+            "filters": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "field": {"type": "string"},
+                        "op": {"$ref": "#/$defs/Op"},
+                    },
+                    "required": ["field"],
+                },
+            },
+            "extra": {"type": "object"},
+        },
+        "required": ["query"],
+        "$defs": {"Op": {"type": "string", "description": "Operator"}},
+    },
+    outputSchema={
+        "type": "object",
+        "properties": {"hits": {"type": "array", "items": {"type": "string"}}},
+    },
+)
+
+
+def test_compiled_models_match_the_ones_built_from_schemas(tmp_path):
+    form_model, response_model = build_tool_models(TOOL)
+    path = str(tmp_path / "models.py")
+    write_module(
+        path,
+        {
+            "srv": {
+                "hash": "abc",
+                "models": {
+                    "search": (form_model, response_model),
+                    "ping": (None, None),
+                },
+                "openapi": {"openapi": "3.1.0"},
+            }
+        },
+    )
+
+    servers = load_module(path)
+    compiled_form, compiled_response = servers["srv"]["models"]["search"]
+    assert compiled_form.__name__ == form_model.__name__
+    assert compiled_form.model_json_schema() == form_model.model_json_schema()
+    assert compiled_response.model_json_schema() == response_model.model_json_schema()
+    assert servers["srv"]["models"]["ping"] == (None, None)
+
+    arguments = {"query": "q", "__top": 1.5, "filters": [{"field": "a", "op": "="}]}
+    assert compiled_form.model_validate(arguments).model_dump(
+        by_alias=True, exclude_none=True
+    ) == form_model.model_validate(arguments).model_dump(
+        by_alias=True, exclude_none=True
+    )
+
+
+def test_changed_tools_fall_back_to_live_schemas(tmp_path):
+    app = FastAPI()
+    app.state.server_name = "srv"
+    initialize_result = SimpleNamespace(serverInfo=None, instructions=None)
+    digest = schema_hash(app, initialize_result, [TOOL], secured=False)
+    app.state.compiled = {"srv": {"hash": digest, "models": {}, "openapi": "{}"}}
+    assert get_compiled(app, digest) is not None
+
+    changed = TOOL.model_copy(update={"description": "Search other things"})
+    assert schema_hash(app, initialize_result, [changed], secured=False) != digest
+    assert schema_hash(app, initialize_result, [TOOL], secured=True) != digest
+    assert get_compiled(app, "other") is None
+
+    # A module that does not load is ignored rather than failing startup
+    broken = tmp_path / "broken.py"
+    broken.write_text("FORMAT = (")
+    assert load_module(str(broken)) is None
@@ -0,0 +1,110 @@
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from mcpo.utils.compression import (
+    Compression,
+    CompressionMiddleware,
+    available_encodings,
+    parse_accept_encoding,
+)
+
+PAYLOAD = {"results": [{"id": i, "text": "lorem ipsum " * 10} for i in range(200)]}
+
+
+def _client(**options):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, compression=Compression(**options))
+
+    @app.get("/large")
+    async def large():
+        return PAYLOAD
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/tagged")
+    async def tagged():
+        return Response(
+            json.dumps(PAYLOAD), media_type="application/json", headers={"ETag": '"v1"'}
+        )
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(50):
+                yield b"x" * 4096
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    @app.get("/image")
+    async def image():
+        return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+    return TestClient(app)
+
+
+def _get_raw(client, path, accept_encoding):
+    """Fetch without letting the test client decode the body."""
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as r:
+        return r, b"".join(r.iter_raw())
+
+
+def _decompress(encoding, data):
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br":
+        import brotli
+
+        return brotli.decompress(data)
+    import zstandard
+
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+def test_negotiation_honours_quality_values():
+    compression = Compression(encodings=["gzip"])
+    assert parse_accept_encoding("gzip;q=0.5, br") == {"gzip": 0.5, "br": 1.0}
+    assert compression.negotiate("gzip, deflate") == "gzip"
+    assert compression.negotiate("gzip;q=0") is None
+    assert compression.negotiate("*") == "gzip"
+    assert compression.negotiate("identity") is None
+
+
+@pytest.mark.parametrize("encoding", available_encodings())
+def test_large_json_is_compressed(encoding):
+    client = _client(encodings=[encoding])
+    response, body = _get_raw(client, "/large", encoding)
+    assert response.headers["content-encoding"] == encoding
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert int(response.headers["content-length"]) == len(body)
+    assert json.loads(_decompress(encoding, body)) == PAYLOAD
+    assert len(body) < len(json.dumps(PAYLOAD)) / 4
+
+
+def test_small_and_binary_responses_are_left_alone():
+    client = _client(minimum_size=1024)
+    headers = {"Accept-Encoding": "gzip"}
+    assert "content-encoding" not in client.get("/small", headers=headers).headers
+    assert "content-encoding" not in client.get("/image", headers=headers).headers
+    identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+
+
+def test_streamed_responses_are_compressed_chunk_by_chunk():
+    client = _client(encodings=["gzip"])
+    response, body = _get_raw(client, "/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert _decompress("gzip", body) == b"x" * 4096 * 50
+
+
+def test_etag_becomes_weak_when_compressed():
+    client = _client(encodings=["gzip"])
+    response = client.get("/tagged", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["etag"] == 'W/"v1"'
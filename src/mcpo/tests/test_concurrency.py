@@ -0,0 +1,71 @@
+import asyncio
+
+from mcpo.tests.helpers import FakeSession, asgi_client, text_result, tool_app
+from mcpo.utils.concurrency import AdaptiveLimit, create_adaptive_limit
+from mcpo.utils.fair_queue import create_fair_queue
+
+
+def run_window(limit, latency, in_flight=None):
+    """Feed one window of calls, keeping `in_flight` of them running at once."""
+    in_flight = in_flight or limit.limit
+    for _ in range(limit.window_samples):
+        while limit.in_flight < in_flight:
+            limit.acquire()
+        limit.release(latency)
+    while limit.in_flight:
+        limit.release()
+
+
+def test_limit_follows_latency():
+    limit = AdaptiveLimit("s", initial_limit=10, window_samples=5)
+
+    for _ in range(10):
+        run_window(limit, 0.1)
+    grown = limit.limit
+    assert grown > 10
+
+    # Latency well beyond tolerance shrinks the limit
+    for _ in range(5):
+        run_window(limit, 0.5)
+    assert limit.limit < grown
+
+    # A failed call backs off at once
+    before = limit._limit
+    limit.acquire()
+    limit.release(0.1, dropped=True)
+    assert limit._limit == before * 0.9
+    assert limit.snapshot()["drops"] == 1
+
+
+def test_limit_does_not_grow_when_unused():
+    limit = AdaptiveLimit("s", initial_limit=10, window_samples=5)
+    for _ in range(10):
+        run_window(limit, 0.1, in_flight=2)
+    assert limit.limit == 10
+
+
+def test_calls_over_the_limit_are_rejected():
+    limit = create_adaptive_limit("s", {"initialLimit": 2, "maxLimit": 2})
+    session = FakeSession(answer=lambda *_: text_result("ok"), delay=0.05)
+    app = tool_app(session, concurrency_limit=limit)
+
+    async def scenario():
+        async with asgi_client(app) as client:
+            return await asyncio.gather(*(client.post("/search") for _ in range(3)))
+
+    responses = asyncio.run(scenario())
+    assert sorted(r.status_code for r in responses) == [200, 200, 503]
+    rejected = next(r for r in responses if r.status_code == 503)
+    assert rejected.headers["retry-after"] == "1"
+    snapshot = app.state.concurrency_limit.snapshot()
+    assert snapshot["rejected"] == 1 and snapshot["in_flight"] == 0
+
+
+def test_queue_enforces_the_limit_up_to_its_own():
+    queue = create_fair_queue("s", {"maxConcurrency": 8})
+    limit = create_adaptive_limit("s", {"initialLimit": 20, "maxLimit": 50})
+    limit.attach(queue)
+    assert queue.limit == limit.limit == 8
+    # Calls over the limit are left to the queue
+    for _ in range(9):
+        assert limit.acquire()
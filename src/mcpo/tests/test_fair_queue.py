@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from mcpo.utils.fair_queue import WeightedFairQueue, create_fair_queue
+from mcpo.utils.rate_limit import APIKey, TokenBucket, create_api_key_registry
+
+
+def test_queue_serves_clients_by_weight():
+    async def scenario():
+        queue = WeightedFairQueue("test", limit=1)
+        order = []
+        release = asyncio.Event()
+
+        async def call(client, weight):
+            async with queue.slot(client, weight):
+                order.append(client)
+                await release.wait()
+
+        # Hold the only slot, then let a noisy client queue up before others
+        holder = asyncio.create_task(call("holder", 1))
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(call("noisy", 1)) for _ in range(6)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(call("heavy", 2)) for _ in range(4)]
+        await asyncio.sleep(0)
+        assert queue.queued == 10
+
+        release.set()
+        await asyncio.gather(holder, *tasks)
+        return order, queue.snapshot()
+
+    order, snapshot = asyncio.run(scenario())
+    # heavy (weight 2) gets two slots for every one of noisy's, despite arriving later
+    assert order[1] == "heavy"
+    assert order[1:7].count("heavy") == 4
+    assert snapshot["per_client"]["noisy"]["admitted"] == 6
+    assert snapshot["active"] == 0 and snapshot["queued"] == 0
+
+
+def test_queue_rejects_when_full_or_timed_out():
+    async def scenario():
+        queue = create_fair_queue(
+            "test", {"maxConcurrency": 1, "maxQueued": 1, "queueTimeout": 0.05}
+        )
+        await queue.acquire("a")
+        waiter = asyncio.create_task(queue.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as full:
+            await queue.acquire("c")
+        with pytest.raises(HTTPException) as timed_out:
+            await waiter
+        queue.release()
+        return queue, full.value, timed_out.value
+
+    queue, full, timed_out = asyncio.run(scenario())
+    assert full.status_code == timed_out.status_code == 503
+    assert queue.active == 0 and queue.queued == 0
+    assert queue.snapshot()["per_client"]["b"]["rejected"] == 1
+
+
+def test_token_bucket_limits_api_key():
+    key = APIKey("agent", "secret", rate=1, burst=2)
+    assert key.check_rate_limit() == 0
+    assert key.check_rate_limit() == 0
+    assert 0 < key.check_rate_limit() <= 1
+    assert key.snapshot()["limited"] == 1
+
+    bucket = TokenBucket(rate=10)
+    assert bucket.burst == 10
+
+
+def test_api_key_registry_from_config():
+    registry = create_api_key_registry(
+        "shared", {"a": "secret-a", "b": {"key": "secret-b", "rate": 5, "weight": 3}}
+    )
+    assert registry.lookup("shared").name == "default"
+    assert registry.lookup("secret-b").weight == 3
+    assert registry.lookup("nope") is None
+    assert create_api_key_registry(None, None) is None
+    with pytest.raises(ValueError):
+        create_api_key_registry("same", {"a": "same"})
@@ -0,0 +1,74 @@
+import asyncio
+
+from mcp.types import Tool, ToolAnnotations
+
+from mcpo.tests.helpers import FakeSession, fake_connector
+from mcpo.utils.hedging import MIN_SAMPLES, create_hedging_policy
+from mcpo.utils.upstream import create_upstream_pool
+
+
+async def delayed_answer(session, name, arguments):
+    """Answers with its URL after the delay given for that URL in the arguments."""
+    await asyncio.sleep(arguments.get(session.id, 0))
+    return session.id
+
+
+def url_session(replica):
+    return FakeSession(replica.endpoint.url, answer=delayed_answer)
+
+
+async def run_hedged(policy, delays):
+    sessions = []
+    pool = create_upstream_pool(
+        "test", fake_connector(sessions, url_session), urls=["http://a", "http://b"]
+    )
+    async with pool:
+
+        async def call(replica):
+            return await replica.session.call_tool("tool", delays)
+
+        for _ in range(MIN_SAMPLES):
+            await policy.call(pool, "tool", lambda r: r.session.call_tool("tool", {}))
+        result = await policy.call(pool, "tool", call)
+    return result, [s.id for s in sessions if s.cancelled]
+
+
+def test_slow_call_is_hedged_onto_another_replica():
+    policy = create_hedging_policy("test", {"minDelayMs": 10})
+
+    # leastInFlight sends the primary to http://a, which is stuck
+    result, cancelled = asyncio.run(run_hedged(policy, {"http://a": 10}))
+
+    assert result == "http://b"
+    assert cancelled == ["http://a"]
+    snapshot = policy.snapshot()
+    assert snapshot["hedges"] == 1 and snapshot["hedge_wins"] == 1
+    assert snapshot["per_tool"]["tool"]["delay_ms"] == 10.0
+
+
+def test_hedges_are_capped_by_the_hedge_ratio():
+    # 21 calls at 1% earn a fifth of a hedge: not enough for one
+    policy = create_hedging_policy("test", {"minDelayMs": 10, "maxHedgeRatio": 0.01})
+
+    result, cancelled = asyncio.run(run_hedged(policy, {"http://a": 0.05}))
+
+    assert result == "http://a"
+    assert not cancelled
+    snapshot = policy.snapshot()
+    assert snapshot["hedges"] == 0 and snapshot["skipped_budget"] == 1
+
+
+def test_only_idempotent_tools_are_hedged():
+    policy = create_hedging_policy("test", {"tools": ["search"]})
+    schema = {"type": "object"}
+    policy.mark_idempotent(
+        Tool(
+            name="get",
+            inputSchema=schema,
+            annotations=ToolAnnotations(readOnlyHint=True),
+        )
+    )
+    policy.mark_idempotent(Tool(name="create", inputSchema=schema))
+
+    assert policy.applies("search") and policy.applies("get")
+    assert not policy.applies("create")
@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+
+from mcpo.utils.http_client import create_http_pool
+
+
+def test_closing_sdk_client_keeps_shared_pool_open():
+    pool = create_http_pool({"maxConnections": 5, "connectTimeout": 1.5})
+    closed = []
+
+    async def close():
+        closed.append(True)
+
+    pool.transport.aclose = close
+
+    async def main():
+        client = pool.client_factory(timeout=httpx.Timeout(5, read=None))
+        assert client.timeout.connect == 1.5
+        assert client.timeout.read is None
+        assert client.timeout.write == 5
+        await client.aclose()
+        assert closed == []
+        await pool.aclose()
+        assert closed == [True]
+
+    asyncio.run(main())
+    assert pool.limits.max_connections == 5
+    assert pool.clients_created == 1
+
+
+def test_transport_kwargs_read_timeout_override():
+    assert create_http_pool().transport_kwargs(None)["sse_read_timeout"] is None
+    pool = create_http_pool({"readTimeout": 120})
+    kwargs = pool.transport_kwargs(300)
+    assert kwargs["sse_read_timeout"] == 120
+    assert kwargs["httpx_client_factory"] == pool.client_factory
+
+
+def test_trace_context_in_request_meta_becomes_a_header():
+    pool = create_http_pool()
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("traceparent"))
+        return httpx.Response(202)
+
+    pool.transport = httpx.MockTransport(handler)
+    traceparent = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+    async def main():
+        client = pool.client_factory()
+        meta = {"_meta": {"traceparent": traceparent}, "name": "search"}
+        await client.post("http://mcp/", json={"method": "tools/call", "params": meta})
+        await client.post("http://mcp/", json={"method": "tools/list"})
+        await client.aclose()
+
+    asyncio.run(main())
+    assert seen == [traceparent, None]
@@ -0,0 +1,104 @@
+import asyncio
+
+from fastapi import HTTPException, Request
+
+from mcpo.tests.helpers import (
+    OUTPUT_SCHEMA,
+    FakeSession,
+    asgi_client,
+    schema_tool_app,
+    text_result,
+    tool_app,
+)
+from mcpo.utils.idempotency import create_idempotency
+
+
+def count_answer(session, name, arguments):
+    return text_result(f"call {len(session.calls)}")
+
+
+def test_retries_with_the_same_key_reuse_the_first_result():
+    session = FakeSession(answer=count_answer, delay=0.05)
+    app = tool_app(session, idempotency=create_idempotency(True))
+
+    async def scenario():
+        async with asgi_client(app) as client:
+
+            def post(key, arguments):
+                return client.post(
+                    "/search", json=arguments, headers={"Idempotency-Key": key}
+                )
+
+            # The retry arrives while the first call is still running
+            first, concurrent = await asyncio.gather(
+                post("a", {"q": 1}), post("a", {"q": 1})
+            )
+            later = await post("a", {"q": 1})
+            changed = await post("a", {"q": 2})
+            other = await post("b", {"q": 1})
+        return first, concurrent, later, changed, other
+
+    first, concurrent, later, changed, other = asyncio.run(scenario())
+    assert first.json() == concurrent.json() == later.json() == "call 1"
+    assert "idempotent-replayed" not in first.headers
+    assert later.headers["idempotent-replayed"] == "true"
+    assert changed.status_code == 422
+    assert other.json() == "call 2"
+    assert len(session.calls) == 2
+    snapshot = app.state.idempotency.snapshot()
+    assert snapshot["executed"] == 2 and snapshot["replayed"] == 2
+    assert snapshot["waited"] == 1 and snapshot["mismatches"] == 1
+
+
+def test_sqlite_store_is_shared_and_server_errors_are_not_kept(tmp_path):
+    path = str(tmp_path / "keys.db")
+    # Two instances on one file, as two mcpo processes would have
+    one, two = create_idempotency(path), create_idempotency({"path": path})
+    request = Request(
+        {"type": "http", "headers": [(b"idempotency-key", b"k")], "query_string": b""}
+    )
+    calls = []
+
+    async def ok():
+        calls.append("ok")
+        return {"answer": 42}
+
+    async def broken():
+        calls.append("broken")
+        raise HTTPException(status_code=502, detail="upstream failed")
+
+    async def scenario():
+        try:
+            await one.run(request, "s", "tool", {}, broken)
+        except HTTPException as e:
+            assert e.status_code == 502
+        first = await one.run(request, "s", "tool", {}, ok)
+        replayed = await two.run(request, "s", "tool", {}, ok)
+        return first, replayed
+
+    first, replayed = asyncio.run(scenario())
+    assert calls == ["broken", "ok"]
+    assert replayed.body == first.body == b'{"answer":42}'
+    assert replayed.headers["idempotent-replayed"] == "true"
+
+
+def test_stored_results_are_encoded_like_fresh_ones():
+    # Through the response model with an output schema, as is without one
+    answer = {"a": 1, "extra": 2, "b": None}
+    for output_schema, expected in ((OUTPUT_SCHEMA, {"a": 1}), (None, answer)):
+        app = schema_tool_app(
+            answer, output_schema, idempotency=create_idempotency(True)
+        )
+
+        async def scenario():
+            async with asgi_client(app) as client:
+                fresh = await client.post("/search", json={"q": 1})
+                headers = {"Idempotency-Key": "k"}
+                first = await client.post("/search", json={"q": 1}, headers=headers)
+                replayed = await client.post("/search", json={"q": 1}, headers=headers)
+            return fresh, first, replayed
+
+        fresh, first, replayed = asyncio.run(scenario())
+        assert replayed.headers["idempotent-replayed"] == "true"
+        assert fresh.content == first.content == replayed.content
+        assert fresh.json() == expected
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+# Generous default so slow CI machines pass; tighten locally with the env var
+IMPORT_BUDGET_MS = float(os.environ.get("MCPO_IMPORT_BUDGET_MS", "400"))
+
+
+def _import_times(module: str) -> dict:
+    """Cumulative import time in microseconds per module, from `python -X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_is_within_budget():
+    times = _import_times("mcpo.cli")
+    # The server stack is only loaded once the command line has been parsed
+    for heavy in ("fastapi", "mcp", "uvicorn", "dotenv", "mcpo.main"):
+        assert heavy not in times, f"{heavy} is imported by the CLI module"
+    assert times["mcpo.cli"] / 1000 < IMPORT_BUDGET_MS
+
+
+def test_package_import_does_not_load_the_cli():
+    assert "typer" not in _import_times("mcpo")
+
+
+def test_server_import_skips_unused_libraries():
+    times = _import_times("mcpo.main")
+    # uvicorn and dotenv are not checked: the MCP SDK's package init pulls them in
+    for unused in ("passlib", "jwt", "typer"):
+        assert unused not in times, f"{unused} is imported by mcpo.main"
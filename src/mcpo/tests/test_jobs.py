@@ -0,0 +1,128 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from mcpo.tests.helpers import OUTPUT_SCHEMA, asgi_client, schema_tool_app
+from mcpo.utils.jobs import (
+    JobStore,
+    JobStoreFullError,
+    add_job_endpoints,
+    create_job_store,
+)
+from mcpo.utils.main import execute_tool_call
+
+
+def test_async_call_reports_progress_and_result():
+    server = FastMCP("slow")
+    gate = {}
+
+    @server.tool()
+    async def slow(ctx: Context) -> str:
+        await ctx.report_progress(1, 2, "halfway")
+        await gate["event"].wait()
+        return "done"
+
+    async def scenario():
+        gate["event"] = asyncio.Event()
+        async with create_connected_server_and_client_session(
+            server._mcp_server
+        ) as session:
+            app = FastAPI()
+            app.state.session = session
+            app.state.jobs = create_job_store(True)
+            add_job_endpoints(app, app.state.jobs)
+
+            @app.post("/slow")
+            async def tool(request: Request):
+                return await execute_tool_call(request, app, session, "slow", {})
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://mcpo"
+            ) as client:
+                accepted = await client.post(
+                    "/slow", headers={"Prefer": "respond-async"}
+                )
+                job_url = accepted.headers["Location"]
+                while True:
+                    running = (await client.get(job_url)).json()
+                    if "progress" in running:
+                        break
+                    await asyncio.sleep(0.01)
+
+                gate["event"].set()
+                finished = (await client.get(job_url, params={"wait": 5})).json()
+                missing = await client.get("/_jobs/unknown")
+        return accepted, running, finished, missing
+
+    accepted, running, finished, missing = asyncio.run(scenario())
+    assert accepted.status_code == 202 and accepted.json()["status"] == "pending"
+    assert running["status"] == "running"
+    assert running["progress"] == {"progress": 1, "total": 2, "message": "halfway"}
+    assert finished["status"] == "succeeded"
+    # The tool's structuredContent, as FastMCP wraps a str result
+    assert finished["result"] == {"result": "done"}
+    assert missing.status_code == 404
+
+
+def test_jobs_can_be_cancelled_and_only_finished_ones_are_evicted():
+    async def scenario():
+        store = JobStore(max_running=1, max_jobs=2)
+        started = asyncio.Event()
+
+        async def forever():
+            started.set()
+            await asyncio.Event().wait()
+
+        async def quick():
+            return 42
+
+        running = store.submit("s", "forever", None, forever)
+        queued = store.submit("s", "quick", None, quick)
+        await started.wait()
+        # Both slots hold unfinished jobs
+        with pytest.raises(JobStoreFullError):
+            store.submit("s", "quick", None, quick)
+
+        await store.cancel(running)
+        await store.wait(queued, 1)
+        # The oldest finished job makes room for a new one
+        latest = store.submit("s", "quick", None, quick)
+        await store.wait(latest, 1)
+        return running, queued, latest, store
+
+    running, queued, latest, store = asyncio.run(scenario())
+    assert running.status == "cancelled"
+    assert queued.status == "succeeded" and queued.result == 42
+    assert store.get(running.id, None) is None
+    assert store.get(latest.id, None) is latest
+    # Jobs are only visible to the API key that submitted them
+    assert store.get(latest.id, "someone-else") is None
+    snapshot = store.snapshot()
+    assert snapshot["evicted"] == 1 and snapshot["rejected"] == 1
+
+
+def test_job_results_are_encoded_like_synchronous_ones():
+    # Through the response model with an output schema, as is without one
+    answer = {"a": 1, "extra": 2, "b": None}
+    for output_schema, expected in ((OUTPUT_SCHEMA, {"a": 1}), (None, answer)):
+        app = schema_tool_app(answer, output_schema, jobs=create_job_store(True))
+        add_job_endpoints(app, app.state.jobs)
+
+        async def scenario():
+            async with asgi_client(app) as client:
+                synchronous = await client.post("/search", json={"q": 1})
+                accepted = await client.post(
+                    "/search", json={"q": 1}, headers={"Prefer": "respond-async"}
+                )
+                job_url = accepted.headers["Location"]
+                finished = await client.get(job_url, params={"wait": 5})
+            return synchronous, finished.json()
+
+        synchronous, finished = asyncio.run(scenario())
+        assert finished["status"] == "succeeded"
+        assert finished["result"] == synchronous.json() == expected
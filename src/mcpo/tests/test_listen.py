@@ -0,0 +1,43 @@
+import os
+import socket
+
+import pytest
+
+from mcpo.utils.listen import bind_uds, create_listeners
+
+
+def test_unix_socket_replaces_stale_files_only(tmp_path):
+    path = str(tmp_path / "mcpo.sock")
+    listeners = create_listeners({"uds": path, "tcp": False})
+    (sock,) = listeners.bind("127.0.0.1", 0)
+    sock.listen()
+    assert oct(os.stat(path).st_mode & 0o777) == "0o666"
+    # Someone is listening: refuse instead of stealing the path
+    with pytest.raises(OSError):
+        bind_uds(path)
+
+    sock.close()
+    # Left behind by a process that is gone: replaced
+    stale = bind_uds(path)
+    stale.close()
+
+    listeners.remove_uds()
+    assert not os.path.exists(path)
+
+    (tmp_path / "file").write_text("")
+    with pytest.raises(OSError):
+        bind_uds(str(tmp_path / "file"))
+
+
+def test_reuse_port_lets_processes_share_a_port():
+    listeners = create_listeners({"reusePort": True})
+    (first,) = listeners.bind("127.0.0.1", 0)
+    port = first.getsockname()[1]
+    (second,) = listeners.bind("127.0.0.1", port)
+    assert first.proto == socket.IPPROTO_TCP
+    first.close()
+    second.close()
+    # Neither option: uvicorn binds host and port itself
+    assert create_listeners({"tcp": True}) is None
+    with pytest.raises(ValueError):
+        create_listeners({"tcp": False})
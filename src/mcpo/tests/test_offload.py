@@ -0,0 +1,88 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from mcp import types
+
+from mcpo.tests.helpers import FakeSession, SearchForm, text_result, tool_app
+from mcpo.utils.main import encode_tool_response
+from mcpo.utils.offload import Offloader, body_parsed, set_parsed_body
+
+
+def count_tags(session, name, arguments):
+    return text_result(
+        json.dumps({"query": arguments["query"], "tags": len(arguments["tags"])})
+    )
+
+
+def _client(offloader):
+    session = FakeSession(answer=count_tags)
+    return TestClient(tool_app(session, form_model=SearchForm, offloader=offloader))
+
+
+def test_large_bodies_are_validated_in_the_worker_pool():
+    offloader = Offloader(threshold=1000)
+    client = _client(offloader)
+
+    response = client.post("/search", json={"query": "x", "tags": ["a"] * 500})
+    assert response.status_code == 200
+    assert response.json() == {"query": "x", "tags": 500}
+
+    response = client.post("/search", json={"query": 1, "tags": ["a"] * 500})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "query"]
+
+    response = client.post(
+        "/search",
+        content=b'{"query": "x", "tags": [' + b'"a",' * 500 + b"]}",
+        headers={"content-type": "application/json"},
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "json_invalid"
+
+    assert offloader.offloaded == 3
+
+    # Small body and result: both stay on the event loop
+    inline = offloader.inline
+    response = client.post("/search", json={"query": "small"})
+    assert response.status_code == 200
+    assert offloader.inline == inline + 2 and offloader.offloaded == 3
+
+
+def test_encode_tool_response_matches_fastapi_encoding():
+    result = types.CallToolResult(
+        content=[types.TextContent(type="text", text=json.dumps({"query": "x"}))]
+    )
+    response = encode_tool_response(result, SearchForm)
+    assert json.loads(response.body) == {"query": "x", "tags": []}
+
+
+def test_fastapi_takes_bodies_parsed_beforehand():
+    # Guards the private Starlette attributes set_parsed_body relies on: if
+    # FastAPI reads the body some other way, it parses the one that was sent
+    parsed = SearchForm(query="parsed beforehand")
+    received = []
+
+    class ParsedBodyRoute(APIRoute):
+        def get_route_handler(self):
+            handler = super().get_route_handler()
+
+            async def app(request):
+                set_parsed_body(request, b"{}", parsed)
+                assert body_parsed(request)
+                return await handler(request)
+
+            return app
+
+    app = FastAPI()
+    app.router.route_class = ParsedBodyRoute
+
+    @app.post("/search")
+    async def search(form_data: SearchForm):
+        received.append(form_data)
+        return {}
+
+    response = TestClient(app).post("/search", json={"query": "sent"})
+    assert response.status_code == 200
+    assert received == [parsed]
@@ -0,0 +1,72 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from mcpo.utils.openapi import install_openapi_cache, merge_openapi_documents
+
+
+def _document(model_schema):
+    return {
+        "paths": {
+            "/search": {
+                "post": {
+                    "requestBody": {
+                        "content": {
+                            "application/json": {
+                                "schema": {"$ref": "#/components/schemas/search_form_model"}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        "components": {"schemas": {"search_form_model": model_schema}},
+    }
+
+
+def test_merge_prefixes_paths_and_renames_clashing_components():
+    first = _document({"type": "object", "properties": {"q": {"type": "string"}}})
+    second = _document({"type": "object", "properties": {"n": {"type": "integer"}}})
+    merged = merge_openapi_documents(
+        {"title": "all"}, {"a": ("/a", first), "b": ("/b", second)}
+    )
+
+    assert set(merged["paths"]) == {"/a/search", "/b/search"}
+    assert set(merged["components"]["schemas"]) == {
+        "search_form_model",
+        "b__search_form_model",
+    }
+    b_ref = merged["paths"]["/b/search"]["post"]["requestBody"]["content"][
+        "application/json"
+    ]["schema"]["$ref"]
+    assert b_ref == "#/components/schemas/b__search_form_model"
+    assert merged["paths"]["/a/search"]["post"]["tags"] == ["a"]
+    # Inputs are left untouched
+    assert "tags" not in first["paths"]["/search"]["post"]
+
+
+def test_cached_openapi_supports_conditional_get_and_rebuild():
+    app = FastAPI(title="cached")
+    cache = install_openapi_cache(app)
+
+    @app.post("/first")
+    async def first():
+        return {}
+
+    client = TestClient(app)
+    response = client.get("/openapi.json")
+    etag = response.headers["etag"]
+    assert "/first" in response.json()["paths"]
+    assert client.get("/openapi.json", headers={"If-None-Match": etag}).status_code == 304
+
+    @app.post("/second")
+    async def second():
+        return {}
+
+    # Served from cache until the tools change and the cache is rebuilt
+    assert "/second" not in client.get("/openapi.json").json()["paths"]
+    asyncio.run(cache.rebuild())
+    response = client.get("/openapi.json", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "/second" in response.json()["paths"]
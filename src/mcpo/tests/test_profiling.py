@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from mcpo.main import run
+from mcpo.utils.auth import get_verify_admin_key, get_verify_api_key
+from mcpo.utils.profiling import (
+    SamplingProfiler,
+    ServerTimingMiddleware,
+    add_profiling_endpoints,
+    render_collapsed,
+    timed_phase,
+)
+from mcpo.utils.rate_limit import create_api_key_registry
+
+
+def _app(api_keys=None, unauthenticated=False):
+    app = FastAPI()
+    app.add_middleware(
+        ServerTimingMiddleware, api_keys=api_keys, unauthenticated=unauthenticated
+    )
+    dependencies = [Depends(get_verify_api_key(api_keys))] if api_keys else []
+
+    @app.get("/work", dependencies=dependencies)
+    async def work():
+        with timed_phase("upstream"):
+            time.sleep(0.01)
+        return {}
+
+    return app
+
+
+def test_server_timing_only_when_requested():
+    client = TestClient(_app(unauthenticated=True))
+    assert "server-timing" not in client.get("/work").headers
+
+    timing = client.get("/work", headers={"X-Server-Timing": "1"}).headers[
+        "server-timing"
+    ]
+    phases = dict(part.split(";dur=") for part in timing.split(", "))
+    assert set(phases) == {"upstream", "total"}
+    assert float(phases["upstream"]) >= 10
+
+
+def test_server_timing_and_profile_need_an_admin_key():
+    api_keys = create_api_key_registry("admin-secret", {"user": "user-secret"})
+    app = _app(api_keys)
+    add_profiling_endpoints(app, get_verify_admin_key(api_keys))
+    client = TestClient(app)
+
+    def headers(key):
+        return {"Authorization": f"Bearer {key}", "X-Server-Timing": "1"}
+
+    response = client.get("/work", headers=headers("user-secret"))
+    assert "server-timing" not in response.headers
+    response = client.get("/work", headers=headers("admin-secret"))
+    assert "server-timing" in response.headers
+
+    def profile(key, seconds):
+        return client.get(f"/_profile?seconds={seconds}", headers=headers(key))
+
+    assert profile("user-secret", 0.05).status_code == 403
+    assert profile("admin-secret", 600).status_code == 422
+    assert profile("admin-secret", 0.05).status_code == 200
+
+    # No API keys: closed unless opened explicitly
+    client = TestClient(_app())
+    assert "server-timing" not in client.get("/work", headers=headers("")).headers
+    with pytest.raises(ValueError):
+        asyncio.run(run(server_command=["true"], profiling=True))
+
+
+def test_sampling_profiler_collapses_stacks():
+    stop = threading.Event()
+
+    def spin():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=spin, name="spinner")
+    worker.start()
+    try:
+        stacks = SamplingProfiler().profile(0.1, 0.001, worker.ident)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert stacks
+    for stack in stacks:
+        assert stack.startswith("spinner;")
+        assert "spin (" in stack
+    line = render_collapsed(stacks).splitlines()[0]
+    assert int(line.rsplit(" ", 1)[1]) > 0
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import signal
+import socket
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from mcpo.main import lifespan
+from mcpo.utils.jobs import SUCCEEDED, JobStore
+from mcpo.utils import shutdown as shutdown_module
+from mcpo.utils.shutdown import (
+    LISTEN_FDS_ENV,
+    DrainingServer,
+    DrainMiddleware,
+    create_graceful_shutdown,
+    inherited_sockets,
+)
+
+
+def test_jobs_drain_then_servers_stop_in_parallel():
+    stopped = []
+
+    def server_app(name):
+        @asynccontextmanager
+        async def server_lifespan(app):
+            yield
+            await asyncio.sleep(0.3)
+            stopped.append(name)
+
+        return FastAPI(lifespan=server_lifespan)
+
+    main_app = FastAPI(lifespan=lifespan)
+    for name in ("a", "b", "c"):
+        main_app.mount(f"/{name}", server_app(name))
+    main_app.state.jobs = JobStore()
+    main_app.state.graceful_shutdown = create_graceful_shutdown({"drainTimeout": 5})
+
+    async def slow_call():
+        await asyncio.sleep(0.2)
+        return {"ok": True}
+
+    async def scenario():
+        async with main_app.router.lifespan_context(main_app):
+            job = main_app.state.jobs.submit("a", "slow", None, slow_call)
+            started = time.monotonic()
+        return job, time.monotonic() - started
+
+    job, elapsed = asyncio.run(scenario())
+    assert job.status == SUCCEEDED
+    assert sorted(stopped) == ["a", "b", "c"]
+    # 0.2s for the job plus 0.3s for the slowest server, not 0.2 + 3 * 0.3
+    assert elapsed < 0.8
+
+
+def test_draining_closes_connections_and_sockets_are_inherited(monkeypatch):
+    shutdown = create_graceful_shutdown(0.5)
+    app = FastAPI()
+    app.add_middleware(DrainMiddleware, shutdown=shutdown)
+
+    @app.get("/")
+    async def index():
+        return {}
+
+    async def get():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://mcpo"
+        ) as client:
+            return await client.get("/")
+
+    assert "connection" not in asyncio.run(get()).headers
+    shutdown.begin()
+    assert asyncio.run(get()).headers["connection"] == "close"
+    assert 0 < shutdown.remaining() <= 0.5
+
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    fd = os.dup(listener.fileno())
+    monkeypatch.setenv(LISTEN_FDS_ENV, str(fd))
+    (inherited,) = inherited_sockets()
+    assert inherited.getsockname() == listener.getsockname()
+    assert inherited_sockets() is None
+    inherited.close()
+    listener.close()
+
+
+def test_keepalive_grace_comes_out_of_the_drain_budget(monkeypatch):
+    monkeypatch.setattr(shutdown_module, "KEEPALIVE_GRACE", 0.5)
+
+    class IdleConnection:
+        def shutdown(self):
+            pass
+
+    class Lifespan:
+        async def shutdown(self):
+            pass
+
+    graceful_shutdown = create_graceful_shutdown(1.0)
+    server = DrainingServer(
+        uvicorn.Config(FastAPI(), timeout_graceful_shutdown=1.0), graceful_shutdown
+    )
+    server.servers = []
+    server.lifespan = Lifespan()
+    # A connection that never closes holds shutdown until the drain deadline
+    server.server_state.connections.add(IdleConnection())
+
+    started = time.monotonic()
+    asyncio.run(server.shutdown())
+    # 0.5s of grace plus the 0.5s left for uvicorn, not 0.5 + 1.0
+    assert time.monotonic() - started < 1.4
+    assert server.config.timeout_graceful_shutdown <= 0.5
+
+    # The signal that stopped the server is not raised again afterwards
+    with server.capture_signals():
+        server.handle_exit(signal.SIGTERM, None)
@@ -0,0 +1,110 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from mcpo.tests.helpers import FakeSession, SearchForm, text_result, tool_app
+from mcpo.utils.idempotency import create_idempotency
+from mcpo.utils.spool import SpooledResponse, create_spool, response_body
+
+
+def echo_answer(session, name, arguments):
+    return text_result(
+        json.dumps({"query": arguments["query"], "tags": arguments["tags"]})
+    )
+
+
+def _client(spool, **state):
+    session = FakeSession(answer=echo_answer)
+    return TestClient(tool_app(session, form_model=SearchForm, spool=spool, **state))
+
+
+def chunked(body: bytes, size=100):
+    # No content-length: sent with chunked transfer encoding
+    for offset in range(0, len(body), size):
+        yield body[offset : offset + size]
+
+
+def test_large_payloads_go_through_files():
+    spool = create_spool({"requestThreshold": 1000, "responseThreshold": 1000})
+    client = _client(spool)
+
+    tags = [f"tag-{i}" for i in range(500)]
+    response = client.post("/search", json={"query": "ü", "tags": tags})
+    assert response.status_code == 200
+    assert response.json() == {"query": "ü", "tags": tags}
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert spool.spooled_requests == 1
+    assert spool.spooled_responses == 1
+
+    # Still validated, off the event loop
+    response = client.post("/search", json={"query": 1, "tags": tags})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "query"]
+
+    response = client.post("/search", json={"query": "small"})
+    assert response.json() == {"query": "small", "tags": []}
+    assert spool.spooled_responses == 1
+    assert spool.in_memory == 0
+
+
+def test_payloads_over_the_memory_budget_are_spooled():
+    spool = create_spool({"memoryBudget": 100})
+    assert not spool.should_spool(60, spool.response_threshold)
+    with spool.hold(60):
+        assert spool.should_spool(60, spool.response_threshold)
+        assert spool.over_budget == 1
+    assert not spool.should_spool(60, spool.response_threshold)
+
+    response = spool.encode_response({"hits": ["a", None]})
+    assert isinstance(response, SpooledResponse)
+    assert response.headers["content-type"] == "application/json"
+    assert int(response.headers["content-length"]) == response.size
+    assert json.loads(response_body(response, close=True)) == {"hits": ["a", None]}
+    assert response.file.closed
+
+
+def test_chunked_bodies_are_counted_as_they_arrive():
+    spool = create_spool({"requestThreshold": 1000, "memoryBudget": 10_000})
+    client = _client(spool)
+    headers = {"content-type": "application/json"}
+
+    tags = [f"tag-{i}" for i in range(500)]
+    body = json.dumps({"query": "big", "tags": tags}).encode()
+    response = client.post("/search", content=chunked(body), headers=headers)
+    assert response.status_code == 200
+    assert response.json()["tags"] == tags
+    assert spool.spooled_requests == 1
+    assert spool.spooled_bytes >= len(body)
+    # Held in memory up to the threshold, then while it was parsed
+    assert 900 <= spool.max_in_memory <= 1000 + len(body)
+
+    body = json.dumps({"query": "small", "tags": ["a"]}).encode()
+    response = client.post("/search", content=chunked(body, 10), headers=headers)
+    assert response.json() == {"query": "small", "tags": ["a"]}
+    assert spool.spooled_requests == 1
+    assert spool.in_memory == 0
+
+    # Under the threshold, but over what is left of the budget
+    with spool.hold(9_990):
+        response = client.post("/search", content=chunked(body, 10), headers=headers)
+    assert response.json() == {"query": "small", "tags": ["a"]}
+    assert spool.spooled_requests == 2
+    assert spool.in_memory == 0
+
+
+def test_results_that_are_kept_are_not_spooled():
+    spool = create_spool({"responseThreshold": 1000})
+    client = _client(spool, idempotency=create_idempotency(True))
+
+    tags = [f"tag-{i}" for i in range(500)]
+    response = client.post(
+        "/search",
+        json={"query": "kept", "tags": tags},
+        headers={"Idempotency-Key": "k"},
+    )
+    assert response.json() == {"query": "kept", "tags": tags}
+    assert spool.spooled_responses == 0
+
+    response = client.post("/search", json={"query": "sent", "tags": tags})
+    assert response.json() == {"query": "sent", "tags": tags}
+    assert spool.spooled_responses == 1
@@ -0,0 +1,84 @@
+from fastapi.testclient import TestClient
+from mcp import types
+
+from mcpo.tests.helpers import FakeSession, tool_app
+from mcpo.utils.main import build_tool_models
+from mcpo.utils.offload import Offloader, json_size, payload_size
+from mcpo.utils.spool import create_spool
+
+TOOL = types.Tool(
+    name="search",
+    inputSchema={
+        "type": "object",
+        "properties": {"query": {"type": "string"}},
+        "required": ["query"],
+    },
+    outputSchema={
+        "type": "object",
+        "properties": {
+            "total": {"type": "integer"},
+            "next": {"type": "string"},
+        },
+        "required": ["total"],
+    },
+)
+
+
+def structured_answer(session, name, arguments):
+    return types.CallToolResult(
+        # Not what the tool returned: the text is only a fallback
+        content=[types.TextContent(type="text", text="3 hits")],
+        structuredContent={"total": 3, "took_ms": 12},
+    )
+
+
+def _client(validate_output, offloader=None):
+    form_model, response_model = build_tool_models(TOOL)
+    app = tool_app(
+        FakeSession(answer=structured_answer),
+        form_model=form_model,
+        response_model=response_model,
+        validate_output=validate_output,
+        offloader=offloader,
+    )
+    return TestClient(app)
+
+
+def test_structured_content_is_returned():
+    client = _client(validate_output=True)
+    response = client.post("/search", json={"query": "a"})
+    assert response.status_code == 200
+    assert response.json()["total"] == 3
+
+    # Encoded off the event loop: through the response model, which has no took_ms
+    client = _client(validate_output=True, offloader=Offloader(0))
+    assert client.post("/search", json={"query": "a"}).json() == {"total": 3}
+
+
+def test_output_validation_can_be_skipped():
+    for offloader in (None, Offloader(0)):
+        client = _client(validate_output=False, offloader=offloader)
+        response = client.post("/search", json={"query": "a"})
+        assert response.status_code == 200
+        assert response.json() == {"total": 3, "took_ms": 12}
+
+    # The schema is still documented
+    schema = client.get("/openapi.json").json()
+    assert "search_response_model" in schema["components"]["schemas"]
+
+
+def test_large_structured_results_are_spooled():
+    hits = [{"id": i, "title": f"result {i}"} for i in range(200)]
+
+    def answer(session, name, arguments):
+        # Nothing but structured content
+        return types.CallToolResult(content=[], structuredContent={"hits": hits})
+
+    result = answer(None, "search", {})
+    assert payload_size(result) == json_size({"hits": hits}) > 4000
+
+    spool = create_spool({"responseThreshold": 4000})
+    client = TestClient(tool_app(FakeSession(answer=answer), spool=spool))
+    response = client.post("/search", json={"query": "a"})
+    assert response.json() == {"hits": hits}
+    assert spool.spooled_responses == 1
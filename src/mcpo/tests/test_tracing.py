@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import httpx
+from fastapi import Depends, FastAPI
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from mcpo.utils.auth import get_verify_api_key
+from mcpo.utils.main import call_tool
+from mcpo.utils.profiling import timed_phase
+from mcpo.utils.tracing import (
+    CLIENT,
+    FileSpanExporter,
+    Tracer,
+    TracingMiddleware,
+    parse_traceparent,
+)
+
+INCOMING = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(INCOMING) == (
+        "4bf92f3577b34da6a3ce929d0e0e4736",
+        "00f067aa0ba902b7",
+        True,
+    )
+    assert parse_traceparent(INCOMING[:-1] + "0")[2] is False
+    assert parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+    assert parse_traceparent("not a traceparent") is None
+
+
+def test_sampling_follows_ratio_unless_the_caller_decided():
+    tracer = Tracer(exporter=None, sample_ratio=0.0)
+    assert not tracer.start_request_span("GET /").sampled
+    assert tracer.start_request_span("GET /", INCOMING).sampled
+    assert Tracer(exporter=None, sample_ratio=1.0).start_request_span("GET /").sampled
+
+
+def test_request_spans_and_propagation_to_mcp_meta(tmp_path):
+    server = FastMCP("echo")
+
+    @server.tool()
+    def traceparent(ctx: Context) -> str:
+        return getattr(ctx.request_context.meta, "traceparent", "")
+
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(FileSpanExporter(str(path)))
+
+    async def scenario():
+        async with create_connected_server_and_client_session(
+            server._mcp_server
+        ) as session:
+            app = FastAPI()
+            app.add_middleware(TracingMiddleware, tracer=tracer)
+
+            @app.post("/traceparent", dependencies=[Depends(get_verify_api_key("k"))])
+            async def tool():
+                with timed_phase("upstream", span_name="tools/call", kind=CLIENT):
+                    result = await call_tool(session, "traceparent", {})
+                return result.content[0].text
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://mcpo"
+            ) as client:
+                response = await client.post(
+                    "/traceparent",
+                    headers={"traceparent": INCOMING, "Authorization": "Bearer k"},
+                )
+        await tracer.flush()
+        return response.json()
+
+    received = asyncio.run(scenario())
+    spans = {
+        span["name"]: span
+        for span in json.loads(path.read_text())["resourceSpans"][0]["scopeSpans"][0][
+            "spans"
+        ]
+    }
+    assert set(spans) == {"POST /traceparent", "auth", "tools/call"}
+
+    root, upstream = spans["POST /traceparent"], spans["tools/call"]
+    trace_id = INCOMING.split("-")[1]
+    assert {span["traceId"] for span in spans.values()} == {trace_id}
+    assert root["parentSpanId"] == INCOMING.split("-")[2]
+    assert spans["auth"]["parentSpanId"] == upstream["parentSpanId"] == root["spanId"]
+    # The MCP server sees the upstream call span as its parent
+    assert received == f"00-{trace_id}-{upstream['spanId']}-01"
+    assert tracer.snapshot()["spans_exported"] == 3
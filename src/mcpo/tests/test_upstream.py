@@ -0,0 +1,193 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from mcp.shared.exceptions import McpError
+from mcp.types import INTERNAL_ERROR, ErrorData
+
+from mcpo.tests.helpers import FakeSession, fake_connector
+from mcpo.utils.child import wrap_command
+from mcpo.utils.upstream import DRAINING, READY, STANDBY, create_upstream_pool
+
+
+def broken_connector(sessions, broken):
+    return fake_connector(
+        sessions, lambda replica: FakeSession(replica.id, broken=replica.id in broken)
+    )
+
+
+async def call(pool, **arguments):
+    async with pool.lease() as replica:
+        return await replica.session.call_tool("tool", arguments)
+
+
+def test_recycled_replica_drains_before_stopping():
+    async def scenario():
+        sessions = []
+        pool = create_upstream_pool(
+            "test", fake_connector(sessions), {"maxCalls": 2, "drainSeconds": 5}
+        )
+        async with pool:
+            first = sessions[0]
+            release = asyncio.Event()
+            slow = asyncio.create_task(call(pool, wait=release))
+            await asyncio.sleep(0)
+            await call(pool)
+            await call(pool)  # reaches maxCalls while `slow` is still in flight
+
+            while len(pool.ready_replicas) != 1 or pool.ready_replicas[0].id != 1:
+                await asyncio.sleep(0.01)
+            old = pool.replicas[0]
+            assert old.state == DRAINING and not first.closed
+            # New calls go to the replacement while the old replica drains
+            assert await call(pool) == 1
+
+            release.set()
+            assert await slow == 0
+            while not first.closed:
+                await asyncio.sleep(0.01)
+            return pool.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["recycled"] == 1
+    assert list(snapshot["per_replica"]) == ["1"]
+    assert snapshot["per_replica"]["1"]["state"] == READY
+
+
+def test_lost_replica_is_replaced():
+    async def scenario():
+        sessions = []
+        pool = create_upstream_pool("test", broken_connector(sessions, {0}))
+        async with pool:
+            with pytest.raises(McpError):
+                await call(pool)
+            # The next call waits for the replacement instead of failing
+            result = await call(pool)
+            return result, sessions, pool.snapshot()
+
+    result, sessions, snapshot = asyncio.run(scenario())
+    assert result == 1
+    assert sessions[0].closed
+    assert snapshot["restarts"] == 1 and snapshot["replicas"] == 1
+
+
+async def wait_for_standby(pool, count=1):
+    while pool.snapshot()["standby"] < count:
+        await asyncio.sleep(0.01)
+
+
+def test_standby_is_promoted_when_active_replica_is_lost():
+    async def scenario():
+        sessions = []
+        pool = create_upstream_pool(
+            "test", broken_connector(sessions, {0}), standby_config=1
+        )
+        async with pool:
+            await wait_for_standby(pool)
+            with pytest.raises(McpError):
+                await call(pool)
+            # The spare took over without waiting for a new process
+            assert [r.id for r in pool.ready_replicas] == [1]
+            assert await call(pool) == 1
+            await wait_for_standby(pool)
+            return pool.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["promotions"]["per_source"]["standby"]["count"] == 1
+    assert snapshot["promotions"]["per_source"]["cold"]["count"] == 0
+    assert snapshot["restarts"] == 0
+    assert snapshot["per_replica"]["2"]["state"] == STANDBY
+
+
+def test_busy_pool_scales_up_onto_standby():
+    async def scenario():
+        sessions = []
+        pool = create_upstream_pool(
+            "test",
+            fake_connector(sessions),
+            standby_config={"count": 1, "maxActive": 2, "scaleUpInFlight": 1},
+        )
+        async with pool:
+            await wait_for_standby(pool)
+            release = asyncio.Event()
+            slow = asyncio.create_task(call(pool, wait=release))
+            await asyncio.sleep(0)
+            # Replica 0 is busy, so this call promotes the spare
+            assert await call(pool) == 1
+            release.set()
+            await slow
+            return pool.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["scale_ups"] == 1 and snapshot["replicas"] == 2
+
+
+@pytest.mark.skipif(os.name != "posix", reason="resource limits are POSIX-only")
+def test_child_wrapper_applies_limits_and_reports_pid(tmp_path):
+    pidfile = tmp_path / "server.pid"
+    script = "import os, resource; print(os.getpid(), resource.getrlimit(resource.RLIMIT_NOFILE))"
+    argv = wrap_command(
+        sys.executable, ["-c", script], {"open_files": 64}, str(pidfile)
+    )
+
+    output = subprocess.run(argv, capture_output=True, text=True, check=True).stdout
+    pid, limit = output.split(" ", 1)
+    # The wrapper execs the server, so the reported pid is the server's own
+    assert pidfile.read_text() == pid
+    assert limit.strip() == "(64, 64)"
+
+
+def endpoint_connector(down=(), failing=()):
+    """Sessions that answer with their endpoint's URL; `failing` URLs error on every call."""
+
+    def fail(session, name, arguments):
+        raise McpError(ErrorData(code=INTERNAL_ERROR, message="boom"))
+
+    def session(replica):
+        url = replica.endpoint.url
+        if url in down:
+            raise ConnectionError(f"{url} is down")
+        return FakeSession(url, answer=fail if url in failing else None)
+
+    return fake_connector(factory=session)
+
+
+def test_calls_are_spread_over_urls_and_failing_ones_ejected():
+    async def scenario():
+        pool = create_upstream_pool(
+            "test",
+            endpoint_connector(failing={"http://b"}),
+            urls=["http://a", "http://b"],
+            balancing_config={"strategy": "roundRobin", "ejectAfterFailures": 2},
+        )
+        async with pool:
+            served = []
+            for _ in range(8):
+                try:
+                    served.append(await call(pool))
+                except McpError:
+                    served.append("error")
+            return served, pool.snapshot()
+
+    served, snapshot = asyncio.run(scenario())
+    # Alternates until b has failed twice in a row, then only a is used
+    assert served == ["http://a", "error", "http://a", "error"] + ["http://a"] * 4
+    assert snapshot["per_endpoint"]["http://b"]["ejected"] is True
+    assert snapshot["per_endpoint"]["http://a"]["calls"] == 6
+
+
+def test_pool_starts_with_an_endpoint_down():
+    async def scenario():
+        pool = create_upstream_pool(
+            "test",
+            endpoint_connector(down={"http://b"}),
+            urls=["http://a", "http://b"],
+        )
+        async with pool:
+            return [await call(pool) for _ in range(3)], pool.snapshot()
+
+    served, snapshot = asyncio.run(scenario())
+    assert served == ["http://a"] * 3
+    assert snapshot["replicas"] == 1
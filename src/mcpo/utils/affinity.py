@@ -0,0 +1,271 @@
+import hashlib
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncContextManager, Callable, Dict, List, Optional
+
+import anyio
+from fastapi import HTTPException, Request
+from mcp import ClientSession
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+from mcpo.utils.upstream import Endpoint, _TRANSPORT_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Config file keys (camelCase, like the rest of the config) -> SessionAffinity kwargs
+CONFIG_KEYS = {
+    "header": "header",
+    "maxSessions": "max_sessions",
+    "idleSeconds": "idle_seconds",
+}
+
+DEFAULT_HEADER = "X-Mcpo-Session"
+MAX_KEY_LENGTH = 255
+
+# How long a call waits for its new session to connect and initialize
+CONNECT_TIMEOUT = 30.0
+
+# How long sessions get to close when the pool shuts down
+SHUTDOWN_TIMEOUT = 5.0
+
+
+class AffinityFullError(Exception):
+    pass
+
+
+class AffinitySession:
+    """
+    A connection (for stdio, a child process) that serves the calls of one
+    client session. It has the attributes the upstream connector reads from a
+    replica, plus `headers` for remote servers.
+    """
+
+    def __init__(
+        self,
+        session_id: int,
+        key: str,
+        endpoint: Endpoint,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.id = session_id
+        self.key = key
+        self.endpoint = endpoint
+        self.headers = headers
+        self.pidfile: Optional[str] = None
+        self.pid: Optional[int] = None
+        self.session: Optional[ClientSession] = None
+        self.error: Optional[BaseException] = None
+        self.in_flight = 0
+        self.calls = 0
+        self.last_used = time.monotonic()
+        self.closed = False
+        self._started = anyio.Event()
+        self._stop = anyio.Event()
+
+    async def run(self, connect) -> None:
+        try:
+            async with connect(self) as session:
+                await session.initialize()
+                self.session = session
+                self._started.set()
+                await self._stop.wait()
+        except Exception as e:
+            self.error = e
+            logger.warning(
+                f"Affinity session {self.id} failed: {type(e).__name__}: {e}"
+            )
+        finally:
+            self.closed = True
+            self._started.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+class SessionAffinity:
+    """
+    Gives each client session (named by the `header` request header) its own
+    upstream session, so stateful servers (browsers, database cursors) keep
+    one client's state apart from another's.
+
+    Sessions are opened on a client's first call and reused for its later
+    calls. A session without calls for `idle_seconds` is closed. With
+    `max_sessions` open, a new client session closes the least recently used
+    idle one; if every session is busy the call is rejected.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connect: Callable[[AffinitySession], AsyncContextManager[ClientSession]],
+        header: str = DEFAULT_HEADER,
+        max_sessions: int = 100,
+        idle_seconds: float = 300.0,
+        endpoints: Optional[List[Endpoint]] = None,
+    ):
+        if max_sessions < 1:
+            raise ValueError(f"'{name}': affinity maxSessions must be at least 1")
+        self.name = name
+        self.connect = connect
+        self.header = header
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.endpoints = endpoints or [Endpoint()]
+        self._sessions: "OrderedDict[str, AffinitySession]" = OrderedDict()
+        self._ids = itertools.count()
+        self._rotation = itertools.count()
+        self.created = 0
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.rejected = 0
+        self.failed = 0
+        self._stack: Optional[AsyncExitStack] = None
+        self._tg = None
+
+    async def __aenter__(self) -> "SessionAffinity":
+        self._stack = AsyncExitStack()
+        self._tg = await self._stack.enter_async_context(anyio.create_task_group())
+        self._tg.start_soon(self._evict_idle)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        for session in self._sessions.values():
+            session.stop()
+        with anyio.move_on_after(SHUTDOWN_TIMEOUT):
+            while any(not s.closed for s in self._sessions.values()):
+                await anyio.sleep(0.05)
+        self._sessions.clear()
+        self._tg.cancel_scope.cancel()
+        await self._stack.aclose()
+
+    def key(self, request: Request) -> Optional[str]:
+        """The pool key for the request's client session, or None without the header."""
+        value = request.headers.get(self.header)
+        if not value:
+            return None
+        if len(value) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{self.header} is longer than {MAX_KEY_LENGTH} characters",
+            )
+        api_key = getattr(request.state, "api_key", None)
+        owner = api_key.name if api_key is not None else ""
+        # Callers forwarding different credentials never share a session
+        auth = request.headers.get("Authorization", "")
+        auth = hashlib.sha256(auth.encode()).hexdigest() if auth else ""
+        return f"{owner}\0{auth}\0{value}"
+
+    def _close(self, session: AffinitySession) -> None:
+        if self._sessions.get(session.key) is session:
+            del self._sessions[session.key]
+        session.stop()
+
+    def _endpoint(self) -> Endpoint:
+        healthy = [e for e in self.endpoints if not e.ejected] or self.endpoints
+        return healthy[next(self._rotation) % len(healthy)]
+
+    async def _open(
+        self, key: str, headers: Optional[Dict[str, str]]
+    ) -> AffinitySession:
+        if len(self._sessions) >= self.max_sessions:
+            idle = [s for s in self._sessions.values() if not s.in_flight]
+            if not idle:
+                self.rejected += 1
+                raise AffinityFullError(self.name)
+            # The dict is in least recently used order
+            self._close(idle[0])
+            self.evicted_lru += 1
+        session = AffinitySession(next(self._ids), key, self._endpoint(), headers)
+        self._sessions[key] = session
+        self.created += 1
+        self._tg.start_soon(session.run, self.connect)
+        return session
+
+    @asynccontextmanager
+    async def lease(self, key: str, headers: Optional[Dict[str, str]] = None):
+        """The session for `key`, opened on first use; a broken one is dropped."""
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = await self._open(key, headers)
+        self._sessions.move_to_end(key)
+        session.in_flight += 1
+        try:
+            with anyio.move_on_after(CONNECT_TIMEOUT):
+                await session._started.wait()
+            if session.session is None or session.closed:
+                self.failed += 1
+                self._close(session)
+                raise session.error or RuntimeError(
+                    f"Affinity session {session.id} did not connect"
+                )
+            try:
+                yield session
+            except McpError as e:
+                if e.error.code == CONNECTION_CLOSED:
+                    self._close(session)
+                raise
+            except _TRANSPORT_ERRORS:
+                self._close(session)
+                raise
+        finally:
+            session.in_flight -= 1
+            session.calls += 1
+            session.last_used = time.monotonic()
+
+    async def _evict_idle(self) -> None:
+        while True:
+            await anyio.sleep(min(max(self.idle_seconds / 4, 0.05), 10.0))
+            now = time.monotonic()
+            for session in list(self._sessions.values()):
+                if session.closed:
+                    self._close(session)
+                elif (
+                    not session.in_flight
+                    and now - session.last_used >= self.idle_seconds
+                ):
+                    self._close(session)
+                    self.evicted_idle += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "in_flight": sum(s.in_flight for s in self._sessions.values()),
+            "created": self.created,
+            "evicted_idle": self.evicted_idle,
+            "evicted_lru": self.evicted_lru,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+
+def create_session_affinity(
+    name: str,
+    connect: Callable[[AffinitySession], AsyncContextManager[ClientSession]],
+    config: Any,
+    endpoints: Optional[List[Endpoint]] = None,
+) -> Optional[SessionAffinity]:
+    """Build from a server's `affinity` config (True, or a dict of options)."""
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    return SessionAffinity(name, connect, endpoints=endpoints, **options)
+
+
+def get_session_affinity(app) -> Optional[SessionAffinity]:
+    return getattr(app.state, "session_affinity", None)
+
+
+def affinity_full_exception(affinity: SessionAffinity) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={
+            "message": f"Server '{affinity.name}' has no free session ({affinity.max_sessions} in use); try again later"
+        },
+        headers={"Retry-After": "1"},
+    )
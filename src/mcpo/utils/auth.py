@@ -4,45 +4,65 @@ from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 import base64
 
-from passlib.context import CryptContext
-from datetime import UTC, datetime, timedelta
-
-import jwt
 from typing import Optional, Union, List, Dict
 
+from mcpo.utils.rate_limit import APIKeyRegistry, as_api_key_registry
+from mcpo.utils.tracing import trace_span
+
 
 ALGORITHM = "HS256"
 
 bearer_security = HTTPBearer(auto_error=False)
 
 
-def get_verify_api_key(api_key: str):
+def get_verify_api_key(api_key: Union[str, APIKeyRegistry]):
+    api_keys = as_api_key_registry(api_key)
+
     async def verify_api_key(
+        request: Request,
         authorization: HTTPAuthorizationCredentials = Depends(bearer_security),
     ):
-        if not authorization or not authorization.credentials:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Missing or invalid Authorization header",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        token = authorization.credentials
-        if token != api_key:
+        with trace_span("auth") as span:
+            if not authorization or not authorization.credentials:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Missing or invalid Authorization header",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            key = api_keys.lookup(authorization.credentials)
+            if key is None:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Invalid API key",
+                )
+            if span is not None:
+                span.set_attribute("mcpo.api_key", key.name)
+            # Identifies the caller for rate limiting and fair queuing
+            request.state.api_key = key
+
+    return verify_api_key
+
+
+def get_verify_admin_key(api_key: Union[str, APIKeyRegistry]):
+    verify_api_key = get_verify_api_key(api_key)
+
+    async def verify_admin_key(request: Request, _=Depends(verify_api_key)):
+        if not request.state.api_key.admin:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail="Invalid API key",
+                detail="Admin API key required",
             )
 
-    return verify_api_key
+    return verify_admin_key
 
 
 class APIKeyMiddleware(BaseHTTPMiddleware):
     """
     Middleware that enforces Basic or Bearer token authentication for all requests.
     """
-    def __init__(self, app, api_key: str):
+    def __init__(self, app, api_key: Union[str, APIKeyRegistry]):
         super().__init__(app)
-        self.api_key = api_key
+        self.api_keys = as_api_key_registry(api_key)
 
     async def dispatch(self, request: Request, call_next):
         # Skip authentication for OPTIONS requests
@@ -65,7 +85,7 @@ class APIKeyMiddleware(BaseHTTPMiddleware):
             # Handle Bearer token auth
             if authorization.startswith("Bearer "):
                 token = authorization[7:]  # Remove "Bearer " prefix
-                if token != self.api_key:
+                if self.api_keys.lookup(token) is None:
                     return JSONResponse(
                         status_code=403,
                         content={"detail": "Invalid API key"}
@@ -78,8 +98,8 @@ class APIKeyMiddleware(BaseHTTPMiddleware):
                     decoded = base64.b64decode(credentials).decode('utf-8')
                     # Basic auth format is username:password
                     username, password = decoded.split(':', 1)
-                    # Any username is allowed, but password must match api_key
-                    if password != self.api_key:
+                    # Any username is allowed, but password must be an API key
+                    if self.api_keys.lookup(password) is None:
                         return JSONResponse(
                             status_code=403,
                             content={"detail": "Invalid credentials"}
@@ -105,6 +125,11 @@ class APIKeyMiddleware(BaseHTTPMiddleware):
             )
 
 
+# Token helpers below need `import jwt` and `from datetime import UTC, datetime,
+# timedelta`, and pyjwt is no longer a dependency: add `pyjwt[crypto]` back to
+# pyproject.toml and import it locally if these are brought back, so every
+# mcpo start does not pay for pyjwt/cryptography.
+
 # def create_token(data: dict, expires_delta: Union[timedelta, None] = None) -> str:
 #     payload = data.copy()
 
@@ -0,0 +1,423 @@
+"""
+Tool result cache: an in-process LRU (L1) in front of an optional backend
+shared by every mcpo replica (L2): a Redis-protocol server, or a SQLite file
+for replicas on the same host.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import struct
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import Response
+
+from mcpo.utils.affinity import get_session_affinity
+from mcpo.utils.spool import response_body
+
+logger = logging.getLogger(__name__)
+
+# Config file keys (camelCase, like the rest of the config) -> ResultCache kwargs
+CONFIG_KEYS = {
+    "l1Entries": "l1_entries",
+    "l1Bytes": "l1_bytes",
+    "schemaTtlSeconds": "schema_ttl",
+}
+
+# Per-server `cache` section keys -> CachePolicy kwargs
+POLICY_CONFIG_KEYS = {
+    "ttlSeconds": "ttl",
+    "tools": "tools",
+}
+
+# L2 values start with their expiry (wall clock), so L1 copies expire together
+_EXPIRY = struct.Struct("!d")
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend:
+    """
+    Just enough of a Redis client (RESP over a few pooled connections) for
+    GET and SET with an expiry. Works with Redis, Valkey, KeyDB, Dragonfly...
+    """
+
+    def __init__(self, url: str, pool_size: int = 4, timeout: float = 0.5):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = urllib.parse.unquote(parsed.username or "")
+        self.password = urllib.parse.unquote(parsed.password or "")
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    @staticmethod
+    def encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    @classmethod
+    async def read_reply(cls, reader: asyncio.StreamReader) -> Any:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Redis closed the connection")
+        prefix, rest = line[:1], line[1:-2]
+        if prefix == b"+":
+            return rest
+        if prefix == b"-":
+            raise RedisError(rest.decode(errors="replace"))
+        if prefix == b":":
+            return int(rest)
+        if prefix == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            return (await reader.readexactly(length + 2))[:-2]
+        if prefix == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [await cls.read_reply(reader) for _ in range(length)]
+        raise RedisError(f"Unexpected reply {line[:64]!r}")
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            credentials = (
+                (self.username, self.password) if self.username else (self.password,)
+            )
+            await self._send(reader, writer, "AUTH", *credentials)
+        if self.db:
+            await self._send(reader, writer, "SELECT", self.db)
+        return reader, writer
+
+    async def _send(self, reader, writer, *args) -> Any:
+        writer.write(self.encode(*args))
+        await writer.drain()
+        return await self.read_reply(reader)
+
+    async def execute(self, *args) -> Any:
+        async with self._slots:
+            async with asyncio.timeout(self.timeout):
+                connection = self._idle.pop() if self._idle else await self._connect()
+                try:
+                    reply = await self._send(*connection, *args)
+                except BaseException:
+                    # The reply may still arrive; never reuse the connection
+                    connection[1].close()
+                    raise
+            self._idle.append(connection)
+            return reply
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.execute("SET", key, value, "PX", max(int(ttl * 1000), 1))
+
+    async def close(self) -> None:
+        while self._idle:
+            self._idle.pop()[1].close()
+
+
+class SQLiteBackend:
+    """Entries in a SQLite file, shared by the mcpo processes on one host."""
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)"
+        )
+        self._limiter = anyio.CapacityLimiter(1)
+        self._writes = 0
+
+    async def _run(self, fn, *args):
+        return await anyio.to_thread.run_sync(fn, *args, limiter=self._limiter)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        row = self._db.execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: bytes, ttl: float) -> None:
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl),
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            excess = (
+                self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+                - self.max_entries
+            )
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY expires_at LIMIT ?)",
+                    (excess,),
+                )
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._run(self._get, key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._run(self._set, key, value, ttl)
+
+    async def close(self) -> None:
+        self._db.close()
+
+
+def create_backend(url: Optional[str]):
+    """`redis://[:password@]host[:port][/db]`, `sqlite:///path/to/file.db`, or None."""
+    if not url:
+        return None
+    scheme = urllib.parse.urlsplit(url).scheme
+    if scheme in ("redis", "valkey"):
+        return RedisBackend(url)
+    if scheme == "sqlite":
+        return SQLiteBackend(url[len("sqlite://") :])
+    raise ValueError(f"Unsupported cache backend '{url}'")
+
+
+class ResultCache:
+    """
+    Cached tool responses, already encoded. Concurrent misses for the same key
+    in one process wait for a single upstream call instead of each making one.
+    Backend failures count as misses: the cache never fails a request.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        l1_entries: int = 1000,
+        l1_bytes: int = 64 * 1024 * 1024,
+        schema_ttl: float = 0.0,
+    ):
+        self.backend = backend
+        self.l1_entries = l1_entries
+        self.l1_bytes = l1_bytes
+        # Tool lists are shared with other replicas for this long (0: not at all)
+        self.schema_ttl = schema_ttl
+        self._l1: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._l1_size = 0
+        self._loading: Dict[str, asyncio.Event] = {}
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stores = 0
+        self.backend_errors = 0
+
+    def _l1_get(self, key: str) -> Optional[bytes]:
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            self._l1_drop(key)
+            return None
+        self._l1.move_to_end(key)
+        return entry[1]
+
+    def _l1_put(self, key: str, expires_at: float, value: bytes) -> None:
+        if len(value) > self.l1_bytes:
+            return
+        self._l1_drop(key)
+        self._l1[key] = (expires_at, value)
+        self._l1_size += len(value)
+        while len(self._l1) > self.l1_entries or self._l1_size > self.l1_bytes:
+            _, (_, evicted) = self._l1.popitem(last=False)
+            self._l1_size -= len(evicted)
+
+    def _l1_drop(self, key: str) -> None:
+        entry = self._l1.pop(key, None)
+        if entry is not None:
+            self._l1_size -= len(entry[1])
+
+    def _backend_failed(self, action: str, e: Exception) -> None:
+        self.backend_errors += 1
+        logger.warning(f"Cache backend {action} failed: {e!r}")
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = self._l1_get(key)
+        if value is not None:
+            self.l1_hits += 1
+            return value
+        if self.backend is not None:
+            try:
+                stored = await self.backend.get(key)
+            except Exception as e:
+                self._backend_failed("read", e)
+                stored = None
+            if stored is not None and len(stored) >= _EXPIRY.size:
+                (expires_at,) = _EXPIRY.unpack_from(stored)
+                if expires_at > time.time():
+                    value = stored[_EXPIRY.size :]
+                    self._l1_put(key, expires_at, value)
+                    self.l2_hits += 1
+                    return value
+        return None
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        expires_at = time.time() + ttl
+        self._l1_put(key, expires_at, value)
+        self.stores += 1
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, _EXPIRY.pack(expires_at) + value, ttl)
+            except Exception as e:
+                self._backend_failed("write", e)
+
+    async def fetch(
+        self, key: str, ttl: float, load: Callable[[], Awaitable[Response]]
+    ) -> Response:
+        """The cached response for `key`, or `load()`'s, cached if it is a 200."""
+        while True:
+            value = await self.get(key)
+            if value is not None:
+                return cached_response(value, "HIT")
+            loading = self._loading.get(key)
+            if loading is None:
+                break
+            # Another request is fetching the same result right now
+            self.coalesced += 1
+            await loading.wait()
+
+        self.misses += 1
+        loading = self._loading[key] = asyncio.Event()
+        try:
+            response = await load()
+            if response.status_code == 200:
+                await self.set(key, response_body(response), ttl)
+            response.headers["X-Cache"] = "MISS"
+            return response
+        finally:
+            del self._loading[key]
+            loading.set()
+
+    async def get_json(self, key: str) -> Any:
+        value = await self.get(key)
+        return json.loads(value) if value is not None else None
+
+    async def set_json(self, key: str, data: Any, ttl: float) -> None:
+        await self.set(key, json.dumps(data).encode(), ttl)
+
+    async def close(self) -> None:
+        if self.backend is not None:
+            await self.backend.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__ if self.backend else "none",
+            "l1_entries": len(self._l1),
+            "l1_bytes": self._l1_size,
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stores": self.stores,
+            "backend_errors": self.backend_errors,
+        }
+
+
+def cached_response(value: bytes, status: str) -> Response:
+    return Response(
+        content=value, media_type="application/json", headers={"X-Cache": status}
+    )
+
+
+class CachePolicy:
+    """
+    Which tools of a server are cached and for how long: `tools` maps names
+    to TTLs, and `ttl` applies to the other tools the server marks read-only.
+    """
+
+    def __init__(self, ttl: float = 0.0, tools: Optional[Dict[str, float]] = None):
+        self.ttl = ttl
+        self.tools = dict(tools or {})
+
+    def mark_read_only(self, tool) -> None:
+        annotations = getattr(tool, "annotations", None)
+        if self.ttl and annotations and annotations.readOnlyHint:
+            self.tools.setdefault(tool.name, self.ttl)
+
+    def ttl_for(self, tool_name: str) -> float:
+        return self.tools.get(tool_name, 0.0)
+
+
+def create_result_cache(config: Any) -> Optional[ResultCache]:
+    """Build from the top-level `cache` config (True or a dict with a `backend` URL)."""
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    return ResultCache(create_backend(config.get("backend")), **options)
+
+
+def create_cache_policy(config: Any) -> Optional[CachePolicy]:
+    """Build from a server's `cache` section: a TTL, or a dict of options."""
+    if not config:
+        return None
+    if isinstance(config, (int, float)):
+        config = {"ttlSeconds": config}
+    options = {
+        POLICY_CONFIG_KEYS[k]: v for k, v in config.items() if k in POLICY_CONFIG_KEYS
+    }
+    return CachePolicy(**options)
+
+
+def get_result_cache(app) -> Optional[ResultCache]:
+    return getattr(app.state, "result_cache", None)
+
+
+def cache_ttl(app, tool_name: str) -> float:
+    policy: Optional[CachePolicy] = getattr(app.state, "cache_policy", None)
+    if policy is None or get_result_cache(app) is None:
+        return 0.0
+    return policy.ttl_for(tool_name)
+
+
+def result_cache_key(request: Request, app, tool: str, arguments: dict) -> str:
+    """Tool and arguments, plus the caller's credentials when they reach the server."""
+    digest = hashlib.sha256(json.dumps(arguments, sort_keys=True, default=str).encode())
+    authorization = request.headers.get("authorization")
+    if authorization and getattr(app.state, "server_type", "stdio") != "stdio":
+        # Forwarded upstream, so the result may depend on who is asking
+        digest.update(b"\0" + authorization.encode())
+    affinity = get_session_affinity(app)
+    session_key = affinity.key(request) if affinity else None
+    if session_key:
+        # Calls pinned to a session see that session's state
+        digest.update(b"\0" + session_key.encode())
+    server = getattr(app.state, "server_name", app.title)
+    return f"mcpo:result:{server}:{tool}:{digest.hexdigest()}"
+
+
+def schema_cache_key(server: str) -> str:
+    return f"mcpo:tools:{server}"
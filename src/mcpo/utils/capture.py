@@ -0,0 +1,169 @@
+"""
+Traffic capture: a sample of tool calls written as JSON lines (arguments,
+upstream latency and the server's result) for `python -m mcpo.bench.replay`
+and the stub server's `--replay` mode.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request
+from mcp.types import CallToolResult, ErrorData
+
+logger = logging.getLogger(__name__)
+
+# Config file keys (camelCase, like the rest of the config) -> TrafficCapture kwargs
+CONFIG_KEYS = {
+    "path": "path",
+    "sampleRate": "sample_rate",
+    "maxBytes": "max_bytes",
+}
+
+# Buffered records are written out at least this often
+FLUSH_INTERVAL = 1.0
+# ...or as soon as this many are waiting
+FLUSH_RECORDS = 256
+
+
+class TrafficCapture:
+    """
+    Appends a `sample_rate` share of tool calls to `path`, one JSON object per
+    line, until the file reaches `max_bytes`. Records are buffered and
+    written from a worker thread, so capturing never waits on the disk.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 1.0,
+        max_bytes: Optional[int] = None,
+    ):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self._file = open(path, "a", encoding="utf-8")
+        self.bytes = self._file.tell()
+        self._buffer: List[str] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.recorded = 0
+        self.skipped_full = 0
+        self.write_errors = 0
+
+    @property
+    def full(self) -> bool:
+        return self.max_bytes is not None and self.bytes >= self.max_bytes
+
+    def sample(self) -> bool:
+        """Whether to capture the call about to be made."""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+        if self.full:
+            self.skipped_full += 1
+            return False
+        return True
+
+    def record(
+        self,
+        request: Request,
+        server: str,
+        tool: str,
+        arguments: dict,
+        started_at: float,
+        latency: float,
+        result: Optional[CallToolResult] = None,
+        error: Optional[ErrorData] = None,
+    ) -> None:
+        entry: Dict[str, Any] = {
+            "ts": round(started_at, 6),
+            "path": request.url.path,
+            "server": server,
+            "tool": tool,
+            "arguments": arguments,
+            "latency_ms": round(latency * 1000, 3),
+        }
+        if result is not None:
+            entry["result"] = result.model_dump(
+                mode="json", by_alias=True, exclude_none=True
+            )
+        else:
+            entry["error"] = (
+                error.model_dump(mode="json", exclude_none=True)
+                if error is not None
+                else {"message": "upstream call failed"}
+            )
+        line = json.dumps(entry, separators=(",", ":"), default=str) + "\n"
+        self.bytes += len(line.encode("utf-8"))
+        self._buffer.append(line)
+        self.recorded += 1
+        if len(self._buffer) >= FLUSH_RECORDS:
+            asyncio.get_running_loop().create_task(self.flush())
+        elif self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        await self.flush()
+
+    def _write(self, lines: List[str]) -> None:
+        self._file.write("".join(lines))
+        self._file.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            lines, self._buffer = self._buffer, []
+            if not lines:
+                return
+            try:
+                await asyncio.to_thread(self._write, lines)
+            except OSError as e:
+                self.write_errors += 1
+                logger.warning(f"Could not write {len(lines)} captured calls: {e}")
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+        await self.flush()
+        self._file.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "recorded": self.recorded,
+            "bytes": self.bytes,
+            "skipped_full": self.skipped_full,
+            "write_errors": self.write_errors,
+        }
+
+
+def create_traffic_capture(config: Any) -> Optional[TrafficCapture]:
+    """Build from the `capture` config: a file path, or a dict of options with `path`."""
+    if not config:
+        return None
+    if isinstance(config, str):
+        config = {"path": config}
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    if "path" not in options:
+        raise ValueError("'capture' needs a 'path'")
+    options["path"] = os.path.expanduser(options["path"])
+    return TrafficCapture(**options)
+
+
+def get_traffic_capture(app) -> Optional[TrafficCapture]:
+    return getattr(app.state, "capture", None)
+
+
+def read_capture(path: str) -> List[Dict[str, Any]]:
+    """The records of a capture file, oldest first; a torn last line is skipped."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    records.sort(key=lambda record: record["ts"])
+    return records
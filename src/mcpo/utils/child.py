@@ -0,0 +1,76 @@
+"""
+Exec wrapper for stdio MCP servers: applies resource limits, records its
+pid and then replaces itself with the server command, so the limits and the
+pid apply to the server process itself.
+
+    python -m mcpo.utils.child --memory-mb 1024 --pidfile /tmp/x.pid -- npx ...
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional
+
+# Config file keys (camelCase, like the rest of the config) -> wrapper options
+CONFIG_KEYS = {
+    "memoryMb": "memory_mb",
+    "cpuSeconds": "cpu_seconds",
+    "openFiles": "open_files",
+}
+
+
+def wrap_command(
+    command: str, args: List[str], limits: Dict[str, int], pidfile: Optional[str]
+) -> List[str]:
+    """Return the argv that runs `command args` under the wrapper."""
+    wrapper = [sys.executable, "-m", "mcpo.utils.child"]
+    for key, value in limits.items():
+        wrapper += [f"--{key.replace('_', '-')}", str(value)]
+    if pidfile:
+        wrapper += ["--pidfile", pidfile]
+    return [*wrapper, "--", command, *args]
+
+
+def _set_limit(resource, limit: int, value: int) -> None:
+    _, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    # Hard limit too, so the server cannot raise it again
+    resource.setrlimit(limit, (value, value))
+
+
+def apply_limits(memory_mb=None, cpu_seconds=None, open_files=None) -> None:
+    import resource
+
+    if memory_mb:
+        # Address space, not RSS: runtimes that reserve large virtual ranges
+        # up front (V8, the JVM) need generous values here
+        _set_limit(resource, resource.RLIMIT_AS, memory_mb * 1024 * 1024)
+    if cpu_seconds:
+        _set_limit(resource, resource.RLIMIT_CPU, cpu_seconds)
+    if open_files:
+        _set_limit(resource, resource.RLIMIT_NOFILE, open_files)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m mcpo.utils.child")
+    parser.add_argument("--memory-mb", type=int)
+    parser.add_argument("--cpu-seconds", type=int)
+    parser.add_argument("--open-files", type=int)
+    parser.add_argument("--pidfile")
+    parser.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        parser.error("missing server command")
+
+    apply_limits(args.memory_mb, args.cpu_seconds, args.open_files)
+    if args.pidfile:
+        with open(args.pidfile, "w") as f:
+            f.write(str(os.getpid()))
+    os.execvp(command[0], command)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Config file keys (camelCase, like the rest of the config) -> CircuitBreaker kwargs
+CONFIG_KEYS = {
+    "failureRateThreshold": "failure_rate_threshold",
+    "slowCallDurationThreshold": "slow_call_duration_threshold",
+    "slowCallRateThreshold": "slow_call_rate_threshold",
+    "minimumCalls": "minimum_calls",
+    "windowSeconds": "window_seconds",
+    "openSeconds": "open_seconds",
+    "halfOpenMaxCalls": "half_open_max_calls",
+}
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker driven by the error rate and slow-call rate observed over a
+    sliding time window.
+
+    closed -> open when, with at least `minimum_calls` calls in the window, the
+    failure rate or the slow-call rate reaches its threshold. After
+    `open_seconds` the breaker lets `half_open_max_calls` trial calls through;
+    if they all succeed it closes again, otherwise it re-opens.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_duration_threshold: Optional[float] = None,
+        slow_call_rate_threshold: float = 1.0,
+        minimum_calls: int = 10,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration_threshold = slow_call_duration_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._calls = deque()  # (timestamp, failed, slow)
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def retry_after(self) -> float:
+        if self._state != OPEN:
+            return 0.0
+        return max(self.open_seconds - (time.monotonic() - self._opened_at), 0.0)
+
+    def acquire(self) -> bool:
+        """Return True if a call may proceed; every granted call must be followed by record() or release()."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+            self._half_open_in_flight += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self) -> None:
+        """Give back a granted call without judging the upstream (e.g. on cancellation)."""
+        if self._state == HALF_OPEN and self._half_open_in_flight > 0:
+            self._half_open_in_flight -= 1
+
+    def record(self, success: bool, duration: float) -> None:
+        slow = (
+            self.slow_call_duration_threshold is not None
+            and duration >= self.slow_call_duration_threshold
+        )
+
+        if self._state == HALF_OPEN:
+            self.release()
+            if not success or slow:
+                self._transition(OPEN)
+            else:
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._transition(CLOSED)
+            return
+        if self._state == OPEN:
+            # A call granted before the breaker opened finished late
+            return
+
+        now = time.monotonic()
+        self._calls.append((now, not success, slow))
+        self._prune(now)
+
+        total = len(self._calls)
+        if total < self.minimum_calls:
+            return
+        failure_rate = sum(1 for _, failed, _ in self._calls if failed) / total
+        slow_rate = sum(1 for _, _, is_slow in self._calls if is_slow) / total
+        if failure_rate >= self.failure_rate_threshold or (
+            self.slow_call_duration_threshold is not None
+            and slow_rate >= self.slow_call_rate_threshold
+        ):
+            logger.warning(
+                f"Circuit breaker '{self.name}' opened (failure rate {failure_rate:.0%}, slow call rate {slow_rate:.0%})"
+            )
+            self._transition(OPEN)
+
+    def _prune(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _transition(self, state: str) -> None:
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == CLOSED:
+            logger.info(f"Circuit breaker '{self.name}' closed")
+        self._state = state
+        self._calls.clear()
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._prune(time.monotonic())
+        total = len(self._calls)
+        return {
+            "state": self.state,
+            "calls_in_window": total,
+            "failure_rate": (
+                sum(1 for _, failed, _ in self._calls if failed) / total if total else 0.0
+            ),
+            "slow_call_rate": (
+                sum(1 for _, _, slow in self._calls if slow) / total if total else 0.0
+            ),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 3),
+        }
+
+
+class CircuitBreakerSet:
+    """One breaker for a whole server, or one per tool when `per_tool` is set."""
+
+    def __init__(self, server_name: str, per_tool: bool = False, **options):
+        self.server_name = server_name
+        self.per_tool = per_tool
+        self.options = options
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, tool_name: str) -> CircuitBreaker:
+        key = tool_name if self.per_tool else self.server_name
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            name = f"{self.server_name}/{tool_name}" if self.per_tool else key
+            breaker = self.breakers[key] = CircuitBreaker(name, **self.options)
+        return breaker
+
+    def snapshot(self) -> Dict[str, Any]:
+        if not self.per_tool:
+            return self.get(self.server_name).snapshot()
+        return {
+            "per_tool": {name: b.snapshot() for name, b in self.breakers.items()}
+        }
+
+    def is_open(self) -> bool:
+        """True when no call to the server can currently go through."""
+        if self.per_tool:
+            return False
+        return self.get(self.server_name).state == OPEN
+
+
+def create_circuit_breakers(server_name: str, config: Any) -> Optional[CircuitBreakerSet]:
+    """Build a breaker set from a server's `circuitBreaker` config (True or a dict of options)."""
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    return CircuitBreakerSet(
+        server_name, per_tool=bool(config.get("perTool", False)), **options
+    )
+
+
+def get_circuit_breaker(app, tool_name: str) -> Optional[CircuitBreaker]:
+    breakers: Optional[CircuitBreakerSet] = getattr(app.state, "circuit_breakers", None)
+    return breakers.get(tool_name) if breakers else None
+
+
+def circuit_open_exception(breaker: CircuitBreaker) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={
+            "message": f"Circuit breaker '{breaker.name}' is open; upstream server is unhealthy"
+        },
+        headers={"Retry-After": str(max(int(breaker.retry_after() + 0.999), 1))},
+    )
+
+
+def get_circuit_breaker_dependency(app, tool_name: str):
+    """FastAPI dependency that fails fast, before request validation, while the breaker is open."""
+
+    async def check_circuit_breaker():
+        breaker = get_circuit_breaker(app, tool_name)
+        if breaker and breaker.state == OPEN:
+            breaker.rejected += 1
+            raise circuit_open_exception(breaker)
+
+    return check_circuit_breaker
@@ -0,0 +1,195 @@
+"""
+Ahead-of-time compiled tool models: `mcpo --compile` writes the Pydantic
+models and OpenAPI document of every server to a Python module, and
+`--compiled` loads them at startup instead of building them from the tool
+schemas. A server whose tools no longer match the module is set up from its
+live schemas as usual.
+"""
+
+import hashlib
+import importlib.util
+import json
+import logging
+import typing
+from typing import Any, Dict, List, Optional, Type
+
+import fastapi
+import pydantic
+from mcp import types
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the layout of generated modules changes
+FORMAT = 1
+
+MODULE_HEADER = '''"""
+Tool models and OpenAPI documents generated by `mcpo --compile`; do not edit.
+Load with `mcpo --compiled {path}`.
+"""
+
+from typing import Any, Dict, List, Union
+
+from pydantic import Field, create_model
+
+FORMAT = {format}
+'''
+
+
+def schema_hash(app, initialize_result, tools: List[types.Tool], secured: bool) -> str:
+    """
+    Everything the generated models and OpenAPI document of a server depend
+    on: its tools, what it says about itself, the routes mcpo adds to it and
+    the FastAPI and Pydantic versions.
+    """
+    server_info = getattr(initialize_result, "serverInfo", None)
+    state = {
+        "format": FORMAT,
+        "fastapi": fastapi.__version__,
+        "pydantic": pydantic.VERSION,
+        "server": server_info.model_dump(mode="json") if server_info else None,
+        "instructions": getattr(initialize_result, "instructions", None),
+        "routes": sorted(getattr(route, "path", "") for route in app.routes),
+        "secured": secured,
+        "tools": [
+            tool.model_dump(mode="json", by_alias=True, exclude_none=True)
+            for tool in tools
+        ],
+    }
+    return hashlib.sha256(
+        json.dumps(state, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class ModuleWriter:
+    """Renders Pydantic models as `create_model` calls, dependencies first."""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self._names: Dict[Type[BaseModel], str] = {}
+
+    def model(self, model: Type[BaseModel]) -> str:
+        name = self._names.get(model)
+        if name is not None:
+            return name
+        fields = []
+        for field_name, field in model.model_fields.items():
+            annotation = self._type(field.annotation)
+            fields.append(f"        {field_name!r}: ({annotation}, {_field(field)}),")
+        name = self._names[model] = f"_m{len(self._names)}"
+        self.lines.append(f"{name} = create_model(")
+        self.lines.append(f"    {model.__name__!r},")
+        self.lines.append("    **{")
+        self.lines.extend(fields)
+        self.lines.append("    },")
+        self.lines.append(")")
+        return name
+
+    def _type(self, hint: Any) -> str:
+        if hint is Any:
+            return "Any"
+        if hint is None or hint is type(None):
+            return "None"
+        if hint in (str, int, float, bool):
+            return hint.__name__
+        if isinstance(hint, type) and issubclass(hint, BaseModel):
+            return self.model(hint)
+        origin, args = typing.get_origin(hint), typing.get_args(hint)
+        if origin is typing.Union:
+            return f"Union[{', '.join(self._type(arg) for arg in args)}]"
+        if origin is list:
+            return f"List[{self._type(args[0])}]"
+        if origin is dict:
+            return f"Dict[{self._type(args[0])}, {self._type(args[1])}]"
+        raise TypeError(f"Cannot compile type {hint!r}")
+
+
+def _field(field) -> str:
+    default = "..." if field.default is PydanticUndefined else repr(field.default)
+    options = [f"default={default}", f"description={field.description!r}"]
+    if field.alias is not None:
+        options.append(f"alias={field.alias!r}")
+    return f"Field({', '.join(options)})"
+
+
+def render_module(path: str, servers: Dict[str, Dict[str, Any]]) -> str:
+    """
+    `servers` maps server names to their `hash`, `models` (tool name to a
+    pair of form and response model, either may be None) and `openapi`
+    document.
+    """
+    writer = ModuleWriter()
+    entries = []
+    for server_name, server in servers.items():
+        models = []
+        for tool_name, (form_model, response_model) in server["models"].items():
+            form = writer.model(form_model) if form_model else "None"
+            response = writer.model(response_model) if response_model else "None"
+            models.append(f"            {tool_name!r}: ({form}, {response}),")
+        openapi = json.dumps(
+            server["openapi"], ensure_ascii=False, separators=(",", ":")
+        )
+        entries.extend(
+            [
+                f"    {server_name!r}: {{",
+                f"        'hash': {server['hash']!r},",
+                "        'models': {",
+                *models,
+                "        },",
+                f"        'openapi': {openapi!r},",
+                "    },",
+            ]
+        )
+    return "\n".join(
+        [
+            MODULE_HEADER.format(path=path, format=FORMAT),
+            *writer.lines,
+            "",
+            "SERVERS = {",
+            *entries,
+            "}",
+            "",
+        ]
+    )
+
+
+def write_module(path: str, servers: Dict[str, Dict[str, Any]]) -> None:
+    source = render_module(path, servers)
+    # Fail here rather than at the next start if something did not render
+    compile(source, path, "exec")
+    with open(path, "w") as f:
+        f.write(source)
+
+
+def load_module(path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """The `SERVERS` of a generated module, or None if it cannot be used."""
+    try:
+        spec = importlib.util.spec_from_file_location("mcpo_compiled", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except Exception as e:
+        logger.warning(f"Could not load compiled models from {path}: {e}")
+        return None
+    if getattr(module, "FORMAT", None) != FORMAT:
+        logger.warning(f"{path} was compiled by another mcpo version; recompile it")
+        return None
+    return module.SERVERS
+
+
+def get_compiled(app, digest: str) -> Optional[Dict[str, Any]]:
+    """The app's compiled models if they were compiled from the same schemas."""
+    servers = getattr(app.state, "compiled", None)
+    if servers is None:
+        return None
+    server_name = getattr(app.state, "server_name", app.title)
+    compiled = servers.get(server_name)
+    if compiled is None:
+        logger.warning(f"No compiled models for '{server_name}'; building them")
+        return None
+    if compiled["hash"] != digest:
+        logger.warning(
+            f"Tools of '{server_name}' changed since they were compiled; building them"
+        )
+        return None
+    return compiled
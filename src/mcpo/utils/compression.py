@@ -0,0 +1,296 @@
+import importlib.util
+import logging
+import zlib
+from typing import Any, Dict, List, Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+# Config file keys (camelCase, like the rest of the config) -> Compression kwargs
+CONFIG_KEYS = {
+    "minimumSize": "minimum_size",
+    "encodings": "encodings",
+    "gzipLevel": "gzip_level",
+    "brotliQuality": "brotli_quality",
+    "zstdLevel": "zstd_level",
+}
+
+# Server preference when the client accepts several encodings equally
+PREFERRED_ENCODINGS = ("zstd", "br", "gzip")
+
+# Chunks at least this large are compressed in a worker thread; zlib, brotli
+# and zstandard release the GIL while they work
+THREADED_CHUNK_SIZE = 256 * 1024
+
+_COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/xml",
+    "+json",
+    "+xml",
+    "javascript",
+)
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        import brotli
+
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        try:
+            from compression import zstd  # Python 3.14+
+
+            self._compressor = zstd.ZstdCompressor(level=level)
+        except ImportError:
+            import zstandard
+
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def _installed(module: str) -> bool:
+    try:
+        return importlib.util.find_spec(module) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+def available_encodings() -> List[str]:
+    encodings = ["gzip"]
+    if _installed("brotli"):
+        encodings.append("br")
+    if _installed("compression.zstd") or _installed("zstandard"):
+        encodings.append("zstd")
+    return encodings
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+class Compression:
+    """
+    Response compression settings of one app, plus the counters shown in
+    metrics. Encodings whose library is not installed are left out (brotli
+    needs `brotli`, zstd needs `zstandard` before Python 3.14).
+    """
+
+    def __init__(
+        self,
+        minimum_size: int = 1024,
+        encodings: Optional[List[str]] = None,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+    ):
+        self.minimum_size = minimum_size
+        installed = available_encodings()
+        requested = (
+            [e.lower() for e in encodings] if encodings else list(PREFERRED_ENCODINGS)
+        )
+        missing = [e for e in requested if e not in installed]
+        if encodings and missing:
+            logger.warning(
+                f"Response compression: {', '.join(missing)} not available; "
+                'install "mcpo[compression]" to enable it'
+            )
+        self.encodings = [
+            e for e in PREFERRED_ENCODINGS if e in requested and e in installed
+        ]
+        self.levels = {"gzip": gzip_level, "br": brotli_quality, "zstd": zstd_level}
+        self.stats = {
+            e: {"responses": 0, "bytes_in": 0, "bytes_out": 0} for e in self.encodings
+        }
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        if not accept_encoding:
+            return None
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        best, best_q = None, 0.0
+        for encoding in self.encodings:
+            q = accepted.get(encoding, wildcard)
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def encoder(self, encoding: str):
+        level = self.levels[encoding]
+        if encoding == "gzip":
+            return _GzipEncoder(level)
+        if encoding == "br":
+            return _BrotliEncoder(level)
+        return _ZstdEncoder(level)
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int) -> None:
+        stats = self.stats[encoding]
+        stats["bytes_in"] += bytes_in
+        stats["bytes_out"] += bytes_out
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"minimum_size": self.minimum_size, "per_encoding": self.stats}
+
+
+def create_compression(config: Any) -> Optional[Compression]:
+    """Build settings from a `compression` config (True or a dict of options)."""
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    return Compression(**options)
+
+
+def _is_compressible(headers: MutableHeaders) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    if content_type.startswith("text/event-stream"):
+        # Events must reach the client as they are sent
+        return False
+    return any(t in content_type for t in _COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best encoding both sides support, as
+    negotiated through `Accept-Encoding`. Body chunks are compressed and
+    sent as they arrive rather than buffered; only the first
+    `minimum_size` bytes are held back to decide whether compression is
+    worth it.
+    """
+
+    def __init__(self, app, compression: Compression):
+        self.app = app
+        self.compression = compression
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.compression.encodings:
+            await self.app(scope, receive, send)
+            return
+        encoding = self.compression.negotiate(
+            Headers(scope=scope).get("accept-encoding", "")
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        compression = self.compression
+        start_message = None
+        passthrough = False
+        encoder = None
+        pending = b""
+
+        async def compress(data: bytes) -> bytes:
+            if len(data) >= THREADED_CHUNK_SIZE:
+                return await anyio.to_thread.run_sync(encoder.compress, data)
+            return encoder.compress(data)
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough, encoder, pending
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                if (
+                    message["status"] < 200
+                    or message["status"] in (204, 304)
+                    or not _is_compressible(headers)
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                start_message = {**message, "headers": headers.raw}
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                pending += body
+                if more_body and len(pending) < compression.minimum_size:
+                    return  # not enough yet to decide
+                if not more_body and len(pending) < compression.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send({**message, "body": pending})
+                    return
+
+                encoder = compression.encoder(encoding)
+                compression.stats[encoding]["responses"] += 1
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["Content-Encoding"] = encoding
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # The compressed bytes differ from the identity representation
+                    headers["ETag"] = f"W/{etag}"
+                body, pending = pending, b""
+                out = await compress(body)
+                if not more_body:
+                    out += encoder.finish()
+                    headers["Content-Length"] = str(len(out))
+                else:
+                    del headers["Content-Length"]
+                compression.record(encoding, len(body), len(out))
+                await send(start_message)
+                await send(
+                    {"type": "http.response.body", "body": out, "more_body": more_body}
+                )
+                return
+
+            out = await compress(body) if body else b""
+            if not more_body:
+                out += encoder.finish()
+            compression.record(encoding, len(body), len(out))
+            await send(
+                {"type": "http.response.body", "body": out, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,184 @@
+import logging
+import math
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Config file keys (camelCase, like the rest of the config) -> AdaptiveLimit kwargs
+CONFIG_KEYS = {
+    "initialLimit": "initial_limit",
+    "minLimit": "min_limit",
+    "maxLimit": "max_limit",
+    "tolerance": "tolerance",
+    "smoothing": "smoothing",
+    "backoffRatio": "backoff_ratio",
+    "windowSamples": "window_samples",
+}
+
+# Weight of each window in the long-term latency average
+LONG_TERM_ALPHA = 0.1
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit for one server that follows its latency (a gradient
+    limiter, after Netflix's concurrency-limits).
+
+    Calls are measured in windows of `window_samples`. The window's average
+    latency is compared with a slow-moving long-term average: while it stays
+    within `tolerance` times the long-term one the limit grows by about its
+    square root per window; beyond that it shrinks in proportion. Failed calls
+    (timeouts, dropped connections, server errors) cut it by `backoff_ratio`.
+    The limit only grows when calls actually use most of it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        tolerance: float = 1.5,
+        smoothing: float = 0.2,
+        backoff_ratio: float = 0.9,
+        window_samples: int = 20,
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                "concurrency limits must satisfy 1 <= minLimit <= initialLimit <= maxLimit"
+            )
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff_ratio = backoff_ratio
+        self.window_samples = window_samples
+        self._limit = float(initial_limit)
+        # A fair queue that admits calls up to this limit; without one, calls
+        # over the limit are rejected
+        self.queue = None
+        self.in_flight = 0
+        self.long_latency: Optional[float] = None
+        self.short_latency: Optional[float] = None
+        self._window_total = 0.0
+        self._window_count = 0
+        self._window_dropped = False
+        self._window_max_in_flight = 0
+        self.rejected = 0
+        self.drops = 0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def attach(self, queue) -> None:
+        """
+        Let `queue` enforce the limit, so calls over it wait instead of
+        failing. The queue's own limit becomes the ceiling.
+        """
+        self.queue = queue
+        self.max_limit = min(self.max_limit, queue.limit)
+        self.min_limit = min(self.min_limit, self.max_limit)
+        self._limit = min(self._limit, self.max_limit)
+        queue.set_limit(self.limit)
+
+    def acquire(self) -> bool:
+        """Return True if a call may proceed; every granted call must be followed by release()."""
+        if self.queue is None and self.in_flight >= self.limit:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        self._window_max_in_flight = max(self._window_max_in_flight, self.in_flight)
+        return True
+
+    def release(self, duration: Optional[float] = None, dropped: bool = False) -> None:
+        """End a call; `duration` None (e.g. cancelled) leaves it out of the measurements."""
+        self.in_flight -= 1
+        if duration is None:
+            return
+        if dropped:
+            self.drops += 1
+            self._window_dropped = True
+        else:
+            self._window_total += duration
+            self._window_count += 1
+        if self._window_dropped or self._window_count >= self.window_samples:
+            self._update()
+
+    def _update(self) -> None:
+        limit = self._limit
+        if self._window_dropped:
+            new_limit = limit * self.backoff_ratio
+        else:
+            short = self._window_total / self._window_count
+            self.short_latency = short
+            if self.long_latency is None:
+                self.long_latency = short
+            else:
+                self.long_latency += LONG_TERM_ALPHA * (short - self.long_latency)
+                if self.long_latency > 2 * short:
+                    # Latency is back to normal after an overload: catch up faster
+                    self.long_latency *= 0.95
+            gradient = max(0.5, min(1.0, self.tolerance * self.long_latency / short))
+            if gradient == 1.0 and self._window_max_in_flight < limit / 2:
+                # Not using the limit we have; no evidence it could be higher
+                new_limit = limit
+            else:
+                new_limit = limit * gradient + math.sqrt(limit)
+            new_limit = limit * (1 - self.smoothing) + new_limit * self.smoothing
+        new_limit = min(max(new_limit, self.min_limit), self.max_limit)
+
+        if int(new_limit) > int(limit):
+            self.increases += 1
+        elif int(new_limit) < int(limit):
+            self.decreases += 1
+            logger.debug(f"Concurrency limit of '{self.name}' down to {int(new_limit)}")
+        self._limit = new_limit
+        if self.queue is not None:
+            self.queue.set_limit(self.limit)
+
+        self._window_total = 0.0
+        self._window_count = 0
+        self._window_dropped = False
+        self._window_max_in_flight = self.in_flight
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "drops": self.drops,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "latency_ms": round((self.short_latency or 0.0) * 1000, 3),
+            "long_term_latency_ms": round((self.long_latency or 0.0) * 1000, 3),
+        }
+
+
+def create_adaptive_limit(server_name: str, config: Any) -> Optional[AdaptiveLimit]:
+    """Build a limiter from a server's `concurrency` config (True or a dict of options)."""
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    return AdaptiveLimit(server_name, **options)
+
+
+def get_adaptive_limit(app) -> Optional[AdaptiveLimit]:
+    return getattr(app.state, "concurrency_limit", None)
+
+
+def concurrency_limit_exception(limit: AdaptiveLimit) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={
+            "message": f"Server '{limit.name}' is at its concurrency limit ({limit.limit}); try again later"
+        },
+        headers={"Retry-After": "1"},
+    )
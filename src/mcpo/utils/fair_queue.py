@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+
+# Config file keys (camelCase, like the rest of the config) -> WeightedFairQueue kwargs
+CONFIG_KEYS = {
+    "maxConcurrency": "limit",
+    "maxQueued": "max_queued",
+    "queueTimeout": "timeout",
+}
+
+
+class _ClientStats:
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = 0
+        self.queued = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queued": self.queued,
+            "wait_seconds": round(self.wait_seconds, 6),
+            "max_wait_seconds": round(self.max_wait_seconds, 6),
+        }
+
+
+class WeightedFairQueue:
+    """
+    Admits at most `limit` concurrent calls and queues the rest, serving
+    clients in proportion to their weight (start-time fair queuing).
+
+    Each queued call gets a virtual finish tag `max(vtime, client's last
+    tag) + 1 / weight`; the call with the smallest tag is admitted next. A
+    client that floods the queue only pushes its own tags further out, so
+    calls from other clients keep getting slots at their fair share.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        max_queued: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        if limit < 1:
+            raise ValueError("maxConcurrency must be at least 1")
+        self.name = name
+        self.limit = limit
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.active = 0
+        self._heap = []  # (finish tag, seq, start tag, client, future)
+        self._waiting = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._seq = itertools.count()
+        self._clients: Dict[str, _ClientStats] = {}
+
+    def _stats(self, client: str) -> _ClientStats:
+        stats = self._clients.get(client)
+        if stats is None:
+            stats = self._clients[client] = _ClientStats()
+        return stats
+
+    @property
+    def queued(self) -> int:
+        return self._waiting
+
+    def _dispatch(self) -> None:
+        while self.active < self.limit and self._heap:
+            _, _, start_tag, _, future = heapq.heappop(self._heap)
+            if future.done():
+                continue  # waiter gave up
+            self._waiting -= 1
+            self._virtual_time = start_tag
+            self.active += 1
+            future.set_result(None)
+
+    async def acquire(self, client: str, weight: float = 1.0) -> None:
+        stats = self._stats(client)
+        if self.active < self.limit and not self._waiting:
+            self.active += 1
+            stats.admitted += 1
+            return
+
+        if self.max_queued is not None and self._waiting >= self.max_queued:
+            stats.rejected += 1
+            raise queue_full_exception(self)
+
+        start_tag = max(self._virtual_time, self._last_finish.get(client, 0.0))
+        finish_tag = start_tag + 1.0 / weight
+        self._last_finish[client] = finish_tag
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._heap, (finish_tag, next(self._seq), start_tag, client, future)
+        )
+        self._waiting += 1
+        stats.queued += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # A slot was handed to us just as we gave up: pass it on
+                self.release()
+            else:
+                future.cancel()
+                self._waiting -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                stats.rejected += 1
+                raise queue_full_exception(self)
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            stats.wait_seconds += waited
+            stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+        stats.admitted += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._dispatch()
+
+    def set_limit(self, limit: int) -> None:
+        """Change the limit; calls already admitted keep their slots."""
+        self.limit = max(1, limit)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client: str, weight: float = 1.0):
+        await self.acquire(client, weight)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.queued,
+            "per_client": {
+                client: stats.snapshot() for client, stats in self._clients.items()
+            },
+        }
+
+
+def create_fair_queue(server_name: str, config: Any) -> Optional[WeightedFairQueue]:
+    """Build a queue from a server's `queue` config (a dict with at least `maxConcurrency`)."""
+    if not config:
+        return None
+    if isinstance(config, int):
+        config = {"maxConcurrency": config}
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    if "limit" not in options:
+        raise ValueError(f"'queue' of server '{server_name}' needs 'maxConcurrency'")
+    return WeightedFairQueue(server_name, **options)
+
+
+def queue_full_exception(queue: WeightedFairQueue) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={"message": f"Server '{queue.name}' is at capacity; try again later"},
+        headers={"Retry-After": "1"},
+    )
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from mcpo.utils.tracing import trace_mark
+
+logger = logging.getLogger(__name__)
+
+# Config file keys (camelCase, like the rest of the config) -> HedgingPolicy kwargs
+CONFIG_KEYS = {
+    "tools": "tools",
+    "percentile": "percentile",
+    "minDelayMs": "min_delay_ms",
+    "maxDelayMs": "max_delay_ms",
+    "maxHedgeRatio": "max_hedge_ratio",
+    "window": "window",
+    "cancelUpstream": "cancel_upstream",
+}
+
+# No hedging until a tool has this many latency samples to take a percentile of
+MIN_SAMPLES = 20
+# How many unspent hedges may pile up while traffic is quiet
+HEDGE_BURST = 10.0
+# The delay percentile is recomputed after this many new samples
+DELAY_REFRESH = 10
+
+
+class ToolLatency:
+    """Recent latencies of one tool and how its hedged calls went."""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._delay: Optional[float] = None
+        self._new_samples = 0
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._new_samples += 1
+
+    def delay(
+        self, percentile: float, min_delay: float, max_delay: float
+    ) -> Optional[float]:
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+        if self._delay is None or self._new_samples >= DELAY_REFRESH:
+            ordered = sorted(self.samples)
+            index = min(int(len(ordered) * percentile / 100), len(ordered) - 1)
+            self._delay = min(max(ordered[index], min_delay), max_delay)
+            self._new_samples = 0
+        return self._delay
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "delay_ms": (
+                round(self._delay * 1000, 3) if self._delay is not None else 0.0
+            ),
+        }
+
+
+class HedgingPolicy:
+    """
+    Hedged calls for idempotent tools on servers with several replicas.
+
+    A call that has not answered after the tool's recent `percentile` latency
+    is sent again to another replica; the first successful answer is used and
+    the other call is abandoned (and cancelled upstream with `cancel_upstream`).
+    Each call earns `max_hedge_ratio` of a hedge, so at most that share of
+    calls is ever duplicated.
+    """
+
+    def __init__(
+        self,
+        server_name: str,
+        tools: Optional[Iterable[str]] = None,
+        percentile: float = 95.0,
+        min_delay_ms: float = 10.0,
+        max_delay_ms: float = 10_000.0,
+        max_hedge_ratio: float = 0.1,
+        window: int = 200,
+        cancel_upstream: bool = False,
+    ):
+        self.server_name = server_name
+        # Tools named in the config, on top of those annotated as idempotent
+        self.tools = set(tools or ())
+        self.percentile = percentile
+        self.min_delay = min_delay_ms / 1000
+        self.max_delay = max_delay_ms / 1000
+        self.max_hedge_ratio = max_hedge_ratio
+        self.window = window
+        # Send `notifications/cancelled` for the losing call. Off by default:
+        # servers on some MCP SDK versions drop the whole session when a
+        # cancellation races the call's own response.
+        self.cancel_upstream = cancel_upstream
+        self.per_tool: Dict[str, ToolLatency] = {}
+        self._budget = 0.0
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.skipped_budget = 0
+        self.skipped_no_replica = 0
+
+    def mark_idempotent(self, tool) -> None:
+        """Hedge `tool` if its annotations say repeating it is safe."""
+        annotations = getattr(tool, "annotations", None)
+        if annotations and (annotations.readOnlyHint or annotations.idempotentHint):
+            self.tools.add(tool.name)
+
+    def applies(self, tool_name: str) -> bool:
+        return tool_name in self.tools
+
+    async def call(self, pool, tool_name: str, call: Callable[[Any], Awaitable[Any]]):
+        """Run `call(replica)` on a leased replica, hedging it onto a second one when slow."""
+        stats = self.per_tool.get(tool_name)
+        if stats is None:
+            stats = self.per_tool[tool_name] = ToolLatency(self.window)
+        stats.calls += 1
+        self.calls += 1
+        self._budget = min(self._budget + self.max_hedge_ratio, HEDGE_BURST)
+        delay = stats.delay(self.percentile, self.min_delay, self.max_delay)
+
+        leased = []
+
+        async def attempt(replica=None):
+            async with pool.lease(replica) as replica:
+                leased.append(replica)
+                return await call(replica)
+
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(attempt())
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done:
+                hedge = self._hedge(pool, leased, attempt)
+            if hedge is None:
+                result = await primary
+                stats.record(time.perf_counter() - start)
+                return result
+
+            stats.hedges += 1
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        continue
+                    # Time until the primary answered, or at least how long
+                    # it had been running when the hedge beat it
+                    stats.record(time.perf_counter() - start)
+                    if task is hedge:
+                        stats.hedge_wins += 1
+                        self.hedge_wins += 1
+                    return task.result()
+            # Both failed: report the primary's error
+            return primary.result()
+        finally:
+            losers = [t for t in (primary, hedge) if t is not None and not t.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
+
+    def _hedge(self, pool, leased, attempt) -> Optional[asyncio.Future]:
+        if self._budget < 1:
+            self.skipped_budget += 1
+            return None
+        target = pool.hedge_target(leased[0]) if leased else None
+        if target is None:
+            self.skipped_no_replica += 1
+            return None
+        self._budget -= 1
+        self.hedges += 1
+        trace_mark("hedge")
+        return asyncio.ensure_future(attempt(target))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_rate": self.hedges / self.calls if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "skipped_budget": self.skipped_budget,
+            "skipped_no_replica": self.skipped_no_replica,
+            "per_tool": {name: s.snapshot() for name, s in self.per_tool.items()},
+        }
+
+
+def create_hedging_policy(server_name: str, config: Any) -> Optional[HedgingPolicy]:
+    """Build a policy from a server's `hedging` config (True or a dict of options)."""
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    return HedgingPolicy(server_name, **options)
+
+
+def get_hedging_policy(app) -> Optional[HedgingPolicy]:
+    return getattr(app.state, "hedging", None)
@@ -0,0 +1,154 @@
+import importlib.util
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from mcpo.utils.tracing import TRACEPARENT_HEADER, traceparent_from_body
+
+logger = logging.getLogger(__name__)
+
+# Config file keys (camelCase, like the rest of the config) -> UpstreamHTTPPool kwargs
+CONFIG_KEYS = {
+    "maxConnections": "max_connections",
+    "maxKeepaliveConnections": "max_keepalive_connections",
+    "keepaliveExpiry": "keepalive_expiry",
+    "http2": "http2",
+    "connectTimeout": "connect_timeout",
+    "readTimeout": "read_timeout",
+    "uds": "uds",
+    "verify": "verify",
+}
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """
+    Hands requests to a pooled transport but ignores close().
+
+    The MCP SDK closes the client it gets from `httpx_client_factory` when the
+    connection ends; this keeps the underlying connection pool alive so it can
+    be reused by the next connection to the same server.
+
+    It also copies the trace context of an MCP request's `_meta` into a
+    `traceparent` header, since the SDK sends requests from its own task and
+    so cannot take per-request headers.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "POST" and TRACEPARENT_HEADER not in request.headers:
+            try:
+                traceparent = traceparent_from_body(request.content)
+            except httpx.RequestNotRead:
+                traceparent = None
+            if traceparent:
+                request.headers[TRACEPARENT_HEADER] = traceparent
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class UpstreamHTTPPool:
+    """Keep-alive connection pool shared by every MCP connection to one remote server."""
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 30.0,
+        http2: bool = False,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        uds: Optional[str] = None,
+        verify: Any = True,
+    ):
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning(
+                "HTTP/2 requested but the 'h2' package is not installed (pip install 'mcpo[http2]'); using HTTP/1.1"
+            )
+            http2 = False
+
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.uds = uds
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.transport = httpx.AsyncHTTPTransport(
+            verify=verify,
+            http2=http2,
+            limits=self.limits,
+            uds=uds,
+        )
+        self.clients_created = 0
+
+    def client_factory(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[httpx.Timeout] = None,
+        auth: Optional[httpx.Auth] = None,
+    ) -> httpx.AsyncClient:
+        """`httpx_client_factory` for the SDK's `sse_client` / `streamablehttp_client`."""
+        if timeout is None:
+            timeout = httpx.Timeout(30.0)
+        if self.connect_timeout is not None:
+            timeout = httpx.Timeout(
+                connect=self.connect_timeout,
+                read=timeout.read,
+                write=timeout.write,
+                pool=timeout.pool,
+            )
+        self.clients_created += 1
+        return httpx.AsyncClient(
+            transport=_SharedTransport(self.transport),
+            headers=headers,
+            timeout=timeout,
+            auth=auth,
+            follow_redirects=True,
+        )
+
+    def transport_kwargs(self, sse_read_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Keyword arguments for the SDK transport clients."""
+        return {
+            "httpx_client_factory": self.client_factory,
+            "sse_read_timeout": (
+                self.read_timeout if self.read_timeout is not None else sse_read_timeout
+            ),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        pool = getattr(self.transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        return {
+            "http2": self.http2,
+            "uds": self.uds is not None,
+            "clients_created": self.clients_created,
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+        }
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def create_http_pool(config: Optional[Dict[str, Any]] = None) -> UpstreamHTTPPool:
+    """Build a pool from a server's `http` config section."""
+    config = config or {}
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    return UpstreamHTTPPool(**options)
+
+
+def get_http_pool(app) -> UpstreamHTTPPool:
+    """Return the app's upstream pool, creating one with default limits if needed."""
+    pool = getattr(app.state, "http_pool", None)
+    if pool is None:
+        pool = app.state.http_pool = UpstreamHTTPPool()
+    return pool
@@ -0,0 +1,376 @@
+"""
+`Idempotency-Key` support for tool calls: the first request with a key runs
+the tool, retries with the same key get its stored response instead of
+running it again.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import anyio
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from mcpo.utils.spool import keeping_result, response_body
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+IDEMPOTENCY_KEY_HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# Config file keys (camelCase, like the rest of the config) -> Idempotency kwargs
+CONFIG_KEYS = {
+    "ttlSeconds": "ttl",
+    "maxEntries": "max_entries",
+    "waitSeconds": "wait_seconds",
+    "lockSeconds": "lock_seconds",
+}
+
+# How often a retry re-checks a key another process is still working on
+POLL_INTERVAL = 0.2
+# Error responses that say nothing final about the request, so are not kept
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429}
+
+
+class Record:
+    __slots__ = (
+        "fingerprint",
+        "state",
+        "status_code",
+        "media_type",
+        "body",
+        "expires_at",
+    )
+
+    def __init__(
+        self,
+        fingerprint: str,
+        state: str,
+        expires_at: float,
+        status_code: Optional[int] = None,
+        media_type: Optional[str] = None,
+        body: Optional[bytes] = None,
+    ):
+        self.fingerprint = fingerprint
+        self.state = state
+        self.expires_at = expires_at
+        self.status_code = status_code
+        self.media_type = media_type
+        self.body = body
+
+
+class MemoryIdempotencyStore:
+    """Keys held in this process; the oldest are dropped past `max_entries`."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._records: "OrderedDict[str, Record]" = OrderedDict()
+
+    async def claim(
+        self, key: str, fingerprint: str, lock_seconds: float
+    ) -> Optional[Record]:
+        """Take `key` for a new call and return None, or return its current record."""
+        now = time.time()
+        record = self._records.get(key)
+        if record is not None and record.expires_at > now:
+            return record
+        self._records[key] = Record(fingerprint, IN_PROGRESS, now + lock_seconds)
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+        return None
+
+    async def complete(
+        self, key: str, status_code: int, media_type: str, body: bytes, ttl: float
+    ) -> None:
+        record = self._records.get(key)
+        if record is not None:
+            record.state = COMPLETED
+            record.status_code = status_code
+            record.media_type = media_type
+            record.body = body
+            record.expires_at = time.time() + ttl
+
+    async def release(self, key: str) -> None:
+        record = self._records.get(key)
+        if record is not None and record.state == IN_PROGRESS:
+            del self._records[key]
+
+    def size(self) -> int:
+        return len(self._records)
+
+
+class SQLiteIdempotencyStore:
+    """
+    Keys in a SQLite file, shared by every mcpo process on the host that
+    points at the same `path`.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, state TEXT NOT NULL, "
+            "status_code INTEGER, media_type TEXT, body BLOB, expires_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency (expires_at)"
+        )
+        # One statement at a time on the shared connection
+        self._limiter = anyio.CapacityLimiter(1)
+        self._claims = 0
+        self._entries = self._count()
+
+    async def _run(self, fn, *args):
+        return await anyio.to_thread.run_sync(fn, *args, limiter=self._limiter)
+
+    def _claim(
+        self, key: str, fingerprint: str, lock_seconds: float
+    ) -> Optional[Record]:
+        now = time.time()
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT fingerprint, state, expires_at, status_code, media_type, body "
+                "FROM idempotency WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is not None and row[2] > now:
+                return Record(*row)
+            if row is None:
+                self._entries += 1
+            db.execute(
+                "INSERT OR REPLACE INTO idempotency (key, fingerprint, state, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, fingerprint, IN_PROGRESS, now + lock_seconds),
+            )
+            self._claims += 1
+            if self._claims % 100 == 0:
+                self._prune(now)
+            return None
+        finally:
+            db.execute("COMMIT")
+
+    def _prune(self, now: float) -> None:
+        self._db.execute("DELETE FROM idempotency WHERE expires_at <= ?", (now,))
+        excess = self._count() - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM idempotency WHERE key IN "
+                "(SELECT key FROM idempotency ORDER BY expires_at LIMIT ?)",
+                (excess,),
+            )
+        self._entries = self._count()
+
+    def _complete(self, key, status_code, media_type, body, ttl) -> None:
+        self._db.execute(
+            "UPDATE idempotency SET state = ?, status_code = ?, media_type = ?, "
+            "body = ?, expires_at = ? WHERE key = ?",
+            (COMPLETED, status_code, media_type, body, time.time() + ttl, key),
+        )
+
+    def _release(self, key: str) -> None:
+        self._db.execute(
+            "DELETE FROM idempotency WHERE key = ? AND state = ?", (key, IN_PROGRESS)
+        )
+
+    def _count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM idempotency").fetchone()[0]
+
+    async def claim(
+        self, key: str, fingerprint: str, lock_seconds: float
+    ) -> Optional[Record]:
+        return await self._run(self._claim, key, fingerprint, lock_seconds)
+
+    async def complete(
+        self, key: str, status_code: int, media_type: str, body: bytes, ttl: float
+    ) -> None:
+        await self._run(self._complete, key, status_code, media_type, body, ttl)
+
+    async def release(self, key: str) -> None:
+        await self._run(self._release, key)
+
+    def size(self) -> int:
+        """Rows in the file as of the last cleanup, plus keys added since."""
+        return self._entries
+
+
+class Idempotency:
+    """
+    Runs each (API key, tool, `Idempotency-Key`) once and replays its response
+    to retries for `ttl` seconds. A retry that arrives while the first call is
+    still running waits up to `wait_seconds` for it, then gets `409`. A retry
+    with different arguments gets `422`. Server errors are not kept, so
+    retrying after one runs the tool again.
+    """
+
+    def __init__(
+        self,
+        store,
+        ttl: float = 86400.0,
+        wait_seconds: float = 30.0,
+        lock_seconds: float = 300.0,
+    ):
+        self.store = store
+        self.ttl = ttl
+        self.wait_seconds = wait_seconds
+        # How long a key stays taken by a call that never finishes (a crash)
+        self.lock_seconds = lock_seconds
+        self._finished: Dict[str, asyncio.Event] = {}
+        self.executed = 0
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+        self.mismatches = 0
+
+    async def run(
+        self,
+        request: Request,
+        server: str,
+        tool: str,
+        arguments: dict,
+        call: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        idempotency_key = request.headers[IDEMPOTENCY_KEY_HEADER]
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Idempotency-Key is longer than {MAX_KEY_LENGTH} characters",
+            )
+        api_key = getattr(request.state, "api_key", None)
+        owner = api_key.name if api_key is not None else ""
+        key = f"{owner}\0{server}\0{tool}\0{idempotency_key}"
+        fingerprint = hashlib.sha256(
+            json.dumps(arguments, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+        deadline = time.monotonic() + self.wait_seconds
+        waited = False
+        while True:
+            record = await self.store.claim(key, fingerprint, self.lock_seconds)
+            if record is None:
+                break
+            if record.fingerprint != fingerprint:
+                self._finished.pop(key, None)
+                self.mismatches += 1
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used with different arguments",
+                )
+            if record.state == COMPLETED:
+                self._finished.pop(key, None)
+                self.replayed += 1
+                return Response(
+                    content=record.body,
+                    status_code=record.status_code,
+                    media_type=record.media_type,
+                    headers={"Idempotent-Replayed": "true"},
+                )
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._finished.pop(key, None)
+                self.conflicts += 1
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress",
+                    headers={"Retry-After": "1"},
+                )
+            if not waited:
+                waited = True
+                self.waited += 1
+            # Woken at once by a call in this process, polled for other processes
+            finished = self._finished.setdefault(key, asyncio.Event())
+            try:
+                await asyncio.wait_for(finished.wait(), min(POLL_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+        self.executed += 1
+        try:
+            with keeping_result():
+                response = encode_response(await call())
+        except HTTPException as e:
+            if e.status_code < 500 and e.status_code not in RETRYABLE_STATUS_CODES:
+                body = json.dumps({"detail": jsonable_encoder(e.detail)}).encode()
+                await self._complete(key, e.status_code, "application/json", body)
+            else:
+                await self._release(key)
+            raise
+        except BaseException:
+            with anyio.CancelScope(shield=True):
+                await self._release(key)
+            raise
+        await self._complete(
+            key, response.status_code, response.media_type, response_body(response)
+        )
+        return response
+
+    async def _complete(self, key, status_code, media_type, body) -> None:
+        await self.store.complete(key, status_code, media_type, body, self.ttl)
+        self._wake(key)
+
+    async def _release(self, key) -> None:
+        await self.store.release(key)
+        self._wake(key)
+
+    def _wake(self, key: str) -> None:
+        finished = self._finished.pop(key, None)
+        if finished is not None:
+            finished.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "entries": self.store.size(),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "waited": self.waited,
+            "conflicts": self.conflicts,
+            "mismatches": self.mismatches,
+        }
+
+
+def encode_response(result: Any) -> Response:
+    """The response FastAPI would send for `result`, encoded once so it can be stored."""
+    if isinstance(result, Response):
+        return result
+    return JSONResponse(content=jsonable_encoder(result))
+
+
+def create_idempotency(config: Any) -> Optional[Idempotency]:
+    """
+    Build from the `idempotency` config: True for an in-memory store, a SQLite
+    file path, or a dict of options with an optional `path`.
+    """
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    elif isinstance(config, str):
+        config = {"path": config}
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    max_entries = options.pop("max_entries", 10000)
+    path = config.get("path")
+    if path and path != "memory":
+        store = SQLiteIdempotencyStore(path, max_entries)
+    else:
+        store = MemoryIdempotencyStore(max_entries)
+    return Idempotency(store, **options)
+
+
+def get_idempotency(app) -> Optional[Idempotency]:
+    return getattr(app.state, "idempotency", None)
@@ -0,0 +1,307 @@
+"""
+Asynchronous tool calls: `POST /{tool}?async=1` (or `Prefer: respond-async`)
+answers `202` with a job id at once, the call runs in the background and its
+result is fetched from `GET /_jobs/{id}`.
+"""
+
+import asyncio
+import json
+import logging
+import secrets
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+
+from mcpo.utils.spool import keeping_result, response_body
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Config file keys (camelCase, like the rest of the config) -> JobStore kwargs
+CONFIG_KEYS = {
+    "maxRunning": "max_running",
+    "maxJobs": "max_jobs",
+    "ttlSeconds": "ttl",
+    "maxWaitSeconds": "max_wait",
+}
+
+_current_job: ContextVar[Optional["Job"]] = ContextVar("mcpo_job", default=None)
+
+
+class JobStoreFullError(Exception):
+    """Every slot in the job store holds a job that has not finished yet."""
+
+
+def wants_async(request: Request) -> bool:
+    """True if the caller asked for `?async=1` or sent `Prefer: respond-async`."""
+    value = request.query_params.get("async")
+    if value is not None:
+        return value.lower() in ("1", "true", "yes")
+    return "respond-async" in request.headers.get("prefer", "").lower()
+
+
+class Job:
+    def __init__(self, server: str, tool: str, owner: Optional[str]):
+        self.id = secrets.token_urlsafe(16)
+        self.server = server
+        self.tool = tool
+        self.owner = owner
+        self.status = PENDING
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress: Optional[Dict[str, Any]] = None
+        self.result: Any = None
+        self.error: Optional[Dict[str, Any]] = None
+        self.task: Optional[asyncio.Task] = None
+        self.finished = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.finished.is_set()
+
+    async def report_progress(
+        self, progress: float, total: Optional[float], message: Optional[str]
+    ) -> None:
+        """Progress callback for the upstream `tools/call`."""
+        self.progress = {"progress": progress, "total": total, "message": message}
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "server": self.server,
+            "tool": self.tool,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.progress:
+            data["progress"] = self.progress
+        if self.status == SUCCEEDED:
+            data["result"] = self.result
+        elif self.error:
+            data["error"] = self.error
+        return data
+
+
+def current_job_progress() -> Optional[Callable[..., Awaitable[None]]]:
+    """The progress callback of the job the current call runs in, if any."""
+    job = _current_job.get()
+    return job.report_progress if job is not None else None
+
+
+class JobStore:
+    """
+    Runs async tool calls with at most `max_running` at a time and keeps up to
+    `max_jobs` of them. Finished jobs are dropped `ttl` seconds after they
+    finish, or earlier (oldest first) to make room for new ones.
+    """
+
+    def __init__(
+        self,
+        max_running: int = 16,
+        max_jobs: int = 1000,
+        ttl: float = 600.0,
+        max_wait: float = 60.0,
+    ):
+        self.max_running = max_running
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.max_wait = max_wait
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._finished = deque()  # (monotonic finish time, job id), oldest first
+        self._slots = asyncio.Semaphore(max_running)
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.evicted = 0
+        self.rejected = 0
+
+    def submit(
+        self,
+        server: str,
+        tool: str,
+        owner: Optional[str],
+        run: Callable[[], Awaitable[Any]],
+    ) -> Job:
+        self._prune()
+        if len(self._jobs) >= self.max_jobs:
+            if not self._finished:
+                self.rejected += 1
+                raise JobStoreFullError(f"{len(self._jobs)} jobs are unfinished")
+            _, job_id = self._finished.popleft()
+            self._jobs.pop(job_id, None)
+            self.evicted += 1
+
+        job = Job(server, tool, owner)
+        self._jobs[job.id] = job
+        self.submitted += 1
+        job.task = asyncio.ensure_future(self._run(job, run))
+        return job
+
+    async def _run(self, job: Job, run: Callable[[], Awaitable[Any]]) -> None:
+        _current_job.set(job)
+        try:
+            async with self._slots:
+                job.status = RUNNING
+                job.started_at = time.time()
+                with keeping_result():
+                    result = await run()
+            if isinstance(result, Response):
+                # Kept, so encoded as the synchronous endpoint would send it,
+                # through the tool's response model
+                result = json.loads(response_body(result, close=True))
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+            self.cancelled += 1
+        except HTTPException as e:
+            job.status = FAILED
+            job.error = {"status_code": e.status_code, "detail": e.detail}
+            self.failed += 1
+        except Exception as e:
+            logger.info(f"Job {job.id} ({job.server}/{job.tool}) failed: {e!r}")
+            job.status = FAILED
+            job.error = {
+                "status_code": 500,
+                "detail": {"message": "Unexpected error", "error": str(e)},
+            }
+            self.failed += 1
+        else:
+            job.status = SUCCEEDED
+            job.result = result
+            self.succeeded += 1
+        finally:
+            job.finished_at = time.time()
+            self._finished.append((time.monotonic(), job.id))
+            job.finished.set()
+
+    def get(self, job_id: str, owner: Optional[str]) -> Optional[Job]:
+        """The job, if it exists and was submitted with the same API key."""
+        self._prune()
+        job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    async def wait(self, job: Job, timeout: float) -> None:
+        """Long-poll: return when the job finishes or after `timeout` seconds."""
+        timeout = min(timeout, self.max_wait)
+        if timeout > 0 and not job.done:
+            try:
+                await asyncio.wait_for(job.finished.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def cancel(self, job: Job) -> None:
+        if not job.done:
+            job.task.cancel()
+            await job.finished.wait()
+
+    async def drain(self, timeout: float) -> int:
+        """Wait up to `timeout` seconds for unfinished jobs; the number still unfinished."""
+        tasks = [job.task for job in self._jobs.values() if not job.done]
+        if tasks and timeout > 0:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            return len(pending)
+        return len(tasks)
+
+    async def close(self) -> None:
+        tasks = [job.task for job in self._jobs.values() if not job.done]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _prune(self) -> None:
+        deadline = time.monotonic() - self.ttl
+        while self._finished and self._finished[0][0] <= deadline:
+            _, job_id = self._finished.popleft()
+            if self._jobs.pop(job_id, None) is not None:
+                self.expired += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._prune()
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            "jobs": len(statuses),
+            "pending": statuses.count(PENDING),
+            "running": statuses.count(RUNNING),
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "rejected": self.rejected,
+        }
+
+
+def create_job_store(config: Any) -> Optional[JobStore]:
+    """Build a job store from the `jobs` config (True or a dict of options)."""
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    return JobStore(**options)
+
+
+def get_job_store(app) -> Optional[JobStore]:
+    return getattr(app.state, "jobs", None)
+
+
+def job_owner(request: Request) -> Optional[str]:
+    api_key = getattr(request.state, "api_key", None)
+    return api_key.name if api_key is not None else None
+
+
+def job_accepted_response(job: Job) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content=job.to_dict(),
+        headers={"Location": f"/_jobs/{job.id}"},
+    )
+
+
+def job_store_full_exception(store: JobStore) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={"message": f"Too many unfinished jobs (limit {store.max_jobs})"},
+        headers={"Retry-After": "1"},
+    )
+
+
+def add_job_endpoints(main_app: FastAPI, store: JobStore, api_dependency=None) -> None:
+    """Add `GET /_jobs/{id}` (optionally long-polling with `?wait=`) and `DELETE /_jobs/{id}`."""
+    dependencies = [Depends(api_dependency)] if api_dependency else []
+
+    def find(request: Request, job_id: str) -> Job:
+        job = store.get(job_id, job_owner(request))
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found or expired")
+        return job
+
+    @main_app.get("/_jobs/{job_id}", include_in_schema=False, dependencies=dependencies)
+    async def get_job(request: Request, job_id: str, wait: float = 0.0):
+        job = find(request, job_id)
+        await store.wait(job, wait)
+        return job.to_dict()
+
+    @main_app.delete(
+        "/_jobs/{job_id}", include_in_schema=False, dependencies=dependencies
+    )
+    async def cancel_job(request: Request, job_id: str):
+        job = find(request, job_id)
+        await store.cancel(job)
+        return job.to_dict()
@@ -0,0 +1,124 @@
+"""
+Listening sockets other than uvicorn's default TCP one: a Unix domain socket
+for clients on the same host (alongside TCP or instead of it), and TCP bound
+with SO_REUSEPORT so several independent mcpo processes can share a port.
+"""
+
+import errno
+import logging
+import os
+import socket
+import stat
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Config file keys (camelCase, like the rest of the config) -> Listeners kwargs
+CONFIG_KEYS = {
+    "uds": "uds",
+    "tcp": "tcp",
+    "reusePort": "reuse_port",
+}
+
+# Same as uvicorn's --uds: access is controlled by API keys, not the file mode
+UDS_MODE = 0o666
+
+
+class Listeners:
+    """Binds the sockets mcpo listens on, for `uvicorn.Server.serve(sockets=...)`."""
+
+    def __init__(
+        self, uds: Optional[str] = None, tcp: bool = True, reuse_port: bool = False
+    ):
+        if not uds and not tcp:
+            raise ValueError("'listen' needs 'uds' when 'tcp' is false")
+        if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+            raise ValueError("SO_REUSEPORT is not supported on this platform")
+        self.uds = uds
+        self.tcp = tcp
+        self.reuse_port = reuse_port
+        self._uds_bound = False
+
+    def bind(self, host: str, port: int) -> List[socket.socket]:
+        sockets = []
+        if self.tcp:
+            sockets.append(bind_tcp(host, port, self.reuse_port))
+            address = f"[{host}]" if ":" in host else host
+            logger.info(
+                f"Listening on http://{address}:{port}"
+                + (" (SO_REUSEPORT)" if self.reuse_port else "")
+            )
+        if self.uds:
+            sockets.append(bind_uds(self.uds))
+            self._uds_bound = True
+            logger.info(f"Listening on unix socket {self.uds}")
+        return sockets
+
+    def adopt(self, sockets: List[socket.socket]) -> None:
+        """Take over the socket file along with sockets inherited from a restart."""
+        self._uds_bound = any(
+            sock.family == socket.AF_UNIX and sock.getsockname() == self.uds
+            for sock in sockets
+        )
+
+    def remove_uds(self) -> None:
+        """Remove the socket file, if this process created it."""
+        if self._uds_bound:
+            try:
+                os.unlink(self.uds)
+            except FileNotFoundError:
+                pass
+
+
+def bind_tcp(host: str, port: int, reuse_port: bool = False) -> socket.socket:
+    # IPPROTO_TCP explicitly: asyncio only sets TCP_NODELAY on connections
+    # accepted from sockets that say they are TCP
+    sock = socket.socket(
+        socket.AF_INET6 if ":" in host else socket.AF_INET,
+        socket.SOCK_STREAM,
+        socket.IPPROTO_TCP,
+    )
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    try:
+        sock.bind((host, port))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def bind_uds(path: str) -> socket.socket:
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise OSError(errno.EEXIST, f"{path} exists and is not a socket")
+        # Left behind by a process that did not exit cleanly, unless one still answers
+        with socket.socket(socket.AF_UNIX) as probe:
+            try:
+                probe.connect(path)
+            except OSError:
+                os.unlink(path)
+            else:
+                raise OSError(errno.EADDRINUSE, f"{path} is in use")
+    sock = socket.socket(socket.AF_UNIX)
+    try:
+        sock.bind(path)
+        os.chmod(path, UDS_MODE)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def create_listeners(config: Any) -> Optional[Listeners]:
+    """Build from the `listen` config; None when uvicorn can bind host:port itself."""
+    if not config:
+        return None
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    if options.get("uds"):
+        options["uds"] = os.path.expanduser(options["uds"])
+    listeners = Listeners(**options)
+    if not listeners.uds and not listeners.reuse_port:
+        return None
+    return listeners
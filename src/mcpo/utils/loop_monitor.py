@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a task that sleeps for
+    `interval` seconds. Sustained lag means something is blocking the loop.
+    """
+
+    def __init__(self, interval: float = 0.1, history: int = 600, warn_after: float = 0.5):
+        self.interval = interval
+        self.warn_after = warn_after
+        self.samples = deque(maxlen=history)
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.count = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - start - self.interval, 0.0)
+            self.samples.append(lag)
+            self.total_lag += lag
+            self.count += 1
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if lag >= self.warn_after:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def current(self) -> float:
+        return self.samples[-1] if self.samples else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = sorted(self.samples)
+
+        def pct(p: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(int(p / 100 * len(recent)), len(recent) - 1)]
+
+        return {
+            "lag_ms": round(self.current * 1000, 3),
+            "lag_p50_ms": round(pct(50) * 1000, 3),
+            "lag_p99_ms": round(pct(99) * 1000, 3),
+            "lag_max_ms": round(self.max_lag * 1000, 3),
+            "lag_mean_ms": round(self.total_lag / self.count * 1000, 3) if self.count else 0.0,
+        }
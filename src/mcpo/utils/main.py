@@ -1,10 +1,13 @@
 import json
+import time
 import traceback
 from typing import Any, Dict, ForwardRef, List, Optional, Type, Union
 import logging
+
+import anyio
 from fastapi import HTTPException, Request
-from mcp.client.sse import sse_client
-from mcp.client.streamable_http import streamablehttp_client
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
 
 from mcp import ClientSession, types
 from mcp.types import (
@@ -18,9 +21,51 @@ from mcp.types import (
 
 from mcp.shared.exceptions import McpError
 
-from pydantic import Field, create_model
+from pydantic import Field, ValidationError, create_model
 from pydantic.fields import FieldInfo
 
+from mcpo.utils.affinity import (
+    AffinityFullError,
+    affinity_full_exception,
+    get_session_affinity,
+)
+from mcpo.utils.capture import get_traffic_capture
+from mcpo.utils.cache import cache_ttl, get_result_cache, result_cache_key
+from mcpo.utils.circuit_breaker import circuit_open_exception, get_circuit_breaker
+from mcpo.utils.concurrency import concurrency_limit_exception, get_adaptive_limit
+from mcpo.utils.hedging import get_hedging_policy
+from mcpo.utils.idempotency import (
+    IDEMPOTENCY_KEY_HEADER,
+    encode_response,
+    get_idempotency,
+)
+from mcpo.utils.http_client import get_http_pool
+from mcpo.utils.jobs import (
+    JobStoreFullError,
+    current_job_progress,
+    get_job_store,
+    job_accepted_response,
+    job_owner,
+    job_store_full_exception,
+    wants_async,
+)
+from mcpo.utils.offload import get_offloading_handler, payload_size
+from mcpo.utils.profiling import timed_phase, timing_add_since, timing_mark
+from mcpo.utils.rate_limit import rate_limit_exception
+from mcpo.utils.spool import (
+    get_spool,
+    get_spooling_handler,
+    keeping_result,
+    result_kept,
+)
+from mcpo.utils.tracing import CLIENT, TRACEPARENT_HEADER, current_traceparent
+from mcpo.utils.upstream import (
+    MCP_CLIENT_ERROR_CODES,
+    UpstreamUnavailableError,
+    get_upstream,
+    upstream_unavailable_exception,
+)
+
 MCP_ERROR_TO_HTTP_STATUS = {
     PARSE_ERROR: 400,
     INVALID_REQUEST: 400,
@@ -53,6 +98,62 @@ def process_tool_response(result: CallToolResult) -> list:
     return response
 
 
+def tool_response_data(result: CallToolResult) -> Any:
+    """
+    The response body for a tool result: its `structuredContent` verbatim when
+    the server sent one, otherwise its processed content.
+    """
+    if result.structuredContent is not None:
+        return result.structuredContent
+    response_data = process_tool_response(result)
+    return response_data[0] if len(response_data) == 1 else response_data
+
+
+def json_response(data: Any) -> Response:
+    body = json.dumps(
+        data, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+    return Response(content=body, media_type="application/json")
+
+
+def encode_tool_response(result: CallToolResult, response_model=None) -> Response:
+    """
+    Process and JSON-encode a tool result in one go, mirroring what FastAPI does
+    for the generated endpoints (response model applied, and its None fields
+    dropped, when the data fits it; the data as is otherwise). Used to encode
+    large results in the offload pool, results that are kept (cached, stored
+    for idempotent retries, async jobs) and every result of a server with
+    `validateOutput` off (no model).
+    """
+    final_response = tool_response_data(result)
+    if response_model is not None:
+        try:
+            final_response = response_model.model_validate(final_response).model_dump(
+                mode="json", exclude_none=True, by_alias=True
+            )
+        except ValidationError:
+            pass
+    return json_response(final_response)
+
+
+class ToolRoute(APIRoute):
+    """Route class for the generated tool endpoints."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if self.body_field is not None:
+            handler = get_offloading_handler(handler, self.body_field)
+        handler = get_spooling_handler(handler, self.body_field)
+
+        async def timed_handler(request: Request):
+            timing_mark("route")
+            response = await handler(request)
+            timing_add_since("serialize", "handler_done")
+            return response
+
+        return timed_handler
+
+
 def name_needs_alias(name: str) -> bool:
     """Check if a field name needs aliasing (for now if it starts with '__')."""
     return name.startswith("__")
@@ -79,48 +180,153 @@ def generate_alias_name(original_name: str, existing_names: set) -> str:
     return alias_name
 
 
+async def call_tool(
+    session: ClientSession,
+    name: str,
+    arguments: dict,
+    notify_cancelled: bool = False,
+) -> CallToolResult:
+    """
+    `session.call_tool`, passing the current trace context in the request's
+    `_meta`. With `notify_cancelled`, a cancelled call (the client went away,
+    or a hedged call lost) also tells the server to stop working on it.
+    """
+    # Nothing is awaited before the request is sent, so it gets this id
+    request_id = getattr(session, "_request_id", None) if notify_cancelled else None
+    try:
+        return await _call_tool(session, name, arguments)
+    except anyio.get_cancelled_exc_class():
+        if request_id is not None:
+            with anyio.CancelScope(shield=True), anyio.move_on_after(1):
+                await _send_cancelled(session, request_id)
+        raise
+
+
+async def _send_cancelled(session: ClientSession, request_id: int) -> None:
+    try:
+        await session.send_notification(
+            types.ClientNotification(
+                types.CancelledNotification(
+                    method="notifications/cancelled",
+                    params=types.CancelledNotificationParams(
+                        requestId=request_id, reason="cancelled by mcpo"
+                    ),
+                )
+            )
+        )
+    except Exception:
+        # The connection is gone; nothing left to cancel
+        pass
+
+
+async def _call_tool(
+    session: ClientSession, name: str, arguments: dict
+) -> CallToolResult:
+    # Progress notifications are only kept for async jobs
+    progress = current_job_progress()
+    options = {"progress_callback": progress} if progress else {}
+    traceparent = current_traceparent()
+    if traceparent is None:
+        return await session.call_tool(name, arguments=arguments, **options)
+
+    result = await session.send_request(
+        types.ClientRequest(
+            types.CallToolRequest(
+                method="tools/call",
+                params=types.CallToolRequestParams(
+                    name=name,
+                    arguments=arguments,
+                    _meta={TRACEPARENT_HEADER: traceparent},
+                ),
+            )
+        ),
+        CallToolResult,
+        **options,
+    )
+    if not result.isError:
+        # The same output schema check `call_tool` does
+        await session._validate_tool_result(name, result)
+    return result
+
+
+def forwarded_auth_headers(request: Request, app) -> Optional[Dict[str, str]]:
+    """
+    The server's headers plus the caller's Authorization header, or None when
+    there is nothing to forward (no header, or a stdio server).
+    """
+    auth_header = request.headers.get("Authorization")
+    server_type = getattr(app.state, "server_type", "stdio")
+    if not auth_header or server_type not in {
+        "sse",
+        "streamablehttp",
+        "streamable_http",
+    }:
+        return None
+
+    base_headers = getattr(app.state, "headers", {}) or {}
+    if isinstance(base_headers, str):
+        try:
+            base_headers = json.loads(base_headers)
+        except Exception:
+            base_headers = {}
+
+    headers = dict(base_headers)
+    headers["Authorization"] = auth_header
+    return headers
+
+
 async def call_tool_with_forwarded_auth(
     request: Request,
     app,
     session: ClientSession,
     endpoint_name: str,
     arguments: dict,
+    url: Optional[str] = None,
+    notify_cancelled: bool = False,
 ) -> CallToolResult:
-    """Call a tool, forwarding the Authorization header if provided."""
+    """
+    Call a tool, forwarding the Authorization header if provided. `url`
+    overrides the server URL for servers with several `urls`.
+    """
 
-    auth_header = request.headers.get("Authorization")
+    headers = forwarded_auth_headers(request, app)
     server_type = getattr(app.state, "server_type", "stdio")
 
-    if auth_header and server_type in {"sse", "streamablehttp", "streamable_http"}:
-        base_headers = getattr(app.state, "headers", {}) or {}
-        if isinstance(base_headers, str):
-            try:
-                base_headers = json.loads(base_headers)
-            except Exception:
-                base_headers = {}
-
-        headers = dict(base_headers)
-        headers["Authorization"] = auth_header
-
+    if headers is not None:
+        http_pool = get_http_pool(app)
         if server_type == "sse":
-            async with sse_client(url=app.state.args, headers=headers) as (reader, writer):
+            from mcp.client.sse import sse_client
+
+            async with sse_client(
+                url=url or app.state.args,
+                headers=headers,
+                **http_pool.transport_kwargs(sse_read_timeout=60 * 5),
+            ) as (reader, writer):
                 async with ClientSession(reader, writer) as temp_session:
                     await temp_session.initialize()
-                    return await temp_session.call_tool(endpoint_name, arguments=arguments)
+                    return await call_tool(temp_session, endpoint_name, arguments)
         else:
-            url = app.state.args
+            from mcp.client.streamable_http import streamablehttp_client
+
+            url = url or app.state.args
             if not url.endswith("/"):
                 url = f"{url}/"
-            async with streamablehttp_client(url=url, headers=headers) as (
+            async with streamablehttp_client(
+                url=url,
+                headers=headers,
+                **http_pool.transport_kwargs(sse_read_timeout=60 * 5),
+            ) as (
                 reader,
                 writer,
                 _,
             ):
                 async with ClientSession(reader, writer) as temp_session:
                     await temp_session.initialize()
-                    return await temp_session.call_tool(endpoint_name, arguments=arguments)
+                    return await call_tool(temp_session, endpoint_name, arguments)
 
-    return await session.call_tool(endpoint_name, arguments=arguments)
+    return await call_tool(
+        session, endpoint_name, arguments, notify_cancelled=notify_cancelled
+    )
 
 
 def _process_schema_property(
@@ -305,20 +511,346 @@ def get_model_fields(form_model_name, properties, required_fields, schema_defs=N
     return model_fields
 
 
+async def execute_tool_call(
+    request: Request,
+    app,
+    session: ClientSession,
+    endpoint_name: str,
+    arguments: dict,
+    response_model=None,
+) -> Any:
+    """Call a tool upstream and translate the result (or failure) into an HTTP response."""
+    # Body parsing, validation and dependencies ran since the route was entered
+    timing_add_since("validate", "route")
+    try:
+        api_key = getattr(request.state, "api_key", None)
+        if api_key is not None:
+            retry_after = api_key.check_rate_limit()
+            if retry_after:
+                raise rate_limit_exception(api_key, retry_after)
+
+        def run():
+            return _queued_tool_call(
+                request, app, session, endpoint_name, arguments, response_model
+            )
+
+        server_name = getattr(app.state, "server_name", app.title)
+
+        async def start():
+            jobs = get_job_store(app)
+            if jobs is not None and wants_async(request):
+                try:
+                    job = jobs.submit(
+                        server_name, endpoint_name, job_owner(request), run
+                    )
+                except JobStoreFullError:
+                    raise job_store_full_exception(jobs)
+                return job_accepted_response(job)
+            return await run()
+
+        idempotency = get_idempotency(app)
+        if idempotency is not None and IDEMPOTENCY_KEY_HEADER in request.headers:
+            return await idempotency.run(
+                request, server_name, endpoint_name, arguments, start
+            )
+        return await start()
+    finally:
+        timing_mark("handler_done")
+
+
+async def _queued_tool_call(
+    request: Request,
+    app,
+    session: ClientSession,
+    endpoint_name: str,
+    arguments: dict,
+    response_model=None,
+) -> Any:
+    ttl = cache_ttl(app, endpoint_name)
+    if not ttl:
+        return await _queued_tool_call_uncached(
+            request, app, session, endpoint_name, arguments, response_model
+        )
+
+    async def load():
+        with keeping_result():
+            return encode_response(
+                await _queued_tool_call_uncached(
+                    request, app, session, endpoint_name, arguments, response_model
+                )
+            )
+
+    key = result_cache_key(request, app, endpoint_name, arguments)
+    return await get_result_cache(app).fetch(key, ttl, load)
+
+
+async def _queued_tool_call_uncached(
+    request: Request,
+    app,
+    session: ClientSession,
+    endpoint_name: str,
+    arguments: dict,
+    response_model=None,
+) -> Any:
+    queue = getattr(app.state, "fair_queue", None)
+    if queue is None:
+        return await _execute_tool_call(
+            request, app, session, endpoint_name, arguments, response_model
+        )
+
+    api_key = getattr(request.state, "api_key", None)
+    if api_key is not None:
+        client, weight = api_key.name, api_key.weight
+    else:
+        client = request.client.host if request.client else "anonymous"
+        weight = 1.0
+    with timed_phase("queue"):
+        await queue.acquire(client, weight)
+    try:
+        return await _execute_tool_call(
+            request, app, session, endpoint_name, arguments, response_model
+        )
+    finally:
+        queue.release()
+
+
+async def _execute_tool_call(
+    request: Request,
+    app,
+    session: ClientSession,
+    endpoint_name: str,
+    arguments: dict,
+    response_model=None,
+) -> Any:
+    affinity = get_session_affinity(app)
+    affinity_key = affinity.key(request) if affinity else None
+    limiter = get_adaptive_limit(app)
+    if limiter and not limiter.acquire():
+        raise concurrency_limit_exception(limiter)
+    breaker = get_circuit_breaker(app, endpoint_name)
+    if breaker and not breaker.acquire():
+        if limiter:
+            limiter.release()
+        raise circuit_open_exception(breaker)
+    capture = get_traffic_capture(app)
+    captured = capture is not None and capture.sample()
+
+    def capture_call(**outcome) -> None:
+        if captured:
+            capture.record(
+                request,
+                getattr(app.state, "server_name", app.title),
+                endpoint_name,
+                arguments,
+                started_at,
+                time.perf_counter() - start,
+                **outcome,
+            )
+
+    try:
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            with timed_phase(
+                "upstream",
+                span_name=f"tools/call {endpoint_name}",
+                kind=CLIENT,
+                attributes={
+                    "mcp.server": getattr(app.state, "server_name", app.title),
+                    "mcp.tool.name": endpoint_name,
+                },
+            ):
+                upstream = get_upstream(app)
+                hedging = get_hedging_policy(app)
+
+                async def call_replica(replica):
+                    return await call_tool_with_forwarded_auth(
+                        request,
+                        app,
+                        replica.session,
+                        endpoint_name,
+                        arguments,
+                        url=replica.endpoint.url,
+                        notify_cancelled=bool(hedging and hedging.cancel_upstream),
+                    )
+
+                if affinity_key is not None:
+                    async with affinity.lease(
+                        affinity_key, forwarded_auth_headers(request, app)
+                    ) as pinned:
+                        result = await call_tool(
+                            pinned.session, endpoint_name, arguments
+                        )
+                elif upstream is None:
+                    result = await call_tool_with_forwarded_auth(
+                        request, app, session, endpoint_name, arguments
+                    )
+                elif hedging and hedging.applies(endpoint_name):
+                    result = await hedging.call(upstream, endpoint_name, call_replica)
+                else:
+                    async with upstream.lease() as replica:
+                        result = await call_replica(replica)
+        except AffinityFullError:
+            # Every session is busy: says nothing about the server
+            if breaker:
+                breaker.release()
+            if limiter:
+                limiter.release()
+            raise
+        except McpError as e:
+            client_error = e.error.code in MCP_CLIENT_ERROR_CODES
+            if breaker:
+                breaker.record(client_error, time.perf_counter() - start)
+            if limiter:
+                limiter.release(time.perf_counter() - start, dropped=not client_error)
+            capture_call(error=e.error)
+            raise
+        except Exception:
+            if breaker:
+                breaker.record(False, time.perf_counter() - start)
+            if limiter:
+                limiter.release(time.perf_counter() - start, dropped=True)
+            capture_call()
+            raise
+        except BaseException:
+            # Cancelled (e.g. client went away): no verdict on upstream health
+            if breaker:
+                breaker.release()
+            if limiter:
+                limiter.release()
+            raise
+        if breaker:
+            breaker.record(True, time.perf_counter() - start)
+        if limiter:
+            limiter.release(time.perf_counter() - start)
+        capture_call(result=result)
+
+        if result.isError:
+            error_message = "Unknown tool execution error"
+            if result.content:
+                if isinstance(result.content[0], types.TextContent):
+                    error_message = result.content[0].text
+            detail = {"message": error_message}
+            raise HTTPException(
+                status_code=500,
+                detail=detail,
+            )
+
+        with timed_phase("process"):
+            offloader = getattr(app.state, "offloader", None)
+            spool = get_spool(app)
+            size = payload_size(result)
+            validate_output = getattr(app.state, "validate_output", True)
+            if not validate_output:
+                response_model = None
+            # Not for a result that is kept: it would only be read back
+            if (
+                spool is not None
+                and not result_kept()
+                and spool.should_spool(size, spool.response_threshold)
+            ):
+
+                def encode():
+                    return spool.encode_response(
+                        tool_response_data(result), response_model
+                    )
+
+                if offloader:
+                    return await offloader.run(encode)
+                return await anyio.to_thread.run_sync(encode)
+
+            if offloader and offloader.should_offload(size):
+                return await offloader.run(encode_tool_response, result, response_model)
+
+            if spool is not None:
+                # Encoded here rather than by FastAPI, so the budget covers it
+                with spool.hold(size):
+                    return encode_tool_response(result, response_model)
+
+            if not validate_output or result_kept():
+                # A response, so FastAPI does not check it against the model
+                # again; one that is kept is stored exactly as it is sent
+                return encode_tool_response(result, response_model)
+            return tool_response_data(result)
+
+    except McpError as e:
+        logger.info(f"MCP Error calling {endpoint_name}: {traceback.format_exc()}")
+        status_code = MCP_ERROR_TO_HTTP_STATUS.get(e.error.code, 500)
+        # Propagate the error received from MCP as an HTTP exception
+        raise HTTPException(
+            status_code=status_code,
+            detail=(
+                {"message": e.error.message, "data": e.error.data}
+                if e.error.data is not None
+                else {"message": e.error.message}
+            ),
+        )
+    except UpstreamUnavailableError:
+        raise upstream_unavailable_exception(upstream)
+    except AffinityFullError:
+        raise affinity_full_exception(affinity)
+    except Exception as e:
+        logger.info(
+            f"Unexpected error calling {endpoint_name}: {traceback.format_exc()}"
+        )
+        raise HTTPException(
+            status_code=500,
+            detail={"message": "Unexpected error", "error": str(e)},
+        )
+
+
+def build_tool_models(tool: types.Tool) -> tuple:
+    """The tool's form and response models (None for no arguments or no output schema)."""
+    input_schema = tool.inputSchema
+    output_schema = getattr(tool, "outputSchema", None)
+
+    form_model_fields = get_model_fields(
+        f"{tool.name}_form_model",
+        input_schema.get("properties", {}),
+        input_schema.get("required", []),
+        input_schema.get("$defs", {}),
+    )
+    if not form_model_fields:
+        return None, None
+    form_model = create_model(f"{tool.name}_form_model", **form_model_fields)
+
+    response_model = None
+    if output_schema:
+        response_model_fields = get_model_fields(
+            f"{tool.name}_response_model",
+            output_schema.get("properties", {}),
+            output_schema.get("required", []),
+            output_schema.get("$defs", {}),
+        )
+        if response_model_fields:
+            response_model = create_model(
+                f"{tool.name}_response_model", **response_model_fields
+            )
+    return form_model, response_model
+
+
 def get_tool_handler(
     app,
     session,
     endpoint_name,
-    form_model_fields,
+    form_model_fields=None,
     response_model_fields=None,
+    form_model=None,
+    response_model=None,
 ):
+    """
+    Route handler for a tool, from its model fields or from models built
+    already (see `build_tool_models`).
+    """
     if form_model_fields:
-        FormModel = create_model(f"{endpoint_name}_form_model", **form_model_fields)
-        ResponseModel = (
-            create_model(f"{endpoint_name}_response_model", **response_model_fields)
-            if response_model_fields
-            else Any
-        )
+        form_model = create_model(f"{endpoint_name}_form_model", **form_model_fields)
+        if response_model_fields:
+            response_model = create_model(
+                f"{endpoint_name}_response_model", **response_model_fields
+            )
+    if form_model is not None:
+        FormModel = form_model
+        ResponseModel = response_model if response_model is not None else Any
 
         def make_endpoint_func(
             endpoint_name: str, FormModel, session: ClientSession
@@ -326,56 +858,16 @@ def get_tool_handler(
             async def tool(request: Request, form_data: FormModel) -> Union[ResponseModel, Any]:
                 args = form_data.model_dump(exclude_none=True, by_alias=True)
                 logger.info(f"Calling endpoint: {endpoint_name}, with args: {args}")
-                try:
-                    result = await call_tool_with_forwarded_auth(
-                        request,
-                        app,
-                        session,
-                        endpoint_name,
-                        args,
-                    )
-
-                    if result.isError:
-                        error_message = "Unknown tool execution error"
-                        error_data = None  # Initialize error_data
-                        if result.content:
-                            if isinstance(result.content[0], types.TextContent):
-                                error_message = result.content[0].text
-                        detail = {"message": error_message}
-                        if error_data is not None:
-                            detail["data"] = error_data
-                        raise HTTPException(
-                            status_code=500,
-                            detail=detail,
-                        )
-
-                    response_data = process_tool_response(result)
-                    final_response = (
-                        response_data[0] if len(response_data) == 1 else response_data
-                    )
-                    return final_response
-
-                except McpError as e:
-                    logger.info(
-                        f"MCP Error calling {endpoint_name}: {traceback.format_exc()}"
-                    )
-                    status_code = MCP_ERROR_TO_HTTP_STATUS.get(e.error.code, 500)
-                    raise HTTPException(
-                        status_code=status_code,
-                        detail=(
-                            {"message": e.error.message, "data": e.error.data}
-                            if e.error.data is not None
-                            else {"message": e.error.message}
-                        ),
-                    )
-                except Exception as e:
-                    logger.info(
-                        f"Unexpected error calling {endpoint_name}: {traceback.format_exc()}"
-                    )
-                    raise HTTPException(
-                        status_code=500,
-                        detail={"message": "Unexpected error", "error": str(e)},
-                    )
+                return await execute_tool_call(
+                    request,
+                    app,
+                    session,
+                    endpoint_name,
+                    args,
+                    response_model=(
+                        ResponseModel if ResponseModel is not Any else None
+                    ),
+                )
 
             return tool
 
@@ -387,54 +879,7 @@ def get_tool_handler(
         ):  # Parameterless endpoint
             async def tool(request: Request):  # No parameters
                 logger.info(f"Calling endpoint: {endpoint_name}, with no args")
-                try:
-                    result = await call_tool_with_forwarded_auth(
-                        request,
-                        app,
-                        session,
-                        endpoint_name,
-                        {},
-                    )
-
-                    if result.isError:
-                        error_message = "Unknown tool execution error"
-                        if result.content:
-                            if isinstance(result.content[0], types.TextContent):
-                                error_message = result.content[0].text
-                        detail = {"message": error_message}
-                        raise HTTPException(
-                            status_code=500,
-                            detail=detail,
-                        )
-
-                    response_data = process_tool_response(result)
-                    final_response = (
-                        response_data[0] if len(response_data) == 1 else response_data
-                    )
-                    return final_response
-
-                except McpError as e:
-                    logger.info(
-                        f"MCP Error calling {endpoint_name}: {traceback.format_exc()}"
-                    )
-                    status_code = MCP_ERROR_TO_HTTP_STATUS.get(e.error.code, 500)
-                    # Propagate the error received from MCP as an HTTP exception
-                    raise HTTPException(
-                        status_code=status_code,
-                        detail=(
-                            {"message": e.error.message, "data": e.error.data}
-                            if e.error.data is not None
-                            else {"message": e.error.message}
-                        ),
-                    )
-                except Exception as e:
-                    logger.info(
-                        f"Unexpected error calling {endpoint_name}: {traceback.format_exc()}"
-                    )
-                    raise HTTPException(
-                        status_code=500,
-                        detail={"message": "Unexpected error", "error": str(e)},
-                    )
+                return await execute_tool_call(request, app, session, endpoint_name, {})
 
             return tool
 
@@ -0,0 +1,92 @@
+import re
+from typing import Any, Callable, Dict, List
+
+from fastapi import FastAPI
+
+
+def register_metrics(app: FastAPI, name: str, provider: Callable[[], Dict[str, Any]]):
+    """Expose `provider()` under `name` in the server's section of the metrics endpoint."""
+    providers = getattr(app.state, "metrics_providers", None)
+    if providers is None:
+        providers = app.state.metrics_providers = {}
+    providers[name] = provider
+
+
+def register_global_metrics(
+    main_app: FastAPI, name: str, provider: Callable[[], Dict[str, Any]]
+):
+    """Expose `provider()` as a top-level section of the metrics endpoint."""
+    providers = getattr(main_app.state, "global_metrics_providers", None)
+    if providers is None:
+        providers = main_app.state.global_metrics_providers = {}
+    providers[name] = provider
+
+
+def collect_global_metrics(main_app: FastAPI) -> Dict[str, Any]:
+    providers = getattr(main_app.state, "global_metrics_providers", None) or {}
+    return {name: provider() for name, provider in providers.items()}
+
+
+def collect_metrics(app: FastAPI) -> Dict[str, Any]:
+    providers = getattr(app.state, "metrics_providers", None) or {}
+    return {name: provider() for name, provider in providers.items()}
+
+
+def get_server_health(app: FastAPI) -> Dict[str, Any]:
+    health: Dict[str, Any] = {"status": "ok"}
+    if getattr(app.state, "session", None) is None:
+        health["status"] = "starting"
+    upstream = getattr(app.state, "upstream", None)
+    if upstream is not None and not upstream.ready_replicas:
+        health["status"] = "restarting"
+
+    breakers = getattr(app.state, "circuit_breakers", None)
+    if breakers is not None:
+        health["circuit_breaker"] = breakers.snapshot()
+        if breakers.is_open():
+            health["status"] = "circuit_open"
+    return health
+
+
+def _sanitize(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _flatten(prefix: str, value: Any, labels: Dict[str, str], lines: List[str]):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key.startswith("per_") and isinstance(item, dict):
+                # {"per_tool": {"search": {...}}} -> label tool="search"
+                label = _sanitize(key[4:])
+                for label_value, nested in item.items():
+                    _flatten(prefix, nested, {**labels, label: label_value}, lines)
+            else:
+                _flatten(f"{prefix}_{_sanitize(key)}", item, labels, lines)
+        return
+
+    if isinstance(value, str):
+        # Enumerations such as a breaker state become a labelled gauge set to 1
+        labels = {**labels, prefix.rsplit("_", 1)[-1]: value}
+        value = 1
+    elif isinstance(value, bool):
+        value = int(value)
+    elif not isinstance(value, (int, float)):
+        return
+
+    rendered = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    lines.append(f"{prefix}{{{rendered}}} {value}" if rendered else f"{prefix} {value}")
+
+
+def render_prometheus(metrics: Dict[str, Any]) -> str:
+    """Render the JSON metrics document in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for server_name, server_metrics in metrics.get("servers", {}).items():
+        _flatten("mcpo", server_metrics, {"server": server_name}, lines)
+    for name, section in metrics.items():
+        if name != "servers":
+            _flatten(f"mcpo_{_sanitize(name)}", section, {}, lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,170 @@
+import json
+import time
+from typing import Any, Callable, Dict, Optional
+
+import anyio
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from mcp import types
+from mcp.types import CallToolResult
+
+
+def json_size(value: Any) -> int:
+    """
+    Rough size of `value` once JSON-encoded: string lengths plus a few bytes
+    per number and punctuation, without encoding anything.
+    """
+    size = 0
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            size += len(value) + 2
+        elif isinstance(value, dict):
+            size += 2
+            for key, item in value.items():
+                size += len(str(key)) + 4
+                stack.append(item)
+        elif isinstance(value, (list, tuple)):
+            size += 2 + len(value)
+            stack.extend(value)
+        else:
+            size += 8
+    return size
+
+
+def payload_size(result: CallToolResult) -> int:
+    """Cheap estimate of how many bytes a tool result will take once encoded."""
+    if result.structuredContent is not None:
+        # Sent instead of the content
+        return json_size(result.structuredContent)
+    size = 0
+    for content in result.content:
+        if isinstance(content, types.TextContent):
+            size += len(content.text)
+        elif isinstance(content, types.ImageContent):
+            size += len(content.data)
+    return size
+
+
+class Offloader:
+    """
+    Runs CPU-heavy work on large payloads (JSON parsing, Pydantic validation,
+    response encoding) in a bounded worker thread pool so it does not stall
+    the event loop for every other request. Payloads smaller than `threshold`
+    bytes stay inline, where a thread hop would cost more than it saves.
+    """
+
+    def __init__(self, threshold: int, workers: int = 4):
+        self.threshold = threshold
+        self.workers = workers
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+        self.inline = 0
+        self.offloaded = 0
+        self.offloaded_seconds = 0.0
+        self.max_offloaded_seconds = 0.0
+
+    def should_offload(self, size: int) -> bool:
+        if size >= self.threshold:
+            return True
+        self.inline += 1
+        return False
+
+    async def run(self, fn: Callable, *args) -> Any:
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.workers)
+        start = time.perf_counter()
+        try:
+            return await anyio.to_thread.run_sync(fn, *args, limiter=self._limiter)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.offloaded += 1
+            self.offloaded_seconds += elapsed
+            self.max_offloaded_seconds = max(self.max_offloaded_seconds, elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "threshold_bytes": self.threshold,
+            "workers": self.workers,
+            "busy_workers": self._limiter.borrowed_tokens if self._limiter else 0,
+            "inline": self.inline,
+            "offloaded": self.offloaded,
+            "offloaded_seconds": round(self.offloaded_seconds, 6),
+            "max_offloaded_seconds": round(self.max_offloaded_seconds, 6),
+        }
+
+
+def is_json_request(request: Request) -> bool:
+    content_type = request.headers.get("content-type")
+    return not content_type or "json" in content_type
+
+
+def validate_json_body(body: bytes, body_field) -> Any:
+    """Parse a JSON request body and validate it against the route's body field."""
+    try:
+        value = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "json_invalid",
+                    "loc": ("body", e.pos),
+                    "msg": "JSON decode error",
+                    "input": {},
+                    "ctx": {"error": e.msg},
+                }
+            ],
+            body=e.doc,
+        )
+    validated, errors = body_field.validate(value, {}, loc=("body",))
+    if errors:
+        raise RequestValidationError(errors, body=value)
+    return validated
+
+
+def set_body(request: Request, body: bytes) -> None:
+    """Hand a body read here over to FastAPI, which parses it itself (see `set_parsed_body`)."""
+    request._body = body
+
+
+def set_parsed_body(request: Request, body: bytes, value: Any) -> None:
+    """
+    Hand a body parsed and validated here over to FastAPI's own body handling,
+    which then receives a model instance and passes it through without parsing
+    or validating it a second time on the event loop.
+
+    FastAPI reads the body with Starlette's `Request.body()` and `json()`,
+    which cache it in the private `_body` and `_json` attributes: setting them
+    is the only way in. `test_offload` fails if that stops working, and
+    pyproject.toml caps FastAPI and Starlette at the versions it passed with.
+    """
+    set_body(request, body)
+    request._json = value
+    request.state.body_parsed = True
+
+
+def body_parsed(request: Request) -> bool:
+    """True if the body has been handed over with `set_parsed_body` already."""
+    return getattr(request.state, "body_parsed", False)
+
+
+async def offload_request_body(request: Request, body_field, offloader: Offloader) -> None:
+    """Parse and validate a large JSON body in the worker pool."""
+    body = await request.body()
+    validated = await offloader.run(validate_json_body, body, body_field)
+    set_parsed_body(request, body, validated)
+
+
+def get_offloading_handler(handler, body_field):
+    """Wrap a FastAPI route handler so large JSON bodies are validated off the event loop."""
+
+    async def app(request: Request):
+        offloader: Optional[Offloader] = getattr(request.app.state, "offloader", None)
+        # A body spooled to disk has been parsed already
+        if offloader and is_json_request(request) and not body_parsed(request):
+            size = int(request.headers.get("content-length") or 0)
+            if offloader.should_offload(size):
+                await offload_request_body(request, body_field, offloader)
+        return await handler(request)
+
+    return app
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import re
+from typing import Any, Dict, Optional, Tuple
+
+import anyio
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from starlette.routing import Route
+
+_REF_PREFIX = "#/components/schemas/"
+
+
+def _serialize(schema: Dict[str, Any]) -> Tuple[bytes, str]:
+    body = json.dumps(
+        schema, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def cached_json_response(request: Request, body: bytes, etag: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class OpenAPICache:
+    """
+    Pre-serialized OpenAPI document of one FastAPI app.
+
+    The document is generated in a worker thread once the app's routes are
+    known (see `rebuild`) and then served as bytes with an ETag, so frequent
+    spec fetches neither regenerate nor re-encode it.
+    """
+
+    def __init__(self, app: FastAPI):
+        self.app = app
+        self.version = 0
+        self.schema: Optional[Dict[str, Any]] = None
+        self._documents: Dict[str, Tuple[bytes, str]] = {}
+        self._lock = anyio.Lock()
+
+    def _build(self) -> None:
+        self.app.openapi_schema = None
+        schema = self.app.openapi()
+        self._documents = {"": _serialize(schema)}
+        self.schema = schema
+        self.version += 1
+
+    def load(self, document: str) -> None:
+        """Use a document generated earlier (see `mcpo.utils.compiled`) instead of building one."""
+        schema = json.loads(document)
+        self.app.openapi_schema = schema
+        self._documents = {"": _serialize(schema)}
+        self.schema = schema
+        self.version += 1
+
+    async def rebuild(self) -> None:
+        """Regenerate the document off the event loop; call whenever the app's tools change."""
+        async with self._lock:
+            await anyio.to_thread.run_sync(self._build)
+
+    def _with_servers(self, root_path: str) -> Tuple[bytes, str]:
+        # Same rule as FastAPI's own handler: advertise the mount path as a server
+        schema = self.schema
+        server_urls = {s.get("url") for s in schema.get("servers", [])}
+        if self.app.root_path_in_servers and root_path not in server_urls:
+            schema = dict(schema)
+            schema["servers"] = [{"url": root_path}] + schema.get("servers", [])
+        return _serialize(schema)
+
+    async def document(self, root_path: str = "") -> Tuple[bytes, str]:
+        if self.schema is None:
+            await self.rebuild()
+        document = self._documents.get(root_path)
+        if document is None:
+            document = await anyio.to_thread.run_sync(self._with_servers, root_path)
+            self._documents[root_path] = document
+        return document
+
+
+def install_openapi_cache(app: FastAPI) -> OpenAPICache:
+    """Serve the app's `openapi_url` from an `OpenAPICache` instead of FastAPI's default handler."""
+    cache = app.state.openapi_cache = OpenAPICache(app)
+
+    async def openapi(request: Request) -> Response:
+        root_path = request.scope.get("root_path", "").rstrip("/")
+        body, etag = await cache.document(root_path)
+        return cached_json_response(request, body, etag)
+
+    for index, route in enumerate(app.router.routes):
+        if isinstance(route, Route) and route.path == app.openapi_url:
+            app.router.routes[index] = Route(
+                app.openapi_url, openapi, include_in_schema=False
+            )
+            break
+    return cache
+
+
+def _rewrite_refs(value: Any, renames: Dict[str, str]) -> Any:
+    if isinstance(value, dict):
+        ref = value.get("$ref")
+        if isinstance(ref, str) and ref.startswith(_REF_PREFIX):
+            name = ref[len(_REF_PREFIX) :]
+            if name in renames:
+                value = {**value, "$ref": _REF_PREFIX + renames[name]}
+        return {k: _rewrite_refs(v, renames) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rewrite_refs(v, renames) for v in value]
+    return value
+
+
+def merge_openapi_documents(
+    info: Dict[str, Any], servers: Dict[str, Tuple[str, Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """
+    Merge per-server documents into one.
+
+    `servers` maps a server name to `(mount_path, schema)`. Paths are prefixed
+    with the mount path and tagged with the server name; component schemas
+    that clash with a different schema of the same name are renamed to
+    `<server>__<name>`.
+    """
+    merged = {
+        "openapi": "3.1.0",
+        "info": info,
+        "paths": {},
+        "components": {"schemas": {}},
+        "tags": [],
+    }
+    schemas = merged["components"]["schemas"]
+
+    for server_name, (mount_path, schema) in servers.items():
+        prefix = re.sub(r"[^a-zA-Z0-9_.-]", "_", server_name)
+        renames = {}
+        server_schemas = schema.get("components", {}).get("schemas", {})
+        for name, component in server_schemas.items():
+            if name in schemas and schemas[name] != component:
+                renames[name] = f"{prefix}__{name}"
+
+        for name, component in server_schemas.items():
+            schemas[renames.get(name, name)] = _rewrite_refs(component, renames)
+
+        for path, operations in schema.get("paths", {}).items():
+            operations = _rewrite_refs(operations, renames)
+            for operation in operations.values():
+                if isinstance(operation, dict):
+                    operation["tags"] = [server_name]
+            merged["paths"][f"{mount_path.rstrip('/')}{path}"] = operations
+
+        merged["tags"].append(
+            {
+                "name": server_name,
+                "description": schema.get("info", {}).get("description", ""),
+            }
+        )
+
+    return merged
+
+
+class AggregatedOpenAPI:
+    """Cached merge of every server's OpenAPI document, rebuilt when any of them changes."""
+
+    def __init__(self, main_app: FastAPI, path_prefix: str = "/"):
+        self.main_app = main_app
+        self.path_prefix = path_prefix
+        self._key = None
+        self._document: Optional[Tuple[bytes, str]] = None
+        self._lock = anyio.Lock()
+
+    def _mount_path(self, server_app: FastAPI) -> str:
+        if server_app is self.main_app:
+            return ""
+        for name, app in self.main_app.state.servers.items():
+            if app is server_app:
+                return f"{self.path_prefix}{name}"
+        return ""
+
+    async def document(self) -> Tuple[bytes, str]:
+        servers = self.main_app.state.servers
+        caches = {
+            name: app.state.openapi_cache
+            for name, app in servers.items()
+            if getattr(app.state, "openapi_cache", None)
+        }
+        async with self._lock:
+            for cache in caches.values():
+                if cache.schema is None:
+                    await cache.rebuild()
+            key = tuple((name, id(c), c.version) for name, c in caches.items())
+            if key != self._key or self._document is None:
+                inputs = {
+                    name: (self._mount_path(servers[name]), cache.schema)
+                    for name, cache in caches.items()
+                }
+                info = {
+                    "title": self.main_app.title,
+                    "version": self.main_app.version,
+                    "description": self.main_app.description,
+                }
+
+                def build():
+                    return _serialize(merge_openapi_documents(info, inputs))
+
+                self._document = await anyio.to_thread.run_sync(build)
+                self._key = key
+        return self._document
+
+
+def add_aggregated_openapi_endpoint(main_app: FastAPI, path_prefix: str, dependencies):
+    aggregated = AggregatedOpenAPI(main_app, path_prefix)
+
+    @main_app.get("/_openapi.json", include_in_schema=False, dependencies=dependencies)
+    async def aggregated_openapi(request: Request):
+        body, etag = await aggregated.document()
+        return cached_json_response(request, body, etag)
@@ -0,0 +1,244 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+import anyio
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from mcpo.utils.tracing import INTERNAL, trace_mark, trace_since, trace_span
+
+# Clients opt in to phase timing per request with this header
+SERVER_TIMING_REQUEST_HEADER = "x-server-timing"
+
+MAX_PROFILE_SECONDS = 60.0
+
+# Leaf frames of a thread that is waiting rather than working
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+}
+
+_current_timer: ContextVar[Optional["RequestTimer"]] = ContextVar(
+    "mcpo_request_timer", default=None
+)
+
+
+class RequestTimer:
+    """Durations of the phases of one request, rendered as a `Server-Timing` header."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self._marks: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def mark(self, name: str) -> None:
+        self._marks[name] = time.perf_counter()
+
+    def add_since(self, phase: str, mark: str) -> None:
+        started = self._marks.get(mark)
+        if started is not None:
+            self.add(phase, time.perf_counter() - started)
+
+    def header(self) -> str:
+        phases = dict(self.phases)
+        phases["total"] = time.perf_counter() - self.start
+        return ", ".join(
+            f"{phase};dur={seconds * 1000:.3f}" for phase, seconds in phases.items()
+        )
+
+
+# The phases below are also recorded as trace spans when the request is traced
+
+
+def timing_mark(name: str) -> None:
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.mark(name)
+    trace_mark(name)
+
+
+def timing_add_since(phase: str, mark: str) -> None:
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add_since(phase, mark)
+    trace_since(phase, mark)
+
+
+@contextmanager
+def timed_phase(
+    phase: str,
+    span_name: Optional[str] = None,
+    kind: int = INTERNAL,
+    attributes: Optional[Dict[str, Any]] = None,
+):
+    """Add the time spent in the block to `phase` of the current request, if it is being timed."""
+    with trace_span(span_name or phase, kind, attributes):
+        timer = _current_timer.get()
+        if timer is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timer.add(phase, time.perf_counter() - start)
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a `Server-Timing` header with per-phase durations (validation, queue
+    wait, upstream call, response processing, serialization) to requests that
+    send `X-Server-Timing: 1`. Only admin keys get the header, unless
+    `unauthenticated` opens it to every caller of a server without API keys.
+    """
+
+    def __init__(self, app, api_keys=None, unauthenticated: bool = False):
+        self.app = app
+        self.api_keys = api_keys
+        self.unauthenticated = unauthenticated
+
+    def _allowed(self, scope) -> bool:
+        if self.api_keys is None:
+            return self.unauthenticated
+        key = scope.get("state", {}).get("api_key")
+        return key is not None and key.admin
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(
+            name == SERVER_TIMING_REQUEST_HEADER.encode()
+            for name, _ in scope.get("headers", [])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = _current_timer.set(timer)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and self._allowed(scope):
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timer.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timer.reset(token)
+
+
+def _frame_label(code, cache: Dict) -> str:
+    label = cache.get(code)
+    if label is None:
+        filename = code.co_filename
+        for path in sorted(sys.path, key=len, reverse=True):
+            if path and filename.startswith(path + os.sep):
+                filename = filename[len(path) + 1 :]
+                break
+        label = cache[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+    return label
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of the running process every `interval` seconds
+    and aggregates them in the collapsed-stack format read by flamegraph.pl,
+    speedscope and similar tools (`frame;frame;frame count` per line).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def profile(
+        self,
+        seconds: float,
+        interval: float = 0.005,
+        thread_id: Optional[int] = None,
+        include_idle: bool = False,
+    ) -> Counter:
+        """Sample for `seconds` (blocking); only `thread_id` when given, otherwise every thread."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already being taken")
+        try:
+            own_thread = threading.get_ident()
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            labels: Dict = {}
+            stacks: Counter = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_thread or (thread_id and ident != thread_id):
+                        continue
+                    if not include_idle and _is_idle(frame):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame.f_code, labels))
+                        frame = frame.f_back
+                    if ident not in thread_names:
+                        thread_names = {t.ident: t.name for t in threading.enumerate()}
+                    stack.append(thread_names.get(ident, str(ident)))
+                    stacks[";".join(reversed(stack))] += 1
+                time.sleep(interval)
+            return stacks
+        finally:
+            self._lock.release()
+
+
+def render_collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def add_profiling_endpoints(main_app: FastAPI, admin_dependency=None) -> None:
+    """Add `/_profile`, a time-boxed sampling profile of the running process."""
+    profiler = SamplingProfiler()
+
+    @main_app.get(
+        "/_profile",
+        include_in_schema=False,
+        dependencies=[Depends(admin_dependency)] if admin_dependency else [],
+    )
+    async def profile(
+        seconds: float = 10.0,
+        interval: float = 0.005,
+        all_threads: bool = False,
+        idle: bool = False,
+    ):
+        if not 0 < seconds <= MAX_PROFILE_SECONDS:
+            raise HTTPException(
+                status_code=422,
+                detail=f"seconds must be in (0, {MAX_PROFILE_SECONDS:g}]",
+            )
+        if not 0.001 <= interval <= 1:
+            raise HTTPException(
+                status_code=422, detail="interval must be in [0.001, 1]"
+            )
+        # By default only the event loop thread, which serves every request
+        loop_thread = None if all_threads else threading.get_ident()
+        try:
+            stacks = await anyio.to_thread.run_sync(
+                profiler.profile, seconds, interval, loop_thread, idle
+            )
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return PlainTextResponse(render_collapsed(stacks))
@@ -0,0 +1,148 @@
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+from fastapi import HTTPException
+
+# Config file keys (camelCase, like the rest of the config) -> APIKey kwargs
+CONFIG_KEYS = {
+    "key": "key",
+    "rate": "rate",
+    "burst": "burst",
+    "weight": "weight",
+    "admin": "admin",
+}
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second, holding at most `burst` tokens."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> Tuple[bool, float]:
+        """Take `tokens` if available; otherwise return how many seconds until they will be."""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True, 0.0
+        return False, (tokens - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class APIKey:
+    """
+    A named API key. `rate`/`burst` limit its tool calls per second (no limit
+    when `rate` is unset); `weight` is its share of each server's fair queue.
+    `admin` keys may also use the profiling endpoints.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        key: str,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        weight: float = 1.0,
+        admin: bool = False,
+    ):
+        if weight <= 0:
+            raise ValueError(f"API key '{name}': weight must be positive")
+        self.name = name
+        self.key = key
+        self.weight = weight
+        self.admin = admin
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.allowed = 0
+        self.limited = 0
+
+    def check_rate_limit(self) -> float:
+        """Return 0 if a call may proceed, otherwise the seconds to wait before retrying."""
+        if self.bucket is None:
+            self.allowed += 1
+            return 0.0
+        ok, retry_after = self.bucket.try_acquire()
+        if ok:
+            self.allowed += 1
+            return 0.0
+        self.limited += 1
+        return retry_after
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {
+            "weight": self.weight,
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
+        if self.bucket is not None:
+            snapshot.update(
+                rate=self.bucket.rate,
+                burst=self.bucket.burst,
+                tokens=round(self.bucket.tokens, 3),
+            )
+        return snapshot
+
+
+class APIKeyRegistry:
+    """The set of API keys accepted by the server, looked up by their secret."""
+
+    def __init__(self, keys=()):
+        self._keys: Dict[str, APIKey] = {}
+        for key in keys:
+            self.add(key)
+
+    def add(self, key: APIKey) -> None:
+        if key.key in self._keys:
+            raise ValueError(f"API key '{key.name}' reuses the secret of another key")
+        self._keys[key.key] = key
+
+    def lookup(self, token: Optional[str]) -> Optional[APIKey]:
+        return self._keys.get(token) if token else None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"per_key": {key.name: key.snapshot() for key in self._keys.values()}}
+
+
+def create_api_key_registry(
+    api_key: Optional[str] = None, config: Optional[Dict[str, Any]] = None
+) -> Optional[APIKeyRegistry]:
+    """
+    Build the registry from the `--api-key` value (registered as "default",
+    unlimited, admin) and an `apiKeys` config section mapping key names to either
+    the secret or a dict of options, e.g.
+    `{"agent-a": {"key": "...", "rate": 5, "burst": 10, "weight": 2}}`.
+    """
+    registry = APIKeyRegistry()
+    if api_key:
+        registry.add(APIKey("default", api_key, admin=True))
+    for name, options in (config or {}).items():
+        if isinstance(options, str):
+            options = {"key": options}
+        if not options.get("key"):
+            raise ValueError(f"API key '{name}' has no 'key'")
+        kwargs = {CONFIG_KEYS[k]: v for k, v in options.items() if k in CONFIG_KEYS}
+        registry.add(APIKey(name, **kwargs))
+    return registry if len(registry) else None
+
+
+def as_api_key_registry(api_key: Union[str, APIKeyRegistry]) -> APIKeyRegistry:
+    if isinstance(api_key, APIKeyRegistry):
+        return api_key
+    return APIKeyRegistry([APIKey("default", api_key, admin=True)])
+
+
+def rate_limit_exception(key: APIKey, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail={"message": f"Rate limit exceeded for API key '{key.name}'"},
+        headers={"Retry-After": str(max(int(retry_after + 0.999), 1))},
+    )
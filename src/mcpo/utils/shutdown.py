@@ -0,0 +1,222 @@
+"""
+Graceful shutdown and zero-downtime restarts.
+
+On SIGTERM or Ctrl+C mcpo stops accepting connections, lets in-flight calls
+(including async jobs) finish for up to `drainTimeout` seconds and then closes
+every server's sessions at once. With `restartOnHup`, SIGHUP starts a new mcpo
+with the same command line that inherits the listening sockets; once its
+servers are up it tells the old process to drain, so no connection is refused
+and no call is cut off while it takes over.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Generator, List, Optional
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# Config file keys (camelCase, like the rest of the config) -> GracefulShutdown kwargs
+CONFIG_KEYS = {
+    "drainTimeout": "drain_timeout",
+    "restartOnHup": "restart_on_hup",
+}
+
+# Set by an mcpo for the process that takes over from it
+LISTEN_FDS_ENV = "MCPO_LISTEN_FDS"
+PREDECESSOR_ENV = "MCPO_PREDECESSOR_PID"
+
+# How often a restarting process checks that its successor is still alive
+SUCCESSOR_POLL_INTERVAL = 1.0
+# After it stops accepting, how long a draining mcpo keeps serving requests on
+# open keep-alive connections (telling clients to reconnect) before closing
+# the idle ones, which a client may be about to reuse
+KEEPALIVE_GRACE = 1.0
+
+
+class GracefulShutdown:
+    """
+    The drain deadline shared by in-flight HTTP requests and async jobs: it
+    starts when mcpo stops accepting connections and ends `drain_timeout`
+    seconds later, after which whatever is left is cancelled.
+    """
+
+    def __init__(self, drain_timeout: float = 30.0, restart_on_hup: bool = False):
+        self.drain_timeout = drain_timeout
+        self.restart_on_hup = restart_on_hup
+        self.started_at: Optional[float] = None
+
+    @property
+    def draining(self) -> bool:
+        return self.started_at is not None
+
+    def begin(self) -> None:
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+            logger.info(f"Draining in-flight calls for up to {self.drain_timeout:g}s")
+
+    def remaining(self) -> float:
+        """Seconds left until the drain deadline."""
+        self.begin()
+        return max(self.drain_timeout - (time.monotonic() - self.started_at), 0.0)
+
+
+def create_graceful_shutdown(config: Any) -> GracefulShutdown:
+    """Build from the `shutdown` config: a drain timeout in seconds, or a dict of options; defaults when empty."""
+    if not config:
+        return GracefulShutdown()
+    if isinstance(config, (int, float)):
+        config = {"drainTimeout": config}
+    options = {
+        CONFIG_KEYS[k]: v
+        for k, v in config.items()
+        if k in CONFIG_KEYS and v is not None
+    }
+    if options.get("restart_on_hup") and not hasattr(signal, "SIGHUP"):
+        logger.warning("Restarting on SIGHUP is not supported on this platform")
+        options["restart_on_hup"] = False
+    return GracefulShutdown(**options)
+
+
+class DrainMiddleware:
+    """Asks clients to close keep-alive connections once mcpo is draining."""
+
+    def __init__(self, app, shutdown: GracefulShutdown):
+        self.app = app
+        self.shutdown = shutdown
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_close(message):
+            if message["type"] == "http.response.start" and self.shutdown.draining:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"connection", b"close"),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_close)
+
+
+def get_graceful_shutdown(app) -> Optional[GracefulShutdown]:
+    return getattr(app.state, "graceful_shutdown", None)
+
+
+async def drain_jobs(app) -> None:
+    """Wait, until the drain deadline, for the async jobs still running."""
+    shutdown = get_graceful_shutdown(app)
+    jobs = getattr(app.state, "jobs", None)
+    if shutdown is None or jobs is None:
+        return
+    left = await jobs.drain(shutdown.remaining())
+    if left:
+        logger.warning(
+            f"Cancelling {left} async job(s) still running at the drain deadline"
+        )
+
+
+def inherited_sockets() -> Optional[List[socket.socket]]:
+    """The listening sockets handed over by the mcpo this process replaces, if any."""
+    fds = os.environ.pop(LISTEN_FDS_ENV, None)
+    if not fds:
+        return None
+    return [socket.socket(fileno=int(fd)) for fd in fds.split(",")]
+
+
+def notify_predecessor() -> None:
+    """Tell the mcpo this process replaces that it can drain now."""
+    pid = os.environ.pop(PREDECESSOR_ENV, None)
+    # Only ever signal the process that started us
+    if pid and int(pid) == os.getppid():
+        logger.info(f"Serving; asking the previous process ({pid}) to drain")
+        os.kill(int(pid), signal.SIGTERM)
+
+
+def spawn_successor(fds: List[int]) -> subprocess.Popen:
+    """Start this mcpo again, with the same command line, on the sockets `fds`."""
+    env = {
+        **os.environ,
+        LISTEN_FDS_ENV: ",".join(str(fd) for fd in fds),
+        PREDECESSOR_ENV: str(os.getpid()),
+    }
+    return subprocess.Popen([sys.executable, *sys.orig_argv[1:]], env=env, pass_fds=fds)
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    A uvicorn server that shares the drain deadline with the app, exits
+    normally once drained, and restarts itself on SIGHUP when asked to.
+    """
+
+    def __init__(self, config: uvicorn.Config, shutdown: GracefulShutdown):
+        super().__init__(config)
+        self.graceful_shutdown = shutdown
+        self.successor: Optional[subprocess.Popen] = None
+
+    @property
+    def handed_over(self) -> bool:
+        """Whether a successor started by a restart is serving on our sockets."""
+        return self.successor is not None and self.successor.poll() is None
+
+    async def startup(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        await super().startup(sockets)
+        notify_predecessor()
+        if self.graceful_shutdown.restart_on_hup:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self.restart)
+
+    def restart(self) -> None:
+        if self.graceful_shutdown.draining:
+            return
+        if self.successor is not None and self.successor.poll() is None:
+            logger.warning("Restart already in progress")
+            return
+        fds = [sock.fileno() for server in self.servers for sock in server.sockets]
+        self.successor = spawn_successor(fds)
+        logger.info(f"Restarting: started process {self.successor.pid}")
+        asyncio.get_running_loop().create_task(self._watch_successor(self.successor))
+
+    async def _watch_successor(self, successor: subprocess.Popen) -> None:
+        while successor.poll() is None and not self.graceful_shutdown.draining:
+            await asyncio.sleep(SUCCESSOR_POLL_INTERVAL)
+        if successor.returncode is not None and not self.graceful_shutdown.draining:
+            logger.error(
+                f"Restart failed: process {successor.pid} exited with "
+                f"{successor.returncode}; still serving"
+            )
+
+    async def shutdown(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        self.graceful_shutdown.begin()
+        if self.graceful_shutdown.restart_on_hup:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        if self.graceful_shutdown.drain_timeout > 0:
+            for server in self.servers:
+                server.close()
+            grace = min(KEEPALIVE_GRACE, self.graceful_shutdown.remaining())
+            deadline = time.monotonic() + grace
+            while self.server_state.connections and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+        # The grace comes out of the drain budget: uvicorn only gets what is left
+        self.config.timeout_graceful_shutdown = self.graceful_shutdown.remaining()
+        await super().shutdown(sockets)
+
+    @contextlib.contextmanager
+    def capture_signals(self) -> Generator[None, None, None]:
+        with super().capture_signals():
+            yield
+            # The signal has been handled; let run() finish cleaning up instead
+            # of uvicorn raising it again once serve() returns (uvicorn keeps
+            # the signals it caught in a private list, so only if it is there)
+            captured = getattr(self, "_captured_signals", None)
+            if isinstance(captured, list):
+                captured.clear()
@@ -0,0 +1,339 @@
+"""
+Disk spooling for large payloads: request bodies and tool results above a
+size threshold, or that would push the payload bytes held in memory by all
+requests in flight over a budget, go through temporary files instead of
+memory. Spooled results are encoded straight into the file and sent from it
+with memory-mapped reads.
+
+A result that is kept whole once encoded (by the result cache, for idempotent
+retries, or by an async job) is never spooled: it would only be read back
+into memory, so those features give up the memory savings for large results.
+"""
+
+import json
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+import anyio
+from fastapi import Request
+from pydantic import ValidationError
+from starlette.responses import Response
+
+from mcpo.utils.offload import (
+    is_json_request,
+    set_body,
+    set_parsed_body,
+    validate_json_body,
+)
+
+# Config file keys (camelCase, like the rest of the config) -> Spool kwargs
+CONFIG_KEYS = {
+    "requestThreshold": "request_threshold",
+    "responseThreshold": "response_threshold",
+    "memoryBudget": "memory_budget",
+    "directory": "directory",
+}
+
+# Bytes written to or sent from a spool file at a time
+CHUNK_SIZE = 256 * 1024
+
+# What FastAPI reads as the body of a spooled request; the parsed body is
+# already in place, so its content is never looked at
+SPOOLED_BODY = b"{}"
+
+# Set while computing a result that is kept once encoded
+_result_kept: ContextVar[bool] = ContextVar("mcpo_result_kept", default=False)
+
+
+class Spool:
+    """
+    Decides which payloads go to disk and keeps count of the ones that stay
+    in memory. A request body of at least `request_threshold` bytes, or a
+    result of at least `response_threshold` bytes, is spooled; so is any
+    payload that would take the bytes held in memory past `memory_budget`.
+    """
+
+    def __init__(
+        self,
+        request_threshold: Optional[int] = 8 * 1024 * 1024,
+        response_threshold: Optional[int] = 8 * 1024 * 1024,
+        memory_budget: Optional[int] = None,
+        directory: Optional[str] = None,
+    ):
+        self.request_threshold = request_threshold
+        self.response_threshold = response_threshold
+        self.memory_budget = memory_budget
+        self.directory = directory
+        self.in_memory = 0
+        self.max_in_memory = 0
+        self.spooled_requests = 0
+        self.spooled_responses = 0
+        self.spooled_bytes = 0
+        self.over_budget = 0
+
+    def should_spool(self, size: int, threshold: Optional[int], held: int = 0) -> bool:
+        """Whether a payload of `size` bytes, `held` of which are counted in memory already, goes to disk."""
+        if threshold is not None and size >= threshold:
+            return True
+        if (
+            self.memory_budget is not None
+            and self.in_memory - held + size > self.memory_budget
+        ):
+            self.over_budget += 1
+            return True
+        return False
+
+    def take(self, size: int) -> None:
+        self.in_memory += size
+        self.max_in_memory = max(self.max_in_memory, self.in_memory)
+
+    def release(self, size: int) -> None:
+        self.in_memory -= size
+
+    @contextmanager
+    def hold(self, size: int):
+        """Count `size` bytes as held in memory for the duration of the block."""
+        self.take(size)
+        try:
+            yield
+        finally:
+            self.release(size)
+
+    def temporary_file(self):
+        # Unlinked at once on POSIX, so nothing is left behind if mcpo dies
+        return tempfile.TemporaryFile(dir=self.directory)
+
+    def encode_response(
+        self, response_data: Any, response_model=None
+    ) -> "SpooledResponse":
+        """JSON-encode a processed tool result into a spool file, chunk by chunk."""
+        if response_model is not None:
+            try:
+                response_data = response_model.model_validate(response_data).model_dump(
+                    mode="json", exclude_none=True, by_alias=True
+                )
+            except ValidationError:
+                pass
+        encoder = json.JSONEncoder(
+            ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        )
+        file = self.temporary_file()
+        try:
+            pending = []
+            pending_size = 0
+            for chunk in encoder.iterencode(response_data):
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size >= CHUNK_SIZE:
+                    file.write("".join(pending).encode("utf-8"))
+                    pending, pending_size = [], 0
+            file.write("".join(pending).encode("utf-8"))
+            file.flush()
+        except BaseException:
+            file.close()
+            raise
+        response = SpooledResponse(file)
+        self.spooled_responses += 1
+        self.spooled_bytes += response.size
+        return response
+
+    async def read_request_body(
+        self, request: Request, body_field, offloader=None
+    ) -> int:
+        """
+        Read a JSON body, counting its bytes as they arrive (a chunked body has
+        no content-length). It is kept in memory, and counted there, until it
+        reaches the request threshold or the memory budget; from then on it
+        goes to a spool file, written from a worker thread, and is parsed and
+        validated there while counted in memory. Returns the bytes still
+        counted for a body kept in memory, for the caller to `release`.
+        """
+        declared = int(request.headers.get("content-length") or 0)
+        buffered = []
+        held = 0
+        file = None
+        if declared and self.should_spool(declared, self.request_threshold):
+            file = self.temporary_file()
+        # Written to the file a chunk at a time, but never less than it takes
+        # to empty the memory buffer
+        pending = []
+        pending_size = 0
+        try:
+            async for chunk in request.stream():
+                if file is None:
+                    if not self.should_spool(
+                        held + len(chunk), self.request_threshold, held
+                    ):
+                        buffered.append(chunk)
+                        self.take(len(chunk))
+                        held += len(chunk)
+                        continue
+                    file = self.temporary_file()
+                    pending, pending_size, buffered = buffered, held, []
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size >= CHUNK_SIZE or held:
+                    await anyio.to_thread.run_sync(file.write, b"".join(pending))
+                    pending, pending_size = [], 0
+                    self.release(held)
+                    held = 0
+        except BaseException:
+            self.release(held)
+            if file is not None:
+                file.close()
+            raise
+
+        if file is None:
+            set_body(request, b"".join(buffered))
+            return held
+
+        with file:
+            if pending:
+                await anyio.to_thread.run_sync(file.write, b"".join(pending))
+            size = file.tell()
+            self.spooled_requests += 1
+            self.spooled_bytes += size
+
+            def parse():
+                file.seek(0)
+                return validate_json_body(file.read(), body_field)
+
+            with self.hold(size):
+                if offloader is not None:
+                    validated = await offloader.run(parse)
+                else:
+                    validated = await anyio.to_thread.run_sync(parse)
+        set_parsed_body(request, SPOOLED_BODY, validated)
+        return 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "request_threshold_bytes": self.request_threshold,
+            "response_threshold_bytes": self.response_threshold,
+            "memory_budget_bytes": self.memory_budget,
+            "in_memory_bytes": self.in_memory,
+            "max_in_memory_bytes": self.max_in_memory,
+            "spooled_requests": self.spooled_requests,
+            "spooled_responses": self.spooled_responses,
+            "spooled_bytes": self.spooled_bytes,
+            "over_budget": self.over_budget,
+        }
+
+
+class SpooledResponse(Response):
+    """A JSON response sent from a spool file in memory-mapped chunks."""
+
+    def __init__(self, file):
+        super().__init__(content=b"", media_type="application/json")
+        self.file = file
+        self.size = os.fstat(file.fileno()).st_size
+        self.headers["content-length"] = str(self.size)
+
+    def read(self) -> bytes:
+        """The whole body, for callers that keep it (caches, async jobs)."""
+        if not self.size:
+            return b""
+        with mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[:]
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": self.status_code,
+                    "headers": self.raw_headers,
+                }
+            )
+            if not self.size:
+                await send({"type": "http.response.body", "body": b""})
+                return
+            with mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                for offset in range(0, self.size, CHUNK_SIZE):
+                    end = offset + CHUNK_SIZE
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": mapped[offset:end],
+                            "more_body": end < self.size,
+                        }
+                    )
+        finally:
+            self.file.close()
+
+
+def response_body(response: Response, close: bool = False) -> bytes:
+    """
+    The body of a response, read back from disk if it was spooled; `close`
+    closes the spool file afterwards, for a response that is not sent.
+    """
+    if isinstance(response, SpooledResponse):
+        try:
+            return response.read()
+        finally:
+            if close:
+                response.file.close()
+    return bytes(response.body)
+
+
+@contextmanager
+def keeping_result():
+    """Mark the result computed in the block as kept whole once encoded, so it is not spooled."""
+    token = _result_kept.set(True)
+    try:
+        yield
+    finally:
+        _result_kept.reset(token)
+
+
+def result_kept() -> bool:
+    return _result_kept.get()
+
+
+def get_spooling_handler(handler, body_field):
+    """
+    Wrap a tool route handler so large JSON bodies are spooled to disk and
+    the bodies kept in memory count against the budget.
+    """
+
+    async def app(request: Request):
+        spool: Optional[Spool] = get_spool(request.app)
+        if spool is None:
+            return await handler(request)
+        if body_field is None or not is_json_request(request):
+            with spool.hold(int(request.headers.get("content-length") or 0)):
+                return await handler(request)
+        offloader = getattr(request.app.state, "offloader", None)
+        held = await spool.read_request_body(request, body_field, offloader)
+        try:
+            return await handler(request)
+        finally:
+            spool.release(held)
+
+    return app
+
+
+def create_spool(config: Any) -> Optional[Spool]:
+    """Build from the `spool` config: True for the defaults, or a dict of options."""
+    if not config:
+        return None
+    if config is True:
+        config = {}
+    options = {
+        CONFIG_KEYS[k]: v
+        for k, v in config.items()
+        if k in CONFIG_KEYS and v is not None
+    }
+    if options.get("directory"):
+        options["directory"] = os.path.expanduser(options["directory"])
+    return Spool(**options)
+
+
+def get_spool(app) -> Optional[Spool]:
+    return getattr(app.state, "spool", None)
@@ -0,0 +1,482 @@
+"""
+Lightweight OpenTelemetry-compatible tracing.
+
+Spans use the OTel data model and are exported as OTLP/JSON, either to a
+collector over HTTP (`/v1/traces`) or appended to a JSON Lines file. Trace
+context is read from and written as W3C `traceparent` values.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Config file keys (camelCase, like the rest of the config) -> create_tracer options
+CONFIG_KEYS = {
+    "exporter": "exporter",
+    "endpoint": "endpoint",
+    "path": "path",
+    "headers": "headers",
+    "sampleRatio": "sample_ratio",
+    "serviceName": "service_name",
+    "flushSeconds": "flush_interval",
+    "maxQueued": "max_queued",
+}
+
+TRACEPARENT_HEADER = "traceparent"
+DEFAULT_OTLP_ENDPOINT = "http://localhost:4318/v1/traces"
+
+# OTLP span kinds
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+# Built-in endpoints polled by monitoring; tracing them is only noise
+UNTRACED_PATHS = ("/_health", "/_metrics")
+
+_TRACEPARENT_RE = re.compile(
+    r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})"
+)
+# The trace context mcpo puts in a JSON-RPC request's `_meta`, which comes
+# first in the serialized params
+_META_TRACEPARENT_RE = re.compile(
+    rb'"traceparent"\s*:\s*"(00-[0-9a-f]{32}-[0-9a-f]{16}-[0-9a-f]{2})"'
+)
+_META_SEARCH_BYTES = 1024
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("mcpo_span", default=None)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Return (trace id, parent span id, sampled) from a `traceparent` value."""
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if not match:
+        return None
+    version, trace_id, parent_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 0x01)
+
+
+def traceparent_from_body(body: bytes) -> Optional[str]:
+    """The `traceparent` in the `_meta` of a serialized JSON-RPC request, if any."""
+    match = _META_TRACEPARENT_RE.search(body, 0, _META_SEARCH_BYTES)
+    return match.group(1).decode("ascii") if match else None
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _attribute_value(value)}
+        for key, value in attributes.items()
+    ]
+
+
+class Span:
+    """One timed operation of a trace. Unsampled spans are never exported."""
+
+    __slots__ = (
+        "tracer",
+        "name",
+        "kind",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "sampled",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "status",
+        "status_message",
+        "root",
+        "marks",
+    )
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        sampled: bool,
+        kind: int = INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+        root: Optional["Span"] = None,
+        start_ns: Optional[int] = None,
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.root = root or self
+        # Points in time that later spans of the request start from
+        self.marks: Dict[str, int] = {}
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def child(
+        self,
+        name: str,
+        kind: int = INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+        start_ns: Optional[int] = None,
+    ) -> "Span":
+        return Span(
+            self.tracer,
+            name,
+            self.trace_id,
+            self.span_id,
+            self.sampled,
+            kind=kind,
+            attributes=attributes,
+            root=self.root,
+            start_ns=start_ns,
+        )
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.sampled:
+                self.tracer.queue(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _attributes(self.attributes),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status:
+            span["status"] = {"code": self.status, "message": self.status_message}
+        return span
+
+
+class FileSpanExporter:
+    """Appends each batch to a file as one line of OTLP/JSON (the OTel file exporter format)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, line: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    async def export(self, payload: Dict[str, Any]) -> None:
+        import anyio
+
+        line = json.dumps(payload, separators=(",", ":")) + "\n"
+        await anyio.to_thread.run_sync(self._write, line)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class OTLPSpanExporter:
+    """Posts each batch as OTLP/JSON to a collector's `/v1/traces` endpoint."""
+
+    def __init__(
+        self,
+        endpoint: str = DEFAULT_OTLP_ENDPOINT,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 10.0,
+    ):
+        import httpx
+
+        self.endpoint = endpoint
+        self._client = httpx.AsyncClient(headers=headers, timeout=timeout)
+
+    async def export(self, payload: Dict[str, Any]) -> None:
+        response = await self._client.post(self.endpoint, json=payload)
+        response.raise_for_status()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class Tracer:
+    """
+    Starts request spans and exports finished ones in the background.
+
+    Sampling is decided once per trace: an incoming `traceparent` decides for
+    its trace, otherwise `sample_ratio` of trace ids are kept. Unsampled
+    requests still get ids, so their context is propagated upstream, but no
+    child spans are created for them. Finished spans are batched and exported
+    every `flush_interval` seconds; beyond `max_queued` waiting spans, new
+    ones are dropped.
+    """
+
+    def __init__(
+        self,
+        exporter,
+        sample_ratio: float = 1.0,
+        service_name: str = "mcpo",
+        flush_interval: float = 2.0,
+        max_queued: int = 10000,
+    ):
+        self.exporter = exporter
+        self.sample_ratio = min(max(sample_ratio, 0.0), 1.0)
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        self.traces_sampled = 0
+        self.traces_not_sampled = 0
+        self.spans_exported = 0
+        self.spans_dropped = 0
+        self.export_errors = 0
+        self._queued: List[Span] = []
+        self._task: Optional[asyncio.Task] = None
+        self._threshold = int(self.sample_ratio * (1 << 64))
+
+    def _should_sample(self, trace_id: str) -> bool:
+        # Like OTel's TraceIdRatioBased: the same trace id gets the same answer
+        return int(trace_id[16:], 16) < self._threshold
+
+    def start_request_span(
+        self,
+        name: str,
+        traceparent: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Span:
+        parent = parse_traceparent(traceparent)
+        if parent:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            sampled = self._should_sample(trace_id)
+        if sampled:
+            self.traces_sampled += 1
+        else:
+            self.traces_not_sampled += 1
+        return Span(self, name, trace_id, parent_id, sampled, SERVER, attributes)
+
+    def queue(self, span: Span) -> None:
+        if len(self._queued) >= self.max_queued:
+            self.spans_dropped += 1
+            return
+        self._queued.append(span)
+
+    def encode(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _attributes({"service.name": self.service_name})
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "mcpo"},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    async def flush(self) -> None:
+        spans, self._queued = self._queued, []
+        if not spans:
+            return
+        try:
+            await self.exporter.export(self.encode(spans))
+            self.spans_exported += len(spans)
+        except Exception as e:
+            self.export_errors += 1
+            self.spans_dropped += len(spans)
+            logger.warning(f"Exporting {len(spans)} spans failed: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        await self.exporter.aclose()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "sample_ratio": self.sample_ratio,
+            "traces_sampled": self.traces_sampled,
+            "traces_not_sampled": self.traces_not_sampled,
+            "spans_queued": len(self._queued),
+            "spans_exported": self.spans_exported,
+            "spans_dropped": self.spans_dropped,
+            "export_errors": self.export_errors,
+        }
+
+
+def create_tracer(config: Any) -> Optional[Tracer]:
+    """
+    Build a tracer from a `tracing` config, e.g.
+    `{"exporter": "otlp", "endpoint": "http://collector:4318/v1/traces", "sampleRatio": 0.1}`
+    or `{"exporter": "file", "path": "traces.jsonl"}`.
+    """
+    if not config:
+        return None
+    options = {CONFIG_KEYS[k]: v for k, v in config.items() if k in CONFIG_KEYS}
+    exporter_name = options.pop("exporter", "otlp")
+    endpoint = options.pop("endpoint", None)
+    path = options.pop("path", None)
+    headers = options.pop("headers", None)
+    if exporter_name == "file":
+        if not (path or endpoint):
+            raise ValueError("The file trace exporter needs a 'path'")
+        exporter = FileSpanExporter(path or endpoint)
+    elif exporter_name == "otlp":
+        exporter = OTLPSpanExporter(endpoint or DEFAULT_OTLP_ENDPOINT, headers)
+    else:
+        raise ValueError(f"Unknown trace exporter '{exporter_name}'")
+    return Tracer(exporter, **options)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """The context to send upstream: the current span of the request being handled."""
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+
+@contextmanager
+def trace_span(
+    name: str,
+    kind: int = INTERNAL,
+    attributes: Optional[Dict[str, Any]] = None,
+    start_ns: Optional[int] = None,
+):
+    """Record the block as a child of the current span, if the request is sampled."""
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        yield None
+        return
+    span = parent.child(name, kind, attributes, start_ns)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def trace_mark(name: str) -> None:
+    span = _current_span.get()
+    if span is not None and span.sampled:
+        span.root.marks[name] = time.time_ns()
+
+
+def trace_since(name: str, mark: str) -> None:
+    """Record a span that started at `mark` and ends now."""
+    span = _current_span.get()
+    if span is None or not span.sampled:
+        return
+    start_ns = span.root.marks.get(mark)
+    if start_ns is not None:
+        span.child(name, start_ns=start_ns).end()
+
+
+class TracingMiddleware:
+    """
+    Starts a server span for each HTTP request, continuing the trace of an
+    incoming `traceparent` header, and makes it the current span so the
+    phases of the request and the upstream MCP call are recorded under it.
+    """
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNTRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope.get("headers", []):
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        attributes = {"http.request.method": scope["method"], "url.path": scope["path"]}
+        client = scope.get("client")
+        if client:
+            attributes["client.address"] = client[0]
+        span = self.tracer.start_request_span(
+            f"{scope['method']} {scope['path']}", traceparent, attributes
+        )
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                span.set_attribute("http.response.status_code", status)
+                if status >= 500:
+                    span.set_error(f"HTTP {status}")
+            await send(message)
+
+        token = _current_span.set(span)
+        try:
+            await self.app(scope, receive, send_traced)
+        except Exception as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
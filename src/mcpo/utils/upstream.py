@@ -0,0 +1,849 @@
+import itertools
+import logging
+import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncContextManager, Callable, Dict, List, Optional
+
+import anyio
+from fastapi import HTTPException
+from mcp import ClientSession
+from mcp.shared.exceptions import McpError
+from mcp.types import (
+    CONNECTION_CLOSED,
+    INVALID_PARAMS,
+    INVALID_REQUEST,
+    METHOD_NOT_FOUND,
+    PARSE_ERROR,
+)
+
+logger = logging.getLogger(__name__)
+
+STARTING = "starting"
+READY = "ready"
+STANDBY = "standby"
+DRAINING = "draining"
+STOPPED = "stopped"
+FAILED = "failed"
+
+# Replica roles: serving calls, or kept initialized as a spare
+ACTIVE = "active"
+
+# Config file keys (camelCase, like the rest of the config) -> recycling kwargs
+CONFIG_KEYS = {
+    "maxCalls": "max_calls",
+    "maxAgeSeconds": "max_age",
+    "maxRssMb": "max_rss_mb",
+    "drainSeconds": "drain_timeout",
+    "sampleSeconds": "sample_interval",
+}
+
+# Keys of the `loadBalancing` config section -> UpstreamPool kwargs
+BALANCING_CONFIG_KEYS = {
+    "strategy": "strategy",
+    "ejectAfterFailures": "eject_after",
+    "ejectSeconds": "eject_seconds",
+}
+
+STRATEGIES = ("leastInFlight", "roundRobin", "leastLatency")
+
+# Keys of the `standby` config section -> UpstreamPool kwargs
+STANDBY_CONFIG_KEYS = {
+    "count": "standby",
+    "maxActive": "max_active",
+    "scaleUpInFlight": "scale_up_in_flight",
+    "scaleDownIdleSeconds": "scale_down_idle",
+}
+
+# How often replica processes are checked for having exited
+LIVENESS_INTERVAL = 1.0
+
+# How long a call waits for a replica while the server is (re)starting
+READY_WAIT_SECONDS = 10.0
+
+# A replica connected for longer than this before failing counts as healthy,
+# so the next restart happens without backoff
+HEALTHY_SECONDS = 10.0
+
+# How long replicas get to shut down when the pool closes
+SHUTDOWN_TIMEOUT = 5.0
+
+# MCP errors caused by the request rather than the server
+MCP_CLIENT_ERROR_CODES = {
+    PARSE_ERROR,
+    INVALID_REQUEST,
+    METHOD_NOT_FOUND,
+    INVALID_PARAMS,
+}
+
+# Weight of the newest call in an endpoint's average latency
+LATENCY_EWMA_ALPHA = 0.2
+
+# Errors that mean the connection to a replica is gone
+_TRANSPORT_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+)
+
+
+class UpstreamUnavailableError(Exception):
+    """No replica of the server is ready to take a call."""
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Exited but not reaped yet
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+def _children_by_parent() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def read_rss(pid: int) -> Optional[int]:
+    """Resident memory in bytes of `pid` and all of its descendants (Linux only)."""
+    if not os.path.isdir("/proc"):
+        return None
+    children = _children_by_parent()
+    total, found, pending = 0, False, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        found = True
+                        break
+        except OSError:
+            continue
+    return total if found else None
+
+
+class RecyclePolicy:
+    """When a replica has served long enough to be replaced by a fresh one."""
+
+    def __init__(
+        self,
+        max_calls: Optional[int] = None,
+        max_age: Optional[float] = None,
+        max_rss_mb: Optional[float] = None,
+    ):
+        self.max_calls = max_calls
+        self.max_age = max_age
+        self.max_rss_mb = max_rss_mb
+
+    def reason(self, replica: "Replica") -> Optional[str]:
+        if self.max_calls and replica.calls >= self.max_calls:
+            return f"served {replica.calls} calls"
+        if self.max_age and replica.age >= self.max_age:
+            return f"running for {replica.age:.0f}s"
+        if (
+            self.max_rss_mb
+            and replica.rss
+            and replica.rss >= self.max_rss_mb * 1024 * 1024
+        ):
+            return f"RSS {replica.rss / 1024 / 1024:.0f} MB"
+        return None
+
+
+class Endpoint:
+    """
+    One address of the server: a URL of a remote server with several
+    `urls`, or the only way to reach it (`url` None: the configured command
+    or URL). Tracks call outcomes for load balancing and ejection.
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        # Moving average of successful call durations, in seconds
+        self.latency: Optional[float] = None
+        # Connections lost in a row, for restart backoff
+        self.failures_in_a_row = 0
+
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+    def record_success(self, seconds: float) -> None:
+        self.calls += 1
+        self.consecutive_failures = 0
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_EWMA_ALPHA * (seconds - self.latency)
+
+    def record_failure(self) -> None:
+        self.calls += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+
+    def eject(self, seconds: float) -> None:
+        self.ejections += 1
+        self.consecutive_failures = 0
+        # Endpoints that keep failing stay out longer, up to 5x
+        self.ejected_until = time.monotonic() + seconds * min(self.ejections, 5)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "ejected": self.ejected,
+            "calls": self.calls,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "latency_ms": round(self.latency * 1000, 3) if self.latency else 0.0,
+        }
+
+
+class Replica:
+    """One connection to the server (for stdio, one child process) and its session."""
+
+    def __init__(
+        self,
+        pool: "UpstreamPool",
+        replica_id: int,
+        role: str = ACTIVE,
+        needed_at: Optional[float] = None,
+        endpoint: Optional[Endpoint] = None,
+    ):
+        self.pool = pool
+        self.id = replica_id
+        self.role = role
+        self.endpoint = endpoint or Endpoint()
+        self.state = STARTING
+        # When the pool started waiting for this replica to serve calls
+        self.needed_at = needed_at
+        self.session: Optional[ClientSession] = None
+        self.initialize_result = None
+        # Set by the connector when the process writes its pid to a file
+        self.pidfile: Optional[str] = None
+        self.pid: Optional[int] = None
+        self.rss: Optional[int] = None
+        self.created_at = time.monotonic()
+        self.connected_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.last_used = self.created_at
+        self.calls = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.replacing = False
+        self.error: Optional[BaseException] = None
+        self._lost = False
+        self._stop = anyio.Event()
+        self._started = anyio.Event()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.ready_at if self.ready_at else 0.0
+
+    def _read_pid(self) -> None:
+        if not self.pidfile:
+            return
+        try:
+            with open(self.pidfile) as f:
+                self.pid = int(f.read().strip())
+        except (OSError, ValueError):
+            logger.warning(
+                f"Could not read pid of '{self.pool.name}' replica {self.id}"
+            )
+
+    async def run(self) -> None:
+        try:
+            async with self.pool.connect(self) as session:
+                self.initialize_result = await session.initialize()
+                self.session = session
+                self._read_pid()
+                self.connected_at = time.monotonic()
+                self.pool._connected(self)
+                self._started.set()
+                self.pool._notify()
+                await self._stop.wait()
+        except Exception as e:
+            self.error = e
+            logger.warning(
+                f"'{self.pool.name}' replica {self.id} failed: {type(e).__name__}: {e}"
+            )
+        finally:
+            if self.state != STOPPED:
+                self.state = (
+                    FAILED if self.error or not self._stop.is_set() else STOPPED
+                )
+            self._started.set()
+            if self.state == FAILED:
+                self.pool._replica_lost(self)
+            self.pool._replica_exited(self)
+
+    async def wait_started(self) -> None:
+        """Wait until the replica is connected (ready or standby) or has failed to start."""
+        await self._started.wait()
+
+    def stop(self) -> None:
+        if self.state in (STARTING, READY, STANDBY, DRAINING):
+            self.state = STOPPED
+        self._stop.set()
+
+    def fail(self, reason: str) -> None:
+        if self.state in (STOPPED, FAILED):
+            return
+        logger.warning(f"'{self.pool.name}' replica {self.id} is gone: {reason}")
+        self.state = FAILED
+        self.error = RuntimeError(reason)
+        self._stop.set()
+        self.pool._replica_lost(self)
+        self.pool._notify()
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {
+            "state": self.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "age_seconds": round(self.age, 3),
+        }
+        if self.pid is not None:
+            snapshot["pid"] = self.pid
+        if self.rss is not None:
+            snapshot["rss_bytes"] = self.rss
+        if self.endpoint.url:
+            snapshot["endpoint"] = self.endpoint.url
+        return snapshot
+
+
+class UpstreamPool:
+    """
+    Owns the connections to one MCP server.
+
+    Each replica runs in its own task, which enters the transport and
+    `ClientSession` contexts and keeps them open until the replica is
+    stopped. Calls lease the ready replica with the fewest calls in flight.
+
+    A replica that reaches a `RecyclePolicy` limit is replaced gracefully:
+    a new replica is started and initialized, new calls go to it, and the
+    old one is stopped once its in-flight calls finish (or after
+    `drain_timeout`). A replica whose process dies or whose connection
+    closes is replaced immediately, with backoff if replacements keep
+    failing.
+
+    With `standby` spares, that many extra replicas are kept connected and
+    initialized but idle. A spare is promoted instead of starting a new
+    replica when one is lost or recycled, and when every active replica has
+    `scale_up_in_flight` calls running (up to `max_active` replicas).
+    Extra active replicas that stay idle for `scale_down_idle` seconds go
+    back to being spares.
+
+    A remote server with several `endpoints` gets a replica per endpoint.
+    Calls are spread over them by `strategy` ("leastInFlight", "roundRobin"
+    or "leastLatency"), and an endpoint whose calls fail `eject_after` times
+    in a row is left out of rotation for `eject_seconds` (longer if it keeps
+    failing) while the others take its calls.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connect: Callable[[Replica], AsyncContextManager[ClientSession]],
+        recycle: Optional[RecyclePolicy] = None,
+        drain_timeout: float = 30.0,
+        sample_interval: float = 10.0,
+        standby: int = 0,
+        max_active: int = 1,
+        scale_up_in_flight: Optional[int] = None,
+        scale_down_idle: float = 60.0,
+        endpoints: Optional[List[str]] = None,
+        strategy: str = "leastInFlight",
+        eject_after: int = 5,
+        eject_seconds: float = 30.0,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"'{name}': load balancing strategy must be one of {', '.join(STRATEGIES)}"
+            )
+        self.name = name
+        self.connect = connect
+        self.recycle = recycle
+        self.drain_timeout = drain_timeout
+        self.sample_interval = sample_interval
+        self.standby = standby
+        self.max_active = max(max_active, 1)
+        self.scale_up_in_flight = scale_up_in_flight
+        self.scale_down_idle = scale_down_idle
+        self.endpoints = [Endpoint(url) for url in endpoints or [None]]
+        self.strategy = strategy
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.replicas: List[Replica] = []
+        self.recycled = 0
+        self.restarts = 0
+        self.scale_ups = 0
+        # Time from needing another serving replica until one was serving,
+        # by whether a standby was promoted or a replica had to be started
+        self.promotions = {
+            source: {"count": 0, "last_ms": 0.0, "max_ms": 0.0}
+            for source in (STANDBY, "cold")
+        }
+        self._unavailable_since: Optional[float] = None
+        self._ids = itertools.count()
+        self._changed = anyio.Event()
+        self._closing = False
+        self._running = False
+        self._round_robin = itertools.count()
+        self._stack: Optional[AsyncExitStack] = None
+        self._tg = None
+
+    # -- lifecycle ---------------------------------------------------------
+
+    async def __aenter__(self) -> "UpstreamPool":
+        self._stack = AsyncExitStack()
+        self._tg = await self._stack.enter_async_context(anyio.create_task_group())
+        try:
+            first = [self._start_replica(endpoint=e) for e in self.endpoints]
+            for replica in first:
+                await replica.wait_started()
+            if not self.ready_replicas:
+                raise first[0].error or RuntimeError(f"'{self.name}' failed to start")
+            self._running = True
+            for replica in first:
+                if replica.state != READY:
+                    # Keep serving from the endpoints that are up
+                    logger.warning(
+                        f"'{self.name}' endpoint {replica.endpoint.url} is down"
+                    )
+                    self._endpoint_lost(replica.endpoint)
+            self._refill_standby()
+            self._tg.start_soon(self._monitor)
+        except BaseException:
+            await self._shutdown()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._shutdown()
+
+    async def _shutdown(self) -> None:
+        self._closing = True
+        for replica in list(self.replicas):
+            replica.stop()
+        with anyio.move_on_after(SHUTDOWN_TIMEOUT) as scope:
+            while self.replicas:
+                await self._wait_changed()
+        if scope.cancelled_caught:
+            logger.warning(f"'{self.name}' replicas did not stop in time")
+        self._tg.cancel_scope.cancel()
+        await self._stack.aclose()
+
+    def _replicas_of(self, endpoint: Endpoint, states) -> List[Replica]:
+        return [
+            r for r in self.replicas if r.endpoint is endpoint and r.state in states
+        ]
+
+    def _start_replica(
+        self,
+        role: str = ACTIVE,
+        needed_at: Optional[float] = None,
+        endpoint: Optional[Endpoint] = None,
+    ) -> Replica:
+        if endpoint is None:
+            # The healthy endpoint with the fewest replicas
+            endpoint = min(
+                self.endpoints,
+                key=lambda e: (
+                    e.ejected,
+                    len(self._replicas_of(e, (STARTING, READY, STANDBY))),
+                ),
+            )
+        replica = Replica(
+            self, next(self._ids), role=role, needed_at=needed_at, endpoint=endpoint
+        )
+        self.replicas.append(replica)
+        self._tg.start_soon(replica.run)
+        return replica
+
+    def _connected(self, replica: Replica) -> None:
+        if replica.role == STANDBY and self.ready_replicas:
+            replica.state = STANDBY
+            return
+        # An active replica, or a spare that arrived while none was serving
+        replica.role = ACTIVE
+        self._make_ready(replica, "cold", replica.needed_at or self._unavailable_since)
+
+    def _make_ready(
+        self, replica: Replica, source: str, needed_at: Optional[float]
+    ) -> None:
+        replica.state = READY
+        replica.ready_at = replica.last_used = time.monotonic()
+        self._unavailable_since = None
+        if needed_at is not None:
+            stats = self.promotions[source]
+            elapsed_ms = (replica.ready_at - needed_at) * 1000
+            stats["count"] += 1
+            stats["last_ms"] = round(elapsed_ms, 3)
+            stats["max_ms"] = round(max(stats["max_ms"], elapsed_ms), 3)
+
+    def _promote(self, needed_at: float) -> Optional[Replica]:
+        """Turn a standby into an active replica, then start a spare to replace it."""
+        spares = [r for r in self.replicas if r.state == STANDBY]
+        if not spares:
+            return None
+        replica = spares[0]
+        replica.role = ACTIVE
+        self._make_ready(replica, STANDBY, needed_at)
+        logger.info(f"Promoted '{self.name}' standby replica {replica.id}")
+        self._notify()
+        self._refill_standby()
+        return replica
+
+    def _refill_standby(self) -> None:
+        if self._closing:
+            return
+        spares = [
+            r
+            for r in self.replicas
+            if r.role == STANDBY and r.state in (STARTING, STANDBY)
+        ]
+        for _ in range(self.standby - len(spares)):
+            self._start_replica(role=STANDBY)
+
+    def _replica_lost(self, replica: Replica) -> None:
+        if replica._lost or self._closing or not self._running:
+            return
+        replica._lost = True
+
+        connected_for = (
+            time.monotonic() - replica.connected_at if replica.connected_at else 0.0
+        )
+        if connected_for > HEALTHY_SECONDS:
+            replica.endpoint.failures_in_a_row = 0
+        if replica.role == ACTIVE and not self.ready_replicas:
+            self._unavailable_since = self._unavailable_since or time.monotonic()
+            self._promote(self._unavailable_since)
+        delay = self._endpoint_lost(replica.endpoint)
+        if self.standby:
+            self._tg.start_soon(self._refill_standby_later, delay)
+
+    def _endpoint_lost(self, endpoint: Endpoint) -> float:
+        """Reconnect to `endpoint` if nothing else serves it; returns the backoff used."""
+        endpoint.failures_in_a_row += 1
+        # Restart at once after the first failure, then back off
+        n = endpoint.failures_in_a_row
+        delay = min(2 ** (n - 2), 30) if n > 1 else 0
+        if not self._replicas_of(endpoint, (READY, STARTING)):
+            self._tg.start_soon(self._restart, endpoint, delay)
+        return delay
+
+    def _replica_exited(self, replica: Replica) -> None:
+        if replica in self.replicas:
+            self.replicas.remove(replica)
+        self._notify()
+
+    async def _restart(self, endpoint: Endpoint, delay: float) -> None:
+        if delay:
+            logger.info(f"Restarting '{self.name}' in {delay}s")
+            await anyio.sleep(delay)
+        if self._closing or self._replicas_of(endpoint, (READY, STARTING)):
+            return
+        self.restarts += 1
+        self._start_replica(needed_at=self._unavailable_since, endpoint=endpoint)
+
+    async def _refill_standby_later(self, delay: float) -> None:
+        await anyio.sleep(delay)
+        self._refill_standby()
+
+    # -- selection ---------------------------------------------------------
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = anyio.Event()
+
+    async def _wait_changed(self) -> None:
+        await self._changed.wait()
+
+    @property
+    def ready_replicas(self) -> List[Replica]:
+        return [r for r in self.replicas if r.state == READY]
+
+    @property
+    def session(self) -> Optional[ClientSession]:
+        ready = self.ready_replicas
+        return ready[0].session if ready else None
+
+    @property
+    def initialize_result(self):
+        ready = self.ready_replicas
+        return ready[0].initialize_result if ready else None
+
+    def select(self, exclude: Optional[Replica] = None) -> Optional[Replica]:
+        ready = [r for r in self.ready_replicas if r is not exclude]
+        if not ready:
+            return None
+        # When every endpoint is ejected, use them all rather than none
+        candidates = [r for r in ready if not r.endpoint.ejected] or ready
+        if self.strategy == "roundRobin":
+            return candidates[next(self._round_robin) % len(candidates)]
+        if self.strategy == "leastLatency":
+            # Endpoints without a measurement yet are tried first
+            return min(
+                candidates,
+                key=lambda r: (r.endpoint.latency or 0.0) * (r.in_flight + 1),
+            )
+        return min(candidates, key=lambda r: r.in_flight)
+
+    def _scale_up(self) -> Optional[Replica]:
+        if len(self.ready_replicas) >= self.max_active or any(
+            r.role == ACTIVE and r.state == STARTING for r in self.replicas
+        ):
+            return None
+        self.scale_ups += 1
+        logger.info(f"Scaling up '{self.name}' to {len(self.ready_replicas) + 1}")
+        promoted = self._promote(time.monotonic())
+        if promoted is None:
+            self._start_replica(needed_at=time.monotonic())
+        return promoted
+
+    def _scale_down(self) -> None:
+        ready = self.ready_replicas
+        if len(ready) <= 1:
+            return
+        now = time.monotonic()
+        for replica in ready:
+            if (
+                not replica.in_flight
+                and not replica.replacing
+                and now - replica.last_used >= self.scale_down_idle
+            ):
+                break
+        else:
+            return
+        spares = [
+            r
+            for r in self.replicas
+            if r.role == STANDBY and r.state in (STARTING, STANDBY)
+        ]
+        logger.info(f"Scaling down '{self.name}' to {len(ready) - 1}")
+        if len(spares) < self.standby:
+            replica.role = replica.state = STANDBY
+            replica.ready_at = None
+        else:
+            replica.stop()
+
+    async def _acquire(self) -> Replica:
+        replica = self.select()
+        if replica is not None:
+            if self.scale_up_in_flight and replica.in_flight >= self.scale_up_in_flight:
+                replica = self._scale_up() or replica
+            return replica
+        with anyio.move_on_after(READY_WAIT_SECONDS):
+            while replica is None:
+                await self._wait_changed()
+                replica = self.select()
+        if replica is None:
+            raise UpstreamUnavailableError(f"No replica of '{self.name}' is available")
+        return replica
+
+    def hedge_target(self, busy: Replica) -> Optional[Replica]:
+        """A ready replica other than `busy` to send a duplicate call to, without waiting."""
+        return self.select(exclude=busy) or self._scale_up()
+
+    @asynccontextmanager
+    async def lease(self, replica: Optional[Replica] = None):
+        """Pick a replica for one call; connection failures take it out of rotation."""
+        if replica is None:
+            replica = await self._acquire()
+        replica.in_flight += 1
+        start = time.perf_counter()
+        try:
+            yield replica
+        except McpError as e:
+            if e.error.code in MCP_CLIENT_ERROR_CODES:
+                replica.endpoint.record_success(time.perf_counter() - start)
+            else:
+                self._record_failure(replica)
+            if e.error.code == CONNECTION_CLOSED:
+                replica.fail("connection closed")
+            raise
+        except _TRANSPORT_ERRORS:
+            self._record_failure(replica)
+            replica.fail("connection closed")
+            raise
+        except Exception:
+            self._record_failure(replica)
+            raise
+        else:
+            replica.endpoint.record_success(time.perf_counter() - start)
+        finally:
+            replica.in_flight -= 1
+            replica.calls += 1
+            replica.last_used = time.monotonic()
+            if replica.state == DRAINING and not replica.in_flight:
+                self._notify()
+            elif replica.state == READY and self.recycle:
+                reason = self.recycle.reason(replica)
+                if reason:
+                    self.recycle_replica(replica, reason)
+
+    def _record_failure(self, replica: Replica) -> None:
+        replica.failures += 1
+        endpoint = replica.endpoint
+        endpoint.record_failure()
+        if (
+            len(self.endpoints) > 1
+            and endpoint.consecutive_failures >= self.eject_after
+        ):
+            endpoint.eject(self.eject_seconds)
+            logger.warning(
+                f"Ejected '{self.name}' endpoint {endpoint.url} for "
+                f"{endpoint.ejected_until - time.monotonic():.0f}s after repeated failures"
+            )
+
+    # -- recycling ---------------------------------------------------------
+
+    def recycle_replica(self, replica: Replica, reason: str) -> None:
+        if replica.replacing or replica.state != READY or self._closing:
+            return
+        replica.replacing = True
+        logger.info(f"Recycling '{self.name}' replica {replica.id}: {reason}")
+        self._tg.start_soon(self._replace, replica)
+
+    async def _replace(self, old: Replica) -> None:
+        needed_at = time.monotonic()
+        new = self._promote(needed_at)
+        if new is None:
+            new = self._start_replica(needed_at=needed_at, endpoint=old.endpoint)
+            await new.wait_started()
+        if new.state != READY:
+            logger.warning(
+                f"Replacement for '{self.name}' replica {old.id} failed to start"
+            )
+            old.replacing = False
+            return
+
+        self.recycled += 1
+        if old.state != READY:
+            return
+        old.state = DRAINING
+        with anyio.move_on_after(self.drain_timeout):
+            while old.in_flight:
+                await self._wait_changed()
+        if old.in_flight:
+            logger.warning(
+                f"'{self.name}' replica {old.id} stopped with {old.in_flight} calls in flight"
+            )
+        old.stop()
+
+    async def _monitor(self) -> None:
+        last_sample = 0.0
+        while True:
+            await anyio.sleep(LIVENESS_INTERVAL)
+            sample = time.monotonic() - last_sample >= self.sample_interval
+            if sample:
+                last_sample = time.monotonic()
+            for replica in list(self.replicas):
+                if replica.state not in (READY, STANDBY, DRAINING):
+                    continue
+                if replica.pid is not None:
+                    if not pid_alive(replica.pid):
+                        replica.fail(f"process {replica.pid} exited")
+                        continue
+                    if sample:
+                        replica.rss = await anyio.to_thread.run_sync(
+                            read_rss, replica.pid
+                        )
+                if replica.state == READY and self.recycle:
+                    reason = self.recycle.reason(replica)
+                    if reason:
+                        self.recycle_replica(replica, reason)
+            if self.max_active > 1:
+                self._scale_down()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "replicas": len(self.ready_replicas),
+            "standby": len([r for r in self.replicas if r.state == STANDBY]),
+            "recycled": self.recycled,
+            "restarts": self.restarts,
+            "scale_ups": self.scale_ups,
+            "promotions": {"per_source": self.promotions},
+            "per_endpoint": {
+                e.url: e.snapshot() for e in self.endpoints if e.url is not None
+            },
+            "per_replica": {str(r.id): r.snapshot() for r in self.replicas},
+        }
+
+
+def create_upstream_pool(
+    name: str,
+    connect: Callable[[Replica], AsyncContextManager[ClientSession]],
+    recycle_config: Any = None,
+    standby_config: Any = None,
+    urls: Optional[List[str]] = None,
+    balancing_config: Any = None,
+) -> UpstreamPool:
+    """
+    Build a pool from a server's `recycle` config (a dict of options, or None),
+    `standby` config (a number of spares, or a dict of options), and for a
+    remote server with several `urls`, its `loadBalancing` config.
+    """
+    options = {
+        CONFIG_KEYS[k]: v for k, v in (recycle_config or {}).items() if k in CONFIG_KEYS
+    }
+    pool_options = {
+        key: options.pop(key)
+        for key in ("drain_timeout", "sample_interval")
+        if key in options
+    }
+    recycle = RecyclePolicy(**options) if options else None
+    if isinstance(standby_config, int):
+        standby_config = {"count": standby_config}
+    pool_options.update(
+        {
+            STANDBY_CONFIG_KEYS[k]: v
+            for k, v in (standby_config or {}).items()
+            if k in STANDBY_CONFIG_KEYS
+        }
+    )
+    if urls and len(urls) > 1:
+        pool_options["endpoints"] = urls
+        pool_options.update(
+            {
+                BALANCING_CONFIG_KEYS[k]: v
+                for k, v in (balancing_config or {}).items()
+                if k in BALANCING_CONFIG_KEYS
+            }
+        )
+    return UpstreamPool(name, connect, recycle=recycle, **pool_options)
+
+
+def get_upstream(app) -> Optional[UpstreamPool]:
+    return getattr(app.state, "upstream", None)
+
+
+def upstream_unavailable_exception(pool: UpstreamPool) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail={"message": f"MCP server '{pool.name}' is restarting"},
+        headers={"Retry-After": "1"},
+    )